@@ -1,21 +1,22 @@
 import asyncio
+import os
 import signal
-import statistics
 import sys
-import time
 from pathlib import Path
 
-from benchmark_hooks import attach_benchmark_hooks
+from benchmark_hooks import attach_benchmark_hooks, precise_time
 from dotenv import load_dotenv
+from latency_histogram import REPORT_PERCENTILES, LatencyHistogram
 from livekit import agents, rtc
-from livekit.agents import Agent, AgentServer, AgentSession, room_io
+from livekit.agents import Agent, AgentServer, AgentSession, AgentStateChangedEvent, room_io
 from livekit.plugins import google, noise_cancellation
+from think_time import ThinkTime
 
 load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env.local")
 load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
 
-# Global list to store latencies
-LATENCIES = []
+# Response latencies, in a bounded-memory histogram
+LATENCIES = LatencyHistogram()
 
 
 def handle_sigint(signum, frame):
@@ -24,16 +25,13 @@ def handle_sigint(signum, frame):
     print("       LATENCY STATISTICS       ")
     print("=" * 30)
 
-    if LATENCIES:
-        min_lat = min(LATENCIES)
-        max_lat = max(LATENCIES)
-        avg_lat = statistics.mean(LATENCIES)
-        count = len(LATENCIES)
-
-        print(f"Total Responses: {count}")
-        print(f"Min Latency:     {min_lat:.4f}s")
-        print(f"Max Latency:     {max_lat:.4f}s")
-        print(f"Avg Latency:     {avg_lat:.4f}s")
+    if LATENCIES.count:
+        print(f"Total Responses: {LATENCIES.count}")
+        print(f"Min Latency:     {LATENCIES.min:.4f}s")
+        print(f"Max Latency:     {LATENCIES.max:.4f}s")
+        print(f"Avg Latency:     {LATENCIES.mean:.4f}s")
+        for q in REPORT_PERCENTILES:
+            print(f"{f'p{q:g} Latency:':<17}{LATENCIES.percentile(q):.4f}s")
     else:
         print("No latencies recorded.")
 
@@ -41,6 +39,10 @@ def handle_sigint(signum, frame):
     sys.exit(0)
 
 
+# Pause after each scene (seconds or a distribution, see think_time) and the longest a scene may take
+SCENE_THINK_TIME = ThinkTime.parse(os.getenv("SCENE_THINK_TIME", "1"))
+SCENE_TIMEOUT_SECONDS = float(os.getenv("SCENE_TIMEOUT_SECONDS", "30"))
+
 # SCENARIOS: The lines you want the avatar to speak for Lip Sync testing
 SCENARIOS = [
     "Hello! Welcome to our restaurant. My name is Alex.",
@@ -91,42 +93,35 @@ async def entrypoint(ctx: agents.JobContext):
     signal.signal(signal.SIGTERM, handle_sigint)
 
     # Monitor latency
-    # We use a mutable container to share state between the event handler and the loop
+    # We use a mutable container to share state between the two event handlers
     latency_state = {"request_start_time": None}
+    # Set while the agent is listening, i.e. its previous turn is over
+    listening = asyncio.Event()
 
     @ctx.room.on("data_received")
     def on_data_received(dp: rtc.DataPacket):
         if dp.topic == "lk-chat-topic":
-            latency_state["request_start_time"] = time.time()
+            latency_state["request_start_time"] = precise_time()
             # print(f"[DEBUG] Request received at {latency_state['request_start_time']}", flush=True)
 
-    async def monitor_latency(sess: AgentSession):
-        print("Starting Latency Monitor...", flush=True)
-        last_state = sess.agent_state
-
-        while True:
-            current_state = sess.agent_state
-
-            if current_state != last_state:
-                now = time.time()
-
-                if current_state == "speaking":
-                    if latency_state["request_start_time"]:
-                        latency = now - latency_state["request_start_time"]
-                        LATENCIES.append(latency)
-                        print(f"[LATENCY] Response Time: {latency:.4f}s", flush=True)
-                        latency_state["request_start_time"] = None
-                    else:
-                        # Fallback: maybe we missed the packet or it was voice input?
-                        # For now, we only track text-chat triggered latency as per request context
-                        pass
-
-                last_state = current_state
-
-            await asyncio.sleep(0.01)
-
-    # Create monitoring task
-    asyncio.create_task(monitor_latency(session))
+    # The session emits 'agent_state_changed' on every transition, so the latency is
+    # measured at the transition itself instead of being quantized by a polling loop.
+    @session.on("agent_state_changed")
+    def on_agent_state_changed(ev: AgentStateChangedEvent):
+        if ev.new_state == "listening":
+            listening.set()
+        else:
+            listening.clear()
+        if ev.new_state == "speaking":
+            if latency_state["request_start_time"]:
+                latency = precise_time() - latency_state["request_start_time"]
+                LATENCIES.record(latency)
+                print(f"[LATENCY] Response Time: {latency:.4f}s", flush=True)
+                latency_state["request_start_time"] = None
+            else:
+                # Fallback: maybe we missed the packet or it was voice input?
+                # For now, we only track text-chat triggered latency as per request context
+                pass
 
     # 2. Start the Agent
     # 3. Schedule the Performance Loop (since session.start blocks)
@@ -151,11 +146,18 @@ async def entrypoint(ctx: agents.JobContext):
             # We wrap it in a prompt to ensure it repeats it exactly
             prompt = f"Please say exactly this sentence: '{text}'"
 
-            await session.generate_reply(instructions=prompt)
+            handle = session.generate_reply(instructions=prompt)
+
+            # 5. Wait for the scene to be played out and the agent to listen again, then a short pause
+            async def scene_done(handle=handle):
+                await handle.wait_for_playout()
+                await listening.wait()
 
-            # 5. Wait for the avatar to finish speaking + extra pause
-            # (Adjust sleep time based on sentence length)
-            await asyncio.sleep(10)
+            try:
+                await asyncio.wait_for(scene_done(), SCENE_TIMEOUT_SECONDS)
+            except TimeoutError:
+                print(f"⚠️ Scene {i + 1} still running after {SCENE_TIMEOUT_SECONDS:.0f}s, moving on")
+            await asyncio.sleep(SCENE_THINK_TIME())
 
         print("✅ Performance complete.")
 
@@ -1,36 +1,183 @@
 import asyncio
 import json
-import time
+import os
 
 from livekit import rtc
-from livekit.agents import AgentSession
+from livekit.agents import AgentSession, AgentStateChangedEvent
+from metric_protocol import (
+    CLOCK_TOPIC,
+    INBAND_METRICS_ENV,
+    METRIC_TOPIC,
+    RECORD,
+    MetricSocketWriter,
+    decode_clock_ping,
+    encode_clock_ping,
+    encode_metric,
+    precise_time,
+)
 
 
-def attach_benchmark_hooks(room: rtc.Room, session: AgentSession):
+class InBandMetricPublisher:
+    """
+    Batches metric records and publishes them on the METRIC_TOPIC data topic.
+
+    Records are flushed every `flush_interval` seconds, or as soon as `max_batch`
+    records are buffered, so a burst of state changes costs one data packet.
+    """
+
+    def __init__(self, room: rtc.Room, flush_interval: float = 0.1, max_batch: int = 128):
+        self.room = room
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._buffer: list[bytes] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    def add(self, record: bytes):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.max_batch:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return
+        payload = b"".join(self._buffer)
+        self._buffer.clear()
+        asyncio.create_task(self._publish(payload))
+
+    async def _publish(self, payload: bytes):
+        try:
+            await self.room.local_participant.publish_data(payload=payload, topic=METRIC_TOPIC, reliable=True)
+        except Exception as e:
+            print(f"Error publishing benchmark metrics ({len(payload) // RECORD.size} records): {e}", flush=True)
+
+
+class MetricEmitter:
+    """
+    Sends each metric to every configured transport.
+
+    - Binary socket (BENCHMARK_METRIC_SOCKET) when the benchmark runner spawned us.
+    - '[METRIC]' stdout line as the fallback when there is no socket.
+    - Batched records on the METRIC_TOPIC data topic when in-band reporting is on.
+    """
+
+    def __init__(self, writer: MetricSocketWriter | None = None, publisher: InBandMetricPublisher | None = None):
+        self.writer = writer
+        self.publisher = publisher
+
+    def emit(
+        self,
+        metric_type: str,
+        timestamp: float,
+        request_id: str | None,
+        label: str = "",
+        value: float | None = None,
+        text: str = "",
+    ):
+        record = encode_metric(metric_type, timestamp, request_id, label, value or 0.0)
+        if self.publisher is not None:
+            self.publisher.add(record)
+        if self.writer is not None and self.writer.send(record):
+            return
+
+        fields = [f"{value:.0f}"] if value is not None else []
+        fields += [f for f in (label, text) if f]
+        print(f"[METRIC] {metric_type} {timestamp} {request_id or '-'} {' '.join(fields)}".rstrip(), flush=True)
+
+    def describe(self) -> str:
+        sinks = [f"socket {self.writer.path}" if self.writer else "stdout"]
+        if self.publisher:
+            sinks.append(f"data topic '{METRIC_TOPIC}'")
+        return ", ".join(sinks)
+
+
+def attach_benchmark_hooks(room: rtc.Room, session: AgentSession, publish_metrics: bool | None = None):
     """
     Attaches benchmark event listeners to the Room and AgentSession.
 
     1. Listens for 'lk-chat-topic' data packets to trigger Agent replies.
     2. Logs '[METRIC]' events for latency measurement.
-    3. Monitors Agent State changes (Thinking/Speaking).
+    3. Logs Agent State changes (Thinking/Speaking) from the session's
+       'agent_state_changed' event, timestamped when the event fires.
+    4. Answers clock pings on 'lk-bench-clock' so the driver can estimate the
+       offset between its clock and ours.
+
+    Every metric line has the form `[METRIC] <TYPE> <timestamp> <request_id> <data...>`,
+    where request_id is the ID the driver put in the chat payload ('-' if unknown).
+    When the runner sets BENCHMARK_METRIC_SOCKET, metrics go to that Unix socket as
+    fixed-layout records instead (see metric_protocol.py).
+
+    With `publish_metrics` (default: the BENCHMARK_INBAND_METRICS env flag) the same
+    records are also published in batches on the 'lk-bench-metrics' data topic, so a
+    driver can collect them from agents running in containers or on other hosts.
     """
 
+    if publish_metrics is None:
+        publish_metrics = os.getenv(INBAND_METRICS_ENV, "0").lower() in ("1", "true", "yes")
+    metrics = MetricEmitter(
+        writer=MetricSocketWriter.from_env(),
+        publisher=InBandMetricPublisher(room) if publish_metrics else None,
+    )
+
+    # Request ID of the last prompt received, and of the speech generated for each prompt
+    last_request = {"id": None}
+    speech_requests: dict[str, str] = {}
+
+    def current_request_id() -> str | None:
+        speech = session.current_speech
+        if speech is not None and speech.id in speech_requests:
+            return speech_requests[speech.id]
+        return last_request["id"]
+
+    async def send_clock_pong(pong: bytes, identity: str | None):
+        try:
+            await room.local_participant.publish_data(
+                payload=pong,
+                topic=CLOCK_TOPIC,
+                reliable=False,  # a late retransmission is worse than a lost sample
+                destination_identities=[identity] if identity else [],
+            )
+        except Exception as e:
+            print(f"Error answering clock ping: {e}", flush=True)
+
     # --- 1. Chat Listener ---
     @room.on("data_received")
     def on_data_received(dp: rtc.DataPacket):
+        if dp.topic == CLOCK_TOPIC:
+            t2 = precise_time()
+            ping = decode_clock_ping(dp.data)
+            if ping is not None:
+                seq, t1, _, _ = ping
+                identity = dp.participant.identity if dp.participant else None
+                asyncio.create_task(send_clock_pong(encode_clock_ping(seq, t1, t2, precise_time()), identity))
+            return
+
         if dp.topic == "lk-chat-topic":
             try:
+                received_at = precise_time()
                 payload = json.loads(dp.data.decode("utf-8"))
                 text = payload.get("message", "")
                 timestamp = payload.get("timestamp", 0)
+                request_id = payload.get("request_id")
+                last_request["id"] = request_id
 
                 # Log reception
-                print(f"[METRIC] AGENT_RECEIVED {timestamp} {time.time()} {text}", flush=True)
+                metrics.emit("AGENT_RECEIVED", received_at, request_id, value=timestamp, text=text)
 
                 # Trigger Agent Reply
                 async def reply_wrapper():
                     # We send instructions to the agent to reply to this specific text
-                    await session.generate_reply(instructions=f"Reply to user: {text}")
+                    handle = session.generate_reply(instructions=f"Reply to user: {text}")
+                    if request_id:
+                        speech_requests[handle.id] = request_id
+                    try:
+                        await handle
+                    finally:
+                        speech_requests.pop(handle.id, None)
 
                 # Schedule on the existing event loop
                 asyncio.create_task(reply_wrapper())
@@ -39,16 +186,11 @@ def attach_benchmark_hooks(room: rtc.Room, session: AgentSession):
                 print(f"Error handling benchmark chat: {e}", flush=True)
 
     # --- 2. State Monitor ---
-    # We poll state changes to log when the agent starts speaking (Thinking -> Speaking)
-    async def monitor_state():
-        last_state = session.agent_state
-        while True:
-            current = session.agent_state
-            if current != last_state:
-                print(f"[METRIC] AGENT_STATE {time.time()} {current}", flush=True)
-                last_state = current
-            await asyncio.sleep(0.01)
-
-    asyncio.create_task(monitor_state())
-
-    print("✅ Benchmark Hooks Attached")
+    # The session emits 'agent_state_changed' synchronously on every transition,
+    # so the timestamp is taken at the transition itself and nothing runs while idle.
+    @session.on("agent_state_changed")
+    def on_agent_state_changed(ev: AgentStateChangedEvent):
+        changed_at = precise_time()
+        metrics.emit("AGENT_STATE", changed_at, current_request_id(), label=ev.new_state)
+
+    print(f"✅ Benchmark Hooks Attached (metrics via {metrics.describe()})")
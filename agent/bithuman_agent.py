@@ -1,16 +1,14 @@
-import asyncio
 import os
 import signal
-import statistics
 import sys
-import time
 from pathlib import Path
 
-from benchmark_hooks import attach_benchmark_hooks
+from benchmark_hooks import attach_benchmark_hooks, precise_time
 from bithuman import AsyncBithuman
 from dotenv import load_dotenv
+from latency_histogram import REPORT_PERCENTILES, LatencyHistogram
 from livekit import agents, rtc
-from livekit.agents import Agent, AgentServer, AgentSession, room_io
+from livekit.agents import Agent, AgentServer, AgentSession, AgentStateChangedEvent, room_io
 from livekit.plugins import bithuman, noise_cancellation, silero
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from loguru import logger
@@ -18,8 +16,8 @@ from loguru import logger
 load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env.local")
 load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
 
-# Global list to store latencies
-LATENCIES = []
+# Response latencies, in a bounded-memory histogram
+LATENCIES = LatencyHistogram()
 
 
 def handle_sigint(signum, frame):
@@ -28,16 +26,13 @@ def handle_sigint(signum, frame):
     print("       LATENCY STATISTICS       ")
     print("=" * 30)
 
-    if LATENCIES:
-        min_lat = min(LATENCIES)
-        max_lat = max(LATENCIES)
-        avg_lat = statistics.mean(LATENCIES)
-        count = len(LATENCIES)
-
-        print(f"Total Responses: {count}")
-        print(f"Min Latency:     {min_lat:.4f}s")
-        print(f"Max Latency:     {max_lat:.4f}s")
-        print(f"Avg Latency:     {avg_lat:.4f}s")
+    if LATENCIES.count:
+        print(f"Total Responses: {LATENCIES.count}")
+        print(f"Min Latency:     {LATENCIES.min:.4f}s")
+        print(f"Max Latency:     {LATENCIES.max:.4f}s")
+        print(f"Avg Latency:     {LATENCIES.mean:.4f}s")
+        for q in REPORT_PERCENTILES:
+            print(f"{f'p{q:g} Latency:':<17}{LATENCIES.percentile(q):.4f}s")
     else:
         print("No latencies recorded.")
 
@@ -101,42 +96,29 @@ async def my_agent(ctx: agents.JobContext):
     signal.signal(signal.SIGTERM, handle_sigint)
 
     # Monitor latency
-    # We use a mutable container to share state between the event handler and the loop
+    # We use a mutable container to share state between the two event handlers
     latency_state = {"request_start_time": None}
 
     @ctx.room.on("data_received")
     def on_data_received(dp: rtc.DataPacket):
         if dp.topic == "lk-chat-topic":
-            latency_state["request_start_time"] = time.time()
+            latency_state["request_start_time"] = precise_time()
             # print(f"[DEBUG] Request received at {latency_state['request_start_time']}", flush=True)
 
-    async def monitor_latency(sess: AgentSession):
-        print("Starting Latency Monitor...", flush=True)
-        last_state = sess.agent_state
-
-        while True:
-            current_state = sess.agent_state
-
-            if current_state != last_state:
-                now = time.time()
-
-                if current_state == "speaking":
-                    if latency_state["request_start_time"]:
-                        latency = now - latency_state["request_start_time"]
-                        LATENCIES.append(latency)
-                        print(f"[LATENCY] Response Time: {latency:.4f}s", flush=True)
-                        latency_state["request_start_time"] = None
-                    else:
-                        # Fallback: maybe we missed the packet or it was voice input?
-                        # For now, we only track text-chat triggered latency as per request context
-                        pass
-
-                last_state = current_state
-
-            await asyncio.sleep(0.01)
-
-    # Create monitoring task
-    asyncio.create_task(monitor_latency(session))
+    # The session emits 'agent_state_changed' on every transition, so the latency is
+    # measured at the transition itself instead of being quantized by a polling loop.
+    @session.on("agent_state_changed")
+    def on_agent_state_changed(ev: AgentStateChangedEvent):
+        if ev.new_state == "speaking":
+            if latency_state["request_start_time"]:
+                latency = precise_time() - latency_state["request_start_time"]
+                LATENCIES.record(latency)
+                print(f"[LATENCY] Response Time: {latency:.4f}s", flush=True)
+                latency_state["request_start_time"] = None
+            else:
+                # Fallback: maybe we missed the packet or it was voice input?
+                # For now, we only track text-chat triggered latency as per request context
+                pass
 
     bithuman_avatar = bithuman.AvatarSession(
         # model_path=bithuman_model_path,
@@ -0,0 +1,156 @@
+"""
+Mergeable high-dynamic-range latency histogram.
+
+Latencies are recorded as integer microseconds into log-linear buckets (the HDR
+histogram layout): values below 2048 µs get one bucket each, and every further
+power of two is split into 1024 buckets, so any recorded value is known to within
+0.1% whatever its magnitude. Only non-empty buckets are stored, so memory is bounded
+by the dynamic range rather than the number of samples, and two histograms merge by
+adding their bucket counts. `to_dict()`/`from_dict()` give a JSON form for merging
+histograms written by separate processes.
+
+Like metric_protocol, this module must stay free of sibling imports: the benchmark
+scripts load it from outside the agent directory.
+"""
+
+import json
+import math
+
+import numpy as np
+
+# Percentiles shown by every latency report
+REPORT_PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9)
+
+_SUB_BUCKET_BITS = 11
+_HALF = 1 << (_SUB_BUCKET_BITS - 1)
+
+
+def _bucket_index(units: int) -> int:
+    shift = max(0, units.bit_length() - _SUB_BUCKET_BITS)
+    return _HALF * shift + (units >> shift)
+
+
+def _bucket_value(index: int) -> float:
+    """Midpoint of a bucket, in units."""
+    if index < 2 * _HALF:
+        return float(index)
+    shift = index // _HALF - 1
+    low = (index - _HALF * shift) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    def __init__(self, unit: float = 1e-6):
+        self.unit = unit
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def record(self, seconds: float, count: int = 1):
+        """Records a latency in seconds. Negative values (clock noise) are clamped to zero."""
+        seconds = max(0.0, seconds)
+        index = _bucket_index(round(seconds / self.unit))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += seconds * count
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        if other.unit != self.unit:
+            raise ValueError(f"cannot merge histograms with units {self.unit} and {other.unit}")
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def __iadd__(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        return self.merge(other)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def _buckets(self) -> tuple[np.ndarray, np.ndarray]:
+        indices = np.array(sorted(self.counts), dtype=np.int64)
+        counts = np.array([self.counts[i] for i in indices], dtype=np.int64)
+        return indices, counts
+
+    def _value(self, index: int) -> float:
+        # Bucket midpoints can fall outside the exact extremes; those are known exactly
+        return min(self.max, max(self.min, _bucket_value(index) * self.unit))
+
+    def percentile(self, q: float) -> float | None:
+        """Nearest-rank percentile in seconds, accurate to the bucket width (0.1%)."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return self._value(index)
+        return self.max
+
+    def bootstrap_ci(
+        self, q: float, confidence: float = 0.95, resamples: int = 1000, seed: int = 0
+    ) -> tuple[float, float] | None:
+        """
+        Percentile bootstrap confidence interval for the q-th percentile.
+
+        Resampling the recorded values with replacement is the same as drawing the
+        bucket counts from a multinomial, so this works on merged histograms without
+        the raw samples.
+        """
+        if not self.count:
+            return None
+        indices, counts = self._buckets()
+        rng = np.random.default_rng(seed)
+        draws = rng.multinomial(self.count, counts / self.count, size=resamples)
+        rank = max(1, math.ceil(q / 100 * self.count))
+        # First bucket whose cumulative count reaches the rank, per resample
+        hit = np.argmax(np.cumsum(draws, axis=1) >= rank, axis=1)
+        estimates = np.sort(indices[hit])
+        alpha = (1 - confidence) / 2
+        low = estimates[int(alpha * (resamples - 1))]
+        high = estimates[int(math.ceil((1 - alpha) * (resamples - 1)))]
+        return self._value(int(low)), self._value(int(high))
+
+    def to_dict(self) -> dict:
+        return {
+            "unit": self.unit,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "counts": {str(i): n for i, n in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        hist = cls(unit=data["unit"])
+        hist.counts = {int(i): n for i, n in data["counts"].items()}
+        hist.count = data["count"]
+        hist.total = data["total"]
+        if hist.count:
+            hist.min = data["min"]
+            hist.max = data["max"]
+        return hist
+
+
+def save_histograms(path: str, histograms: dict[str, LatencyHistogram]):
+    with open(path, "w") as f:
+        json.dump({name: h.to_dict() for name, h in histograms.items()}, f)
+
+
+def load_histograms(path: str) -> dict[str, LatencyHistogram]:
+    with open(path) as f:
+        return {name: LatencyHistogram.from_dict(data) for name, data in json.load(f).items()}
@@ -0,0 +1,159 @@
+"""
+Fixed-layout benchmark metric records shared by the agent hooks and the benchmark runner.
+
+Each record is a 72-byte little-endian struct, so a batch of records is just their
+concatenation and can be decoded without any framing:
+
+    kind (u8) | padding (7) | timestamp (f64) | value (f64) | request_id (32s) | label (16s)
+
+This module must stay free of sibling imports: the benchmark scripts load it from
+outside the agent directory.
+"""
+
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import time
+from typing import NamedTuple
+
+# Wall-clock anchor for precise_time(). Sampled once so that every metric
+# timestamp advances with the monotonic perf counter (no NTP steps, ns resolution)
+# while staying comparable with time.time() on the other side of the benchmark.
+_WALL_ANCHOR = time.time()
+_PERF_ANCHOR = time.perf_counter()
+
+
+def precise_time() -> float:
+    """Monotonic, high-resolution wall-clock time in seconds."""
+    return _WALL_ANCHOR + (time.perf_counter() - _PERF_ANCHOR)
+
+
+# Environment variable the benchmark runner uses to hand the socket path to the agent
+METRIC_SOCKET_ENV = "BENCHMARK_METRIC_SOCKET"
+
+# In-band transport: batches of records published on a LiveKit data topic
+INBAND_METRICS_ENV = "BENCHMARK_INBAND_METRICS"
+METRIC_TOPIC = "lk-bench-metrics"
+
+# Clock synchronisation: the driver pings on CLOCK_TOPIC, the agent hooks answer with
+# their receive (t2) and send (t3) times so the driver can estimate the clock offset
+CLOCK_TOPIC = "lk-bench-clock"
+
+RECORD = struct.Struct("<B7xdd32s16s")
+
+# seq (u32) | padding (4) | t1 driver send | t2 agent receive | t3 agent send
+CLOCK_PING = struct.Struct("<I4xddd")
+
+METRIC_KINDS = {
+    "AGENT_RECEIVED": 1,
+    "AGENT_STATE": 2,
+}
+_KIND_NAMES = {v: k for k, v in METRIC_KINDS.items()}
+
+
+class MetricRecord(NamedTuple):
+    type: str
+    timestamp: float
+    request_id: str | None
+    label: str
+    value: float
+
+
+def encode_metric(metric_type: str, timestamp: float, request_id: str | None, label: str = "", value: float = 0.0):
+    """Packs one metric into a fixed-size record. Over-long IDs and labels are truncated."""
+    return RECORD.pack(
+        METRIC_KINDS[metric_type],
+        timestamp,
+        value,
+        (request_id or "").encode("ascii", "replace")[:32],
+        label.encode("utf-8")[:16],
+    )
+
+
+def decode_metrics(buf: bytes) -> list[MetricRecord]:
+    """Decodes a buffer holding one or more concatenated records. Unknown kinds are skipped."""
+    usable = len(buf) - len(buf) % RECORD.size
+    records = []
+    for kind, timestamp, value, request_id, label in RECORD.iter_unpack(buf[:usable]):
+        name = _KIND_NAMES.get(kind)
+        if name is None:
+            continue
+        rid = request_id.rstrip(b"\0").decode("ascii", "replace") or None
+        records.append(MetricRecord(name, timestamp, rid, label.rstrip(b"\0").decode("utf-8", "replace"), value))
+    return records
+
+
+def encode_clock_ping(seq: int, t1: float, t2: float = 0.0, t3: float = 0.0) -> bytes:
+    return CLOCK_PING.pack(seq & 0xFFFFFFFF, t1, t2, t3)
+
+
+def decode_clock_ping(buf: bytes) -> tuple[int, float, float, float] | None:
+    if len(buf) != CLOCK_PING.size:
+        return None
+    return CLOCK_PING.unpack(buf)
+
+
+class MetricSocketWriter:
+    """
+    Agent side of the metric channel: fire-and-forget datagrams on a Unix socket.
+
+    Sends never block. If the reader is gone or its buffer is full the record is
+    dropped and `send` returns False so the caller can fall back to stdout.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dropped = 0
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    @classmethod
+    def from_env(cls) -> "MetricSocketWriter | None":
+        path = os.getenv(METRIC_SOCKET_ENV)
+        if not path or not hasattr(socket, "AF_UNIX"):
+            return None
+        try:
+            return cls(path)
+        except OSError:
+            return None
+
+    def send(self, record: bytes) -> bool:
+        try:
+            self._sock.sendto(record, self.path)
+            return True
+        except OSError:
+            self.dropped += 1
+            return False
+
+    def close(self):
+        self._sock.close()
+
+
+class MetricSocketReader:
+    """Runner side of the metric channel: binds a datagram socket in a private temp dir."""
+
+    def __init__(self, recv_buffer: int = 1 << 20):
+        self._dir = tempfile.mkdtemp(prefix="lk-bench-")
+        self.path = os.path.join(self._dir, "metrics.sock")
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+        self._sock.bind(self.path)
+        self._sock.settimeout(0.2)
+
+    def recv(self) -> list[MetricRecord] | None:
+        """Returns the records of one datagram, [] on timeout, or None once closed."""
+        try:
+            buf = self._sock.recv(65536)
+        except TimeoutError:
+            return []
+        except OSError:
+            return None
+        return decode_metrics(buf)
+
+    def close(self):
+        try:
+            self._sock.close()
+        finally:
+            shutil.rmtree(self._dir, ignore_errors=True)
@@ -0,0 +1,88 @@
+"""
+Think time between conversational turns: the pause a user takes after the agent has
+finished speaking before saying the next thing.
+
+A think time is given as a plain number of seconds or as a distribution spec:
+
+    "1.5"                 fixed 1.5 s
+    "uniform:0.5:2"       uniform between 0.5 and 2 s
+    "exp:1.5"             exponential with a 1.5 s mean
+    "lognormal:1:0.5"     log-normal with a 1 s median and sigma 0.5
+
+Like metric_protocol, this module must stay free of sibling imports: the benchmark
+scripts load it from outside the agent directory.
+"""
+
+import math
+import random
+
+KINDS = ("fixed", "uniform", "exp", "lognormal")
+
+
+class ThinkTime:
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0, seed: int | None = None):
+        if kind not in KINDS:
+            raise ValueError(f"unknown think time distribution '{kind}' (expected one of {', '.join(KINDS)})")
+        if not (math.isfinite(a) and math.isfinite(b)):
+            raise ValueError(f"think time parameters must be finite, got {a:g}, {b:g}")
+        if kind == "lognormal":
+            if a <= 0 or b < 0:
+                raise ValueError(f"lognormal think time needs a median > 0 and sigma >= 0, got {a:g}, {b:g}")
+        elif a < 0 or b < 0:
+            raise ValueError(f"{kind} think time can't be negative, got {a:g}, {b:g}")
+        elif kind == "uniform" and a > b:
+            raise ValueError(f"uniform think time needs low <= high, got {a:g}, {b:g}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: str, seed: int | None = None) -> "ThinkTime":
+        kind, _, params = spec.partition(":")
+        try:
+            if not params:
+                return cls("fixed", float(kind), seed=seed)
+            values = [float(v) for v in params.split(":")]
+        except ValueError:
+            raise ValueError(f"invalid think time '{spec}'") from None
+        expected = 1 if kind == "exp" else 2
+        if len(values) != expected:
+            raise ValueError(f"think time '{kind}' takes {expected} parameter(s), got '{spec}'")
+        return cls(kind, *values, seed=seed)
+
+    @classmethod
+    def of(cls, value: "float | str | ThinkTime") -> "ThinkTime":
+        """Accepts seconds, a spec string or a ThinkTime."""
+        if isinstance(value, ThinkTime):
+            return value
+        if isinstance(value, str):
+            return cls.parse(value)
+        return cls("fixed", float(value))
+
+    def scaled(self, factor: float, seed: int | None = None) -> "ThinkTime":
+        """The same distribution with every pause multiplied by `factor` (the lognormal shape is kept)."""
+        if self.kind == "lognormal":
+            return ThinkTime("lognormal", self.a * factor, self.b, seed)
+        return ThinkTime(self.kind, self.a * factor, self.b * factor, seed)
+
+    def __call__(self) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return self._rng.uniform(self.a, self.b)
+        if self.kind == "exp":
+            return self._rng.expovariate(1 / self.a) if self.a > 0 else 0.0
+        return self._rng.lognormvariate(math.log(self.a), self.b)
+
+    @property
+    def spec(self) -> str:
+        """The spec string parse() accepts (what run metadata records)."""
+        if self.kind == "fixed":
+            return f"{self.a:g}"
+        if self.kind == "exp":
+            return f"exp:{self.a:g}"
+        return f"{self.kind}:{self.a:g}:{self.b:g}"
+
+    def __repr__(self) -> str:
+        return f"{self.spec}s" if self.kind == "fixed" else self.spec
@@ -0,0 +1,246 @@
+"""
+Driver-side analysis of the agent's downlink audio.
+
+The driver subscribes to every remote audio track (the agent's own voice, or the
+avatar worker that speaks on its behalf) through rtc.AudioStream and feeds each
+frame in here. Levels are computed per 10 ms block with NumPy, so one call handles
+a frame of any length without a Python loop over samples.
+
+AudioResponseDetector turns the levels into a time-to-first-audio: after a prompt
+is sent it is armed, and the start of the first run of audible blocks on any track
+is the response timestamp. Unlike active-speaker events this is not smoothed or
+delayed by the SFU, and it doesn't depend on participant identities.
+
+AudioContinuityAnalyzer tracks downlink continuity per turn from frame arrival
+times and sizes alone (no audio is kept): inter-arrival jitter, gaps longer than
+one frame, and underruns of a simulated playout buffer.
+"""
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import numpy as np
+from clock_sync import precise_time
+from latency_histogram import LatencyHistogram
+from livekit import rtc
+
+BLOCK_MS = 10
+
+
+def block_levels_dbfs(samples: np.ndarray, block_samples: int) -> np.ndarray:
+    """RMS level in dBFS of each complete `block_samples` block of int16 mono audio."""
+    n = len(samples) // block_samples
+    if n == 0:
+        return np.empty(0, dtype=np.float32)
+    blocks = samples[: n * block_samples].reshape(n, block_samples).astype(np.float32)
+    rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+    return 20 * np.log10(rms / 32768.0 + 1e-10)
+
+
+@dataclass
+class _TrackState:
+    run: int = 0  # consecutive audible blocks
+    run_start: float = 0.0
+    quiet_seen: bool = False
+
+
+class AudioResponseDetector:
+    """
+    Detects the first audible audio after `arm()` across any number of tracks.
+
+    A response starts at the first of `min_blocks` consecutive blocks at or above
+    `threshold_dbfs`. The track must have been quiet at least once since arming, so
+    an agent still finishing its previous utterance doesn't count as a response.
+    """
+
+    def __init__(self, threshold_dbfs: float = -45.0, min_blocks: int = 2):
+        self.threshold_dbfs = threshold_dbfs
+        self.min_blocks = min_blocks
+        self.onset_ts: float | None = None
+        self.onset_track: str | None = None
+        self._armed_at: float | None = None
+        self._tracks: dict[str, _TrackState] = {}
+        self._event = asyncio.Event()
+
+    def arm(self, t: float):
+        self._armed_at = t
+        self.onset_ts = None
+        self.onset_track = None
+        self._event.clear()
+        for state in self._tracks.values():
+            state.run = 0
+            state.quiet_seen = False
+
+    def process(self, track: str, samples: np.ndarray, sample_rate: int, received_ts: float):
+        """Feeds one int16 mono frame, received (last sample) at `received_ts`."""
+        if self._armed_at is None:
+            return
+        block = sample_rate * BLOCK_MS // 1000
+        levels = block_levels_dbfs(samples, block)
+        if len(levels) == 0:
+            return
+        state = self._tracks.setdefault(track, _TrackState())
+        block_s = block / sample_rate
+        # Arrival time of the start of each block
+        starts = received_ts - (len(levels) - np.arange(len(levels))) * block_s
+        for start, audible in zip(starts, levels >= self.threshold_dbfs, strict=True):
+            if not audible:
+                state.run = 0
+                state.quiet_seen = True
+                continue
+            if not state.quiet_seen or start < self._armed_at:
+                continue
+            if state.run == 0:
+                state.run_start = float(start)
+            state.run += 1
+            if state.run >= self.min_blocks:
+                self.onset_ts = state.run_start
+                self.onset_track = track
+                self._armed_at = None
+                self._event.set()
+                return
+
+    async def wait(self, timeout: float) -> float | None:
+        """Returns the onset timestamp, or None if nothing was heard within `timeout`."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except TimeoutError:
+            self._armed_at = None
+            return None
+        return self.onset_ts
+
+
+@dataclass
+class _TurnAudioStats:
+    frames: int = 0
+    media_time: float = 0.0  # seconds of audio received
+    jitter: LatencyHistogram = field(default_factory=LatencyHistogram)  # |inter-arrival - frame duration|
+    gaps: list[float] = field(default_factory=list)  # missing time of each gap (s)
+    underruns: int = 0
+    underrun_time: float = 0.0
+    rfc_jitter_max: float = 0.0
+
+
+@dataclass
+class _ContinuityTrackState:
+    last_ts: float | None = None
+    last_duration: float = 0.0
+    rfc_jitter: float = 0.0
+    buffer: float = 0.0  # simulated playout buffer level (s)
+    playing: bool = False
+
+
+class AudioContinuityAnalyzer:
+    """
+    Continuity of the remote audio tracks per turn, computed incrementally per frame.
+
+    - jitter: deviation of each inter-arrival time from the previous frame's duration
+      (percentiles), plus the peak RFC 3550 smoothed interarrival jitter;
+    - gaps: arrivals later than one extra frame, reported as the missing time;
+    - underruns: a playout buffer that starts playing once `target_buffer` seconds
+      are queued and drains in real time. Every time it runs dry is an underrun,
+      i.e. what a client with that much buffering would have heard as a dropout.
+    """
+
+    def __init__(self, target_buffer: float = 0.06):
+        self.target_buffer = target_buffer
+        self.turn: str | None = None
+        self.turns: dict[str | None, _TurnAudioStats] = {}
+        self._tracks: dict[str, _ContinuityTrackState] = {}
+
+    def start_turn(self, turn: str | None):
+        self.turn = turn
+
+    def process(self, track: str, samples: np.ndarray, sample_rate: int, received_ts: float):
+        state = self._tracks.setdefault(track, _ContinuityTrackState())
+        stats = self.turns.setdefault(self.turn, _TurnAudioStats())
+        duration = len(samples) / sample_rate
+        stats.frames += 1
+        stats.media_time += duration
+
+        if state.last_ts is not None:
+            elapsed = received_ts - state.last_ts
+            deviation = elapsed - state.last_duration
+            stats.jitter.record(abs(deviation))
+            state.rfc_jitter += (abs(deviation) - state.rfc_jitter) / 16
+            stats.rfc_jitter_max = max(stats.rfc_jitter_max, state.rfc_jitter)
+            if deviation > state.last_duration:
+                stats.gaps.append(deviation)
+            if state.playing:
+                state.buffer -= elapsed
+                if state.buffer < 0:
+                    stats.underruns += 1
+                    stats.underrun_time += -state.buffer
+                    state.buffer = 0.0
+                    state.playing = False
+
+        state.buffer += duration
+        if not state.playing and state.buffer >= self.target_buffer:
+            state.playing = True
+        state.last_ts = received_ts
+        state.last_duration = duration
+
+    def summary(self, turn: str | None) -> dict | None:
+        stats = self.turns.get(turn)
+        if stats is None or stats.frames == 0:
+            return None
+        return {
+            "frames": stats.frames,
+            "media_time": stats.media_time,
+            "jitter_p50": stats.jitter.percentile(50),
+            "jitter_p95": stats.jitter.percentile(95),
+            "jitter_p99": stats.jitter.percentile(99),
+            "rfc_jitter_max": stats.rfc_jitter_max,
+            "gaps": len(stats.gaps),
+            "gap_time": sum(stats.gaps),
+            "gap_max": max(stats.gaps, default=0.0),
+            "underruns": stats.underruns,
+            "underrun_time": stats.underrun_time,
+        }
+
+
+def print_continuity_report(results: list[dict]):
+    """Per-turn downlink audio continuity, from the 'audio' summary of each turn's result."""
+    if not any(res.get("audio") for res in results):
+        return
+
+    def ms(value):
+        return f"{value * 1000:.1f} ms" if value is not None else "N/A"
+
+    print("\n" + "=" * 116)
+    print("AGENT AUDIO CONTINUITY (per turn)")
+    print("=" * 116)
+    print(
+        f"{'Turn':<30} | {'Frames':>6} | {'Jit p50':>8} | {'Jit p95':>8} | {'Jit p99':>8} | {'Gaps':>5} | "
+        f"{'Gap max':>9} | {'Underruns':>9} | {'Underrun time':>13}"
+    )
+    print("-" * 116)
+    for res in results:
+        a = res.get("audio")
+        label = res["prompt"][:30]
+        if not a:
+            print(f"{label:<30} | {'N/A':>6}")
+            continue
+        print(
+            f"{label:<30} | {a['frames']:>6} | {ms(a['jitter_p50']):>8} | {ms(a['jitter_p95']):>8} | "
+            f"{ms(a['jitter_p99']):>8} | {a['gaps']:>5} | {ms(a['gap_max']):>9} | {a['underruns']:>9} | "
+            f"{ms(a['underrun_time']):>13}"
+        )
+
+
+# (track key, int16 mono samples, sample rate, received timestamp)
+AudioHandler = Callable[[str, np.ndarray, int, float], None]
+
+
+async def consume_audio(track: rtc.Track, key: str, handlers: list[AudioHandler], sample_rate: int = 48000):
+    """Feeds every frame of a remote audio track to the handlers until the track ends."""
+    stream = rtc.AudioStream(track, sample_rate=sample_rate, num_channels=1, frame_size_ms=BLOCK_MS)
+    try:
+        async for event in stream:
+            received_ts = precise_time()
+            samples = np.frombuffer(event.frame.data, dtype=np.int16)
+            for handler in handlers:
+                handler(key, samples, event.frame.sample_rate, received_ts)
+    finally:
+        await stream.aclose()
@@ -0,0 +1,241 @@
+"""
+Automatic capacity search: how many concurrent sessions one agent worker sustains.
+
+For each vendor agent a fresh worker is started and the load is ramped in steps of
+concurrent sessions. Every step is held for a fixed time; turns and resource samples
+from its first `warmup` seconds are discarded so the numbers reflect the steady
+state. The ramp stops at the first step that breaches the SLO (p95/p99 response
+latency, answered fraction, agent CPU or RSS). The last passing step is the
+"sessions per worker" figure and the breach with the largest overshoot names the
+limiting resource.
+"""
+
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import psutil
+from latency_driver import AgentMetric, AgentRunner, histogram_of, index_agent_metrics, latency_breakdown
+from load_generator import LoadLevelResult, level_turns, run_load_sweep
+from results_store import ResultsStore, RunMetadata
+from system_monitor import SystemMetrics, SystemMonitor
+from think_time import ThinkTime
+
+
+@dataclass
+class SLO:
+    p95: float = 3.0  # seconds
+    p99: float | None = None  # seconds
+    min_completion: float = 0.95  # answered / sent
+    max_cpu: float | None = None  # percent of one core, summed over cores (default: 80% of all cores)
+    max_rss_mb: float | None = None
+
+    def __post_init__(self):
+        if self.max_cpu is None:
+            self.max_cpu = 80.0 * (psutil.cpu_count() or 1)
+
+
+@dataclass
+class CapacityResult:
+    vendor: str
+    steps: list[dict] = field(default_factory=list)
+    capacity: int = 0
+    limiting: str | None = None
+
+
+def summarize_step(
+    level: LoadLevelResult, agent_metrics: list[AgentMetric], samples: list[SystemMetrics], warmup: float = 0.0
+) -> dict:
+    """Steady-state latency percentiles and agent CPU/RSS of one step, skipping its first `warmup` seconds."""
+    steady_from = level.started_at + warmup
+    metrics_by_request = index_agent_metrics(
+        agent_metrics + [m for sr in level.session_results for m in sr.inband_metrics]
+    )
+
+    total: list[float] = []
+    sent = 0
+    for sr in level.session_results:
+        results = [r for r in sr.results if r["sent_ts"] >= steady_from]
+        sent += len(results)
+        total += latency_breakdown(results, metrics_by_request, sr.clock)["total"]
+
+    window = [m for m in samples if steady_from <= m.timestamp <= level.finished_at]
+    cpu = [m.cpu_percent for m in window]
+    # Same histogram percentiles as the main latency report
+    latency = histogram_of(total)
+    return {
+        "sessions": level.sessions,
+        "sent": sent,
+        "answered": latency.count,
+        "p50": latency.percentile(50),
+        "p95": latency.percentile(95),
+        "p99": latency.percentile(99),
+        "cpu_avg": sum(cpu) / len(cpu) if cpu else None,
+        "rss_max": max((m.memory_mb for m in window), default=None),
+    }
+
+
+def check_slo(step: dict, slo: SLO) -> list[tuple[str, float]]:
+    """Returns the breached limits of a step as (resource, measured / limit), worst first."""
+    breaches = []
+    if step["sent"] and step["answered"] / step["sent"] < slo.min_completion:
+        # An unanswered prompt is a timeout: rank it like an over-long latency
+        breaches.append(("unanswered prompts", slo.min_completion / max(step["answered"] / step["sent"], 1e-9)))
+    if step["p95"] is not None and step["p95"] > slo.p95:
+        breaches.append(("latency p95", step["p95"] / slo.p95))
+    if slo.p99 is not None and step["p99"] is not None and step["p99"] > slo.p99:
+        breaches.append(("latency p99", step["p99"] / slo.p99))
+    if step["cpu_avg"] is not None and step["cpu_avg"] > slo.max_cpu:
+        breaches.append(("cpu", step["cpu_avg"] / slo.max_cpu))
+    if slo.max_rss_mb is not None and step["rss_max"] is not None and step["rss_max"] > slo.max_rss_mb:
+        breaches.append(("memory", step["rss_max"] / slo.max_rss_mb))
+    return sorted(breaches, key=lambda b: b[1], reverse=True)
+
+
+def closest_limit(step: dict, slo: SLO) -> str | None:
+    """For a step within the SLO: the limit with the least headroom left."""
+    usage = []
+    if step["p95"] is not None:
+        usage.append(("latency p95", step["p95"] / slo.p95))
+    if slo.p99 is not None and step["p99"] is not None:
+        usage.append(("latency p99", step["p99"] / slo.p99))
+    if step["cpu_avg"] is not None:
+        usage.append(("cpu", step["cpu_avg"] / slo.max_cpu))
+    if slo.max_rss_mb is not None and step["rss_max"] is not None:
+        usage.append(("memory", step["rss_max"] / slo.max_rss_mb))
+    return max(usage, key=lambda u: u[1])[0] if usage else None
+
+
+def ramp_levels(start: int, step: int, max_sessions: int) -> list[int]:
+    """start, start + step, ... up to max_sessions (always included as the last step)."""
+    levels = list(range(start, max_sessions + 1, step))
+    if levels[-1] != max_sessions:
+        levels.append(max_sessions)
+    return levels
+
+
+def run_capacity_search(
+    agent_script: str,
+    prompts: list[str],
+    slo: SLO,
+    start: int = 1,
+    step: int = 1,
+    max_sessions: int = 32,
+    hold: float = 60.0,
+    warmup: float = 10.0,
+    cooldown: float = 10.0,
+    prompt_gap: float | ThinkTime = 1.0,
+    response_timeout: float = 15.0,
+    turn_timeout: float = 30.0,
+    room_prefix: str = "benchmark-capacity",
+    echo_logs: bool = False,
+    metric_socket: bool = True,
+    store: ResultsStore | None = None,
+    metadata: RunMetadata | None = None,
+) -> CapacityResult:
+    """
+    Starts one worker for `agent_script` and ramps concurrent sessions until the SLO breaks.
+    Every virtual user paces its prompts with `prompt_gap` and waits with the given
+    timeouts, as in the load sweep.
+
+    With a `store`, the search is recorded as one run: the steady-state turns of every
+    step (tagged with its session count), the monitor samples and the agent events.
+    """
+    vendor = Path(agent_script).stem.removesuffix("_agent")
+    result = CapacityResult(vendor)
+    run_id = store.start_run(metadata or RunMetadata.collect(vendor, agent_script, None, prompts)) if store else None
+    levels: list[LoadLevelResult] = []
+    runner = AgentRunner(agent_script, echo_logs=echo_logs, metric_socket=metric_socket)
+    monitor = SystemMonitor(runner.start())
+    monitor.start()
+    try:
+        print("Waiting for the agent worker to register...")
+        if not runner.wait_ready():
+            print("   -> ⚠️  Agent worker didn't report registration, continuing anyway")
+
+        for sessions in ramp_levels(start, step, max_sessions):
+            level = run_load_sweep(
+                [sessions],
+                prompts,
+                room_prefix=f"{room_prefix}-{vendor}",
+                prompt_gap=prompt_gap,
+                response_timeout=response_timeout,
+                turn_timeout=turn_timeout,
+                hold=hold + warmup,
+            )[0]
+            levels.append(level)
+            summary = summarize_step(level, runner.metrics, monitor.metrics, warmup)
+            breaches = check_slo(summary, slo)
+            summary["breaches"] = breaches
+            result.steps.append(summary)
+            if breaches:
+                result.limiting = breaches[0][0]
+                print(f"   -> ⛔ {vendor}: SLO breached at {sessions} sessions ({result.limiting})")
+                break
+            result.capacity = sessions
+            # Let the worker tear down the previous step's jobs
+            time.sleep(cooldown)
+        else:
+            # Never breached: report what was closest to its limit at the top step
+            if result.steps:
+                result.limiting = closest_limit(result.steps[-1], slo)
+    finally:
+        monitor.stop()
+        runner.stop()
+        if store:
+            events = runner.metrics + [m for level in levels for sr in level.session_results for m in sr.inband_metrics]
+            metrics_by_request = index_agent_metrics(events)
+            store.add_turns(
+                run_id,
+                [t for level in levels for t in level_turns(level, metrics_by_request, level.started_at + warmup)],
+            )
+            store.add_samples(run_id, monitor.metrics)
+            store.add_events(run_id, events)
+            store.finish_run(run_id)
+    return result
+
+
+def print_capacity_report(results: list[CapacityResult], slo: SLO):
+    def fmt(value, unit="s", digits=3):
+        return f"{value:.{digits}f} {unit}" if value is not None else "N/A"
+
+    p99 = f", p99 <= {slo.p99:.2f} s" if slo.p99 is not None else ""
+    rss = f", RSS <= {slo.max_rss_mb:.0f} MB" if slo.max_rss_mb is not None else ""
+    print("\n" + "=" * 104)
+    print("CAPACITY SEARCH - SESSIONS PER WORKER")
+    print(f"SLO: p95 <= {slo.p95:.2f} s{p99}, answered >= {slo.min_completion:.0%}, CPU <= {slo.max_cpu:.0f}%{rss}")
+    print("=" * 104)
+    print(
+        f"{'Vendor':<12} | {'Sessions':>8} | {'Sent':>5} | {'OK':>5} | {'p50':>9} | {'p95':>9} | {'p99':>9} | "
+        f"{'CPU avg':>8} | {'RSS max':>10} | Status"
+    )
+    print("-" * 104)
+    for r in results:
+        for s in r.steps:
+            status = "breach: " + ", ".join(name for name, _ in s["breaches"]) if s["breaches"] else "ok"
+            print(
+                f"{r.vendor:<12} | {s['sessions']:>8} | {s['sent']:>5} | {s['answered']:>5} | {fmt(s['p50']):>9} | "
+                f"{fmt(s['p95']):>9} | {fmt(s['p99']):>9} | {fmt(s['cpu_avg'], '%', 1):>8} | "
+                f"{fmt(s['rss_max'], 'MB', 1):>10} | {status}"
+            )
+
+    print("\n" + f"{'Vendor':<12} | {'Sessions/worker':>15} | Limiting resource")
+    print("-" * 60)
+    for r in results:
+        breached = bool(r.steps and r.steps[-1]["breaches"])
+        capacity = str(r.capacity) if breached or not r.steps else f">= {r.capacity}"
+        limiting = r.limiting or "N/A"
+        if not breached and r.limiting:
+            limiting += " (closest to its limit, SLO never breached)"
+        print(f"{r.vendor:<12} | {capacity:>15} | {limiting}")
+
+
+def parse_capacity_levels(spec: str) -> tuple[int, int, int]:
+    """'start:step:max' (e.g. '1:2:16') -> (1, 2, 16). A bare number is the max with start = step = 1."""
+    parts = [int(p) for p in spec.split(":")]
+    if len(parts) == 1:
+        return 1, 1, parts[0]
+    if len(parts) != 3 or min(parts) < 1:
+        raise ValueError(f"invalid ramp '{spec}', expected start:step:max")
+    start, step, max_sessions = parts
+    return start, step, max(start, max_sessions)
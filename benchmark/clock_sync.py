@@ -0,0 +1,209 @@
+"""
+NTP-style clock offset estimation between the benchmark driver and the agent.
+
+The driver sends pings on the 'lk-bench-clock' data topic and the agent hooks answer
+with their receive (t2) and send (t3) timestamps. For every exchange:
+
+    offset = ((t2 - t1) + (t3 - t4)) / 2     (agent clock - driver clock)
+    delay  = (t4 - t1) - (t3 - t2)           (round trip, minus agent processing)
+
+The true offset lies within offset ± delay / 2, so the estimator keeps the
+lowest-delay exchange of each time window, fits offset + drift through them and
+reports every corrected timestamp with an uncertainty bound.
+"""
+
+import asyncio
+import itertools
+import math
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from livekit import rtc
+
+# The ping layout and the clock are shared with the agent hooks
+sys.path.append(str(Path(__file__).resolve().parent.parent / "agent"))
+from metric_protocol import CLOCK_TOPIC, decode_clock_ping, encode_clock_ping, precise_time
+
+
+@dataclass
+class ClockSample:
+    t1: float  # driver send
+    t2: float  # agent receive
+    t3: float  # agent send
+    t4: float  # driver receive
+
+    @property
+    def offset(self) -> float:
+        return ((self.t2 - self.t1) + (self.t3 - self.t4)) / 2
+
+    @property
+    def delay(self) -> float:
+        return (self.t4 - self.t1) - (self.t3 - self.t2)
+
+    @property
+    def midpoint(self) -> float:
+        return (self.t1 + self.t4) / 2
+
+
+class ClockOffsetEstimator:
+    """
+    Estimates offset(t) = offset0 + drift * (t - t_ref) of the agent clock relative
+    to the driver clock, where t is driver time.
+
+    Samples are grouped into windows of `window` seconds and only the minimum-delay
+    sample of each window is used (queueing only ever adds delay). Drift is fitted
+    once the selected samples span at least `min_drift_span` seconds.
+    """
+
+    def __init__(self, window: float = 1.0, min_drift_span: float = 5.0):
+        self.window = window
+        self.min_drift_span = min_drift_span
+        self.samples: list[ClockSample] = []
+        # (selected samples, fit), recomputed after add()
+        self._model: tuple[list[ClockSample], tuple[float, float, float, float]] | None = None
+
+    def add(self, sample: ClockSample):
+        if sample.delay >= 0:
+            self.samples.append(sample)
+            self._model = None
+
+    @property
+    def has_estimate(self) -> bool:
+        return bool(self.samples)
+
+    def _best_samples(self) -> list[ClockSample]:
+        best: dict[int, ClockSample] = {}
+        for s in self.samples:
+            key = math.floor(s.midpoint / self.window)
+            if key not in best or s.delay < best[key].delay:
+                best[key] = s
+        return [best[k] for k in sorted(best)]
+
+    def _fitted(self) -> tuple[list[ClockSample], tuple[float, float, float, float]]:
+        if self._model is None:
+            best = self._best_samples()
+            self._model = best, self._fit(best)
+        return self._model
+
+    def fit(self) -> tuple[float, float, float, float]:
+        """Returns (offset0, drift, t_ref, residual_rms)."""
+        return self._fitted()[1]
+
+    def _fit(self, best: list[ClockSample]) -> tuple[float, float, float, float]:
+        if not best:
+            return 0.0, 0.0, 0.0, 0.0
+
+        span = best[-1].midpoint - best[0].midpoint
+        if len(best) < 3 or span < self.min_drift_span:
+            # Not enough history for drift: take the single most precise exchange
+            tightest = min(best, key=lambda s: s.delay)
+            return tightest.offset, 0.0, tightest.midpoint, 0.0
+
+        # Least squares weighted by 1/delay^2: tight exchanges dominate the fit
+        weights = [1.0 / max(s.delay, 1e-6) ** 2 for s in best]
+        w_sum = sum(weights)
+        t_ref = sum(w * s.midpoint for w, s in zip(weights, best, strict=True)) / w_sum
+        mean_offset = sum(w * s.offset for w, s in zip(weights, best, strict=True)) / w_sum
+        sxx = sum(w * (s.midpoint - t_ref) ** 2 for w, s in zip(weights, best, strict=True))
+        sxy = sum(w * (s.midpoint - t_ref) * (s.offset - mean_offset) for w, s in zip(weights, best, strict=True))
+        drift = sxy / sxx if sxx > 0 else 0.0
+        residuals = [s.offset - (mean_offset + drift * (s.midpoint - t_ref)) for s in best]
+        rms = math.sqrt(sum(r * r for r in residuals) / len(residuals))
+        return mean_offset, drift, t_ref, rms
+
+    def offset_at(self, t: float) -> tuple[float, float]:
+        """
+        Returns (offset, uncertainty) at driver time t.
+
+        The uncertainty is half the round trip of the nearest selected exchange (the
+        NTP error bound) plus the RMS residual of the drift fit.
+        """
+        best, (offset0, drift, t_ref, rms) = self._fitted()
+        if not best:
+            return 0.0, math.inf
+        nearest = min(best, key=lambda s: abs(s.midpoint - t))
+        return offset0 + drift * (t - t_ref), nearest.delay / 2 + rms
+
+    def to_driver_time(self, agent_ts: float) -> tuple[float, float]:
+        """Maps an agent timestamp onto the driver clock. Returns (driver_ts, uncertainty)."""
+        # offset_at expects driver time; one fixed-point step is plenty for ppm-level drift
+        offset, _ = self.offset_at(agent_ts)
+        offset, uncertainty = self.offset_at(agent_ts - offset)
+        return agent_ts - offset, uncertainty
+
+    def describe(self) -> str:
+        if not self.samples:
+            return "no clock samples (agent did not answer pings)"
+        offset0, drift, _, _ = self.fit()
+        _, uncertainty = self.offset_at(self.samples[-1].midpoint)
+        return (
+            f"offset {offset0 * 1000:+.2f} ms ± {uncertainty * 1000:.2f} ms, "
+            f"drift {drift * 1e6:+.1f} ppm, {len(self.samples)} samples"
+        )
+
+
+class ClockSync:
+    """Driver side of the ping/pong exchange. Feeds a ClockOffsetEstimator."""
+
+    def __init__(self, room: rtc.Room, estimator: ClockOffsetEstimator):
+        self.room = room
+        self.estimator = estimator
+        self._seq = itertools.count(1)
+        self._pending: dict[int, float] = {}
+        self._task: asyncio.Task | None = None
+        room.on("data_received", self._on_data_received)
+
+    def _on_data_received(self, dp: rtc.DataPacket):
+        if dp.topic != CLOCK_TOPIC:
+            return
+        t4 = precise_time()
+        pong = decode_clock_ping(dp.data)
+        if pong is None:
+            return
+        seq, t1, t2, t3 = pong
+        if t2 and self._pending.pop(seq, None) == t1:
+            self.estimator.add(ClockSample(t1, t2, t3, t4))
+
+    async def ping(self):
+        seq = next(self._seq)
+        t1 = precise_time()
+        self._pending[seq] = t1
+        await self.room.local_participant.publish_data(
+            payload=encode_clock_ping(seq, t1), topic=CLOCK_TOPIC, reliable=False
+        )
+
+    async def measure(self, count: int = 16, interval: float = 0.05):
+        """Sends a burst of pings, e.g. before and after a run."""
+        for _ in range(count):
+            await self.ping()
+            await asyncio.sleep(interval)
+        # Let the last pongs arrive
+        await asyncio.sleep(0.5)
+        self._pending.clear()
+
+    def start(self, interval: float = 2.0):
+        """Keeps pinging in the background during the run to track drift."""
+
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.ping()
+                except Exception:
+                    pass
+                # Pongs older than a few intervals are never coming back
+                stale = precise_time() - 4 * interval
+                for seq in [s for s, t1 in self._pending.items() if t1 < stale]:
+                    del self._pending[seq]
+
+        self._task = asyncio.create_task(loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,12 +1,16 @@
 import asyncio
+import math
 import os
 import time
-import wave
+from dataclasses import dataclass
 from pathlib import Path
 
 import numpy as np
+from audio_analysis import BLOCK_MS, AudioResponseDetector, block_levels_dbfs, consume_audio
+from clock_sync import precise_time
 from dotenv import load_dotenv
 from livekit import api, rtc
+from sample_cache import load_sample
 
 # Load env variables
 load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
@@ -17,6 +21,7 @@ API_SECRET = os.getenv("LIVEKIT_API_SECRET")
 
 SAMPLE_RATE = 48000
 NUM_CHANNELS = 1
+SPEECH_THRESHOLD_DBFS = -45.0
 
 
 async def get_token(room_name="benchmark-room", identity="bench_driver"):
@@ -29,83 +34,78 @@ async def get_token(room_name="benchmark-room", identity="bench_driver"):
     return token.to_jwt()
 
 
-async def play_audio_file(source: rtc.AudioSource, filepath: str):
+def speech_end(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> float:
+    """Offset (s) of the end of the last audible block: trailing silence in the sample isn't speech."""
+    block = sample_rate * BLOCK_MS // 1000
+    audible = np.flatnonzero(block_levels_dbfs(samples, block) >= SPEECH_THRESHOLD_DBFS)
+    return (audible[-1] + 1) * block / sample_rate if len(audible) else len(samples) / sample_rate
+
+
+@dataclass
+class PlaybackTiming:
+    started_at: float
+    speech_end_ts: float  # when the last speech frame leaves the source: the true end of the user's speech
+    finished_at: float  # when the whole sample has played out
+
+
+async def play_pcm(
+    source: rtc.AudioSource,
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    speech_end_offset: float | None = None,
+    lead: float = 0.04,
+) -> PlaybackTiming:
+    """
+    Publishes int16 mono samples to the source in 10 ms frames at real-time speed.
+
+    Frames are memoryview slices of the one buffer (the SDK makes the only copy).
+    Frame k is pushed at start + k * 10 ms - `lead` on the monotonic clock, so a late
+    wake-up never delays the frames after it, and the source always holds
+    about `lead` seconds of audio to absorb scheduling jitter.
     """
-    Reads a WAV file, converts it to 10ms AudioFrames, and publishes
-    them to the LiveKit room at real-time speed.
+    frame_samples = sample_rate * BLOCK_MS // 1000
+    if len(samples) % frame_samples:
+        # Pad the last partial frame with silence (the only copy, and only for odd lengths)
+        samples = np.concatenate([samples, np.zeros(frame_samples - len(samples) % frame_samples, dtype=np.int16)])
+    pcm = memoryview(np.ascontiguousarray(samples, dtype=np.int16)).cast("B")
+    frame_bytes = frame_samples * 2
+    frame_count = len(pcm) // frame_bytes
+    if speech_end_offset is None:
+        speech_end_offset = speech_end(samples, sample_rate)
+    last_speech_frame = max(0, min(frame_count, math.ceil(speech_end_offset * sample_rate / frame_samples)) - 1)
+
+    interval = frame_samples / sample_rate
+    started_at = precise_time()
+    start = time.perf_counter()
+    speech_end_ts = started_at
+    for k in range(frame_count):
+        frame = rtc.AudioFrame(pcm[k * frame_bytes : (k + 1) * frame_bytes], sample_rate, NUM_CHANNELS, frame_samples)
+        await source.capture_frame(frame)
+        if k == last_speech_frame:
+            # Everything queued before and including this frame still has to play out
+            speech_end_ts = precise_time() + source.queued_duration
+        # The deadline derives from the start, so sleep overshoot doesn't accumulate into drift
+        delay = start + (k + 1) * interval - lead - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await source.wait_for_playout()
+    return PlaybackTiming(started_at, speech_end_ts, precise_time())
+
+
+async def play_audio_file(source: rtc.AudioSource, filepath: str) -> PlaybackTiming | None:
+    """
+    Publishes an audio file (any format, decoded and resampled through the sample cache)
+    to the LiveKit room at real-time speed.
     """
     if not os.path.exists(filepath):
         print(f"Error: File not found: {filepath}")
-        return
-
-    with wave.open(filepath, "rb") as wf:
-        # Verify format (Must be 48k/1ch/16bit for this simple script)
-        if wf.getframerate() != SAMPLE_RATE or wf.getnchannels() != NUM_CHANNELS:
-            print(f"Warning: {filepath} is {wf.getframerate()}Hz. Resampling recommended for best results.")
-
-        # Calculate chunk size for 10ms (standard WebRTC frame duration)
-        # 48000 Hz / 100 = 480 samples per 10ms
-        samples_per_frame = int(SAMPLE_RATE / 100)
-
-        print(f" -> Playing {filepath}...")
-
-        while True:
-            # Read raw bytes
-            data = wf.readframes(samples_per_frame)
-            if len(data) == 0:
-                break
-
-            # Convert raw bytes to Int16 Numpy Array
-            # This is crucial: LiveKit expects an array of int16 samples
-            pcm_data = np.frombuffer(data, dtype=np.int16)
-
-            # Create the AudioFrame
-            frame = rtc.AudioFrame.create(
-                sample_rate=SAMPLE_RATE,
-                num_channels=NUM_CHANNELS,
-                samples_per_channel=samples_per_frame,
-            )
-
-            # Load data into the frame (LiveKit SDK specific)
-            # We must verify the data length matches what the frame expects
-            if len(pcm_data) < samples_per_frame * NUM_CHANNELS:
-                # Pad with silence if we are at the very end and have a partial frame
-                padding = (samples_per_frame * NUM_CHANNELS) - len(pcm_data)
-                pcm_data = np.pad(pcm_data, (0, padding), "constant")
-
-            # Push to WebRTC Source
-            # Note: The usage depends on exact SDK version, but usually:
-            # frame.data[:] = pcm_data   <-- (If memory view is exposed)
-            # or we construct it differently.
-            # For current LiveKit Python SDK, AudioFrame accepts the buffer in constructor or via specific method.
-            # Let's use the safest 'create' + 'capture' flow for raw buffers:
-
-            await source.capture_frame(frame)
-
-            # BUT WAIT: The frame needs DATA.
-            # The current SDK requires creating a frame from the bytes.
-            # Correct approach for LiveKit Python > 0.4.x:
-
-            # (Re-creating frame with data for clarity)
-            # We actually create the frame FROM the buffer directly usually.
-            # Let's use the memoryview approach if 'create' creates an empty buffer.
-            # Accessing the underlying C-buffer:
-            input_audio_buffer = frame.data
-            # We need to cast our numpy array to bytes and copy it in
-            # This 'ctypes' style copy is sometimes tricky in pure python
-
-            # SIMPLER ALTERNATIVE FOR BENCHMARKING:
-            # If the SDK supports `capture_frame` with a numpy array directly (some versions do), use that.
-            # If not, we use the buffer copy:
-            # We cast the memoryview to bytes ('B') so we can copy raw bytes into it regardless of the underlying type (int16)
-            input_audio_buffer.cast("B")[:] = pcm_data.tobytes()
-
-            await source.capture_frame(frame)
-
-            # Sleep to maintain real-time playback (10ms)
-            await asyncio.sleep(0.01)
+        return None
 
+    samples = load_sample(filepath)
+    print(f" -> Playing {filepath}...")
+    timing = await play_pcm(source, samples)
     print(" -> Playback finished.")
+    return timing
 
 
 async def run_benchmark(audio_file):
@@ -127,10 +127,14 @@ async def run_benchmark(audio_file):
     await room.local_participant.publish_track(track)
 
     # 3. Setup Listener
+    detector = AudioResponseDetector(threshold_dbfs=SPEECH_THRESHOLD_DBFS)
+    media_tasks = []
+
     @room.on("track_subscribed")
     def on_track_subscribed(track, publication, participant):
-        if track.kind == rtc.TrackKind.KIND_AUDIO and participant.identity.startswith("agent"):
-            print(" -> Agent Audio Track Detected!")
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            print(f" -> Agent Audio Track Detected! ({participant.identity})")
+            media_tasks.append(asyncio.create_task(consume_audio(track, publication.sid, [detector.process])))
 
     # 4. Wait for agent to join
     print(" -> Waiting for agent to join...")
@@ -142,12 +146,19 @@ async def run_benchmark(audio_file):
     await asyncio.sleep(2)
 
     # 5. Inject Audio
-    _t_start = time.time()
-    await play_audio_file(source, audio_file)
-    _t_audio_end = time.time()
-
-    print(" -> Waiting for response...")
-    await asyncio.sleep(10)  # Listen for reply
+    detector.arm(precise_time())
+    timing = await play_audio_file(source, audio_file)
+
+    if timing:
+        print(" -> Waiting for response...")
+        response_ts = await detector.wait(timeout=10)  # Listen for reply
+        if response_ts is not None:
+            # Measured from the end of the user's speech, not from the end of the file
+            print(f" -> ⚡ Voice-to-voice latency: {response_ts - timing.speech_end_ts:.3f}s")
+        else:
+            print(" -> ❌ No response within 10s")
+    for task in media_tasks:
+        task.cancel()
     await room.disconnect()
 
 
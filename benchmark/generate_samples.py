@@ -1,46 +1,282 @@
+"""
+Builds the spoken benchmark samples in benchmark/audio_samples.
+
+The prompts are the three built-in restaurant samples (01_greeting, ...) plus every
+scenario file (`benchmark/scenarios*.json`, a JSON list of prompts). Each scenario
+file gets its own subdirectory, which `run_scenarios.py --audio-dir` can play.
+
+Samples are synthesized in a process pool by a pluggable backend:
+
+- `gtts`: Google TTS (needs the network); the voice is a language, optionally with a
+  regional domain ("en", "en:co.uk");
+- `tone`: offline and deterministic. Every syllable is a harmonic tone shaped by
+  vowel formants, with a duration that depends only on the text (see tone_duration).
+  It builds the whole corpus in seconds without a network, for air-gapped CI.
+  The voice is the base pitch in Hz.
+
+The build is incremental. A manifest next to the samples records a hash of each
+sample's text, backend, voice and format, and a sample whose hash is unchanged
+is not rebuilt.
+
+    python benchmark/generate_samples.py                                # gTTS, OGG/Opus
+    python benchmark/generate_samples.py --backend tone --format wav -j 8
+"""
+
+import glob
+import hashlib
+import json
 import os
+import re
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
 
-from gtts import gTTS
-from pydub import AudioSegment
+import numpy as np
 
 OUTPUT_DIR = "benchmark/audio_samples"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+SCENARIO_FILES = sorted(glob.glob(str(Path(__file__).resolve().parent / "scenarios*.json")))
+MANIFEST = ".manifest.json"
+
+SAMPLE_RATE = 48000
+FORMATS = ("ogg", "wav")
 
 prompts = [
     {
-        "filename": "01_greeting.ogg",
+        "filename": "01_greeting",
         "text": "Hello, do you have a table for two people?",
     },
     {
-        "filename": "02_order_complex.ogg",
+        "filename": "02_order_complex",
         "text": "I would like the spicy chicken burger, but without onions, and a large coke.",
     },
     {
-        "filename": "03_bill.ogg",
+        "filename": "03_bill",
         "text": "Can I get the bill please? We are paying by card.",
     },
 ]
 
-print(f"Generating {len(prompts)} audio samples in '{OUTPUT_DIR}'...")
+# Tone backend timing (seconds): a known duration for any text
+LEAD_SILENCE = 0.2
+TAIL_SILENCE = 0.4
+SYLLABLE_SECONDS = 0.18
+WORD_GAP_SECONDS = 0.06
+PAUSE_SECONDS = {",": 0.2, ";": 0.2, ":": 0.2, ".": 0.35, "?": 0.35, "!": 0.35}
+
+# F1-F3 (Hz) of the vowel each syllable is voiced with
+VOWEL_FORMANTS = {
+    "a": (730, 1090, 2440),
+    "e": (530, 1840, 2480),
+    "i": (270, 2290, 3010),
+    "o": (570, 840, 2410),
+    "u": (300, 870, 2240),
+    "y": (270, 2290, 3010),
+}
+FORMANT_BANDWIDTH = 90.0
+MAX_HARMONIC_HZ = 5000.0
+
+
+def syllables(word: str) -> list[str]:
+    """Vowel groups of a word (at least one): the tone backend voices one syllable per group."""
+    return re.findall(r"[aeiouy]+", word.lower()) or ["a"]
+
+
+def tone_segments(text: str) -> list[tuple[str, float]]:
+    """(vowel or '' for silence, seconds) for the speech part of a text."""
+    segments = []
+    for word, punctuation in re.findall(r"([A-Za-z0-9']+)([,;:.?!]?)", text):
+        segments += [(group[0], SYLLABLE_SECONDS) for group in syllables(word)]
+        segments.append(("", PAUSE_SECONDS.get(punctuation, WORD_GAP_SECONDS)))
+    if segments:
+        segments.pop()  # no pause after the last word
+    return segments
+
+
+def tone_duration(text: str) -> tuple[float, float]:
+    """(end of speech, total duration) of the tone backend's rendering of `text`, in seconds."""
+    speech = sum(seconds for _, seconds in tone_segments(text))
+    return LEAD_SILENCE + speech, LEAD_SILENCE + speech + TAIL_SILENCE
+
+
+def formant_syllable(vowel: str, n: int, f0: float, sample_rate: int) -> np.ndarray:
+    """A voiced syllable: harmonics of f0 weighted by the vowel's formant resonances, with a short fade."""
+    t = np.arange(n) / sample_rate
+    # Slightly falling pitch within the syllable
+    pitch = f0 * (1.05 - 0.1 * t / (n / sample_rate))
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    harmonics = np.arange(1, int(MAX_HARMONIC_HZ // f0) + 1)
+    frequencies = harmonics * f0
+    weights = sum(
+        1 / (1 + ((frequencies - formant) / FORMANT_BANDWIDTH) ** 2) for formant in VOWEL_FORMANTS[vowel]
+    ) / np.sqrt(harmonics)
+    signal = np.sin(np.outer(phase, harmonics)) @ weights
+    fade = min(n // 4, int(0.02 * sample_rate))
+    envelope = np.ones(n)
+    envelope[:fade] = np.linspace(0, 1, fade)
+    envelope[n - fade :] = np.linspace(1, 0, fade)
+    return signal * envelope
+
+
+class ToneBackend:
+    name = "tone"
+    version = 1
+
+    def __init__(self, voice: str | None = None):
+        self.voice = voice or "120"
+        self.f0 = float(self.voice)
+
+    def synthesize(self, text: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+        segments = tone_segments(text)
+        parts = [np.zeros(int(LEAD_SILENCE * sample_rate))]
+        for i, (vowel, seconds) in enumerate(segments):
+            n = int(round(seconds * sample_rate))
+            # Intonation declines over the sentence
+            f0 = self.f0 * (1.15 - 0.3 * i / max(1, len(segments)))
+            parts.append(formant_syllable(vowel, n, f0, sample_rate) if vowel else np.zeros(n))
+        parts.append(np.zeros(int(TAIL_SILENCE * sample_rate)))
+        signal = np.concatenate(parts)
+        peak = np.abs(signal).max()
+        return (0.5 * signal / peak if peak else signal).astype(np.float32)
+
+
+class GTTSBackend:
+    name = "gtts"
+    version = 1
+
+    def __init__(self, voice: str | None = None):
+        self.voice = voice or "en"
+        self.lang, _, self.tld = self.voice.partition(":")
+
+    def synthesize(self, text: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+        import io
+
+        from gtts import gTTS
+        from pydub import AudioSegment
+
+        mp3 = io.BytesIO()
+        gTTS(text, lang=self.lang, tld=self.tld or "com").write_to_fp(mp3)
+        mp3.seek(0)
+        sound = AudioSegment.from_mp3(mp3).set_frame_rate(sample_rate).set_channels(1).set_sample_width(2)
+        return np.frombuffer(sound.raw_data, dtype=np.int16).astype(np.float32) / 32768
+
+
+BACKENDS = {backend.name: backend for backend in (GTTSBackend, ToneBackend)}
+
+
+@dataclass
+class SampleJob:
+    path: str
+    text: str
+    backend: str
+    voice: str | None
+    format: str
+
+    def key(self) -> str:
+        """Hash of everything the sample's audio depends on."""
+        backend = BACKENDS[self.backend](self.voice)
+        spec = {**asdict(self), "path": None, "voice": backend.voice, "version": backend.version}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def slug(text: str, length: int = 32) -> str:
+    return "_".join(re.findall(r"[a-z0-9]+", text.lower()))[:length].rstrip("_")
+
+
+def sample_jobs(
+    output_dir: str, scenario_files: list[str], backend: str, voice: str | None, fmt: str
+) -> list[SampleJob]:
+    """The built-in samples at the top of `output_dir`, one subdirectory per scenario file."""
+    jobs = [
+        SampleJob(os.path.join(output_dir, f"{p['filename']}.{fmt}"), p["text"], backend, voice, fmt) for p in prompts
+    ]
+    for scenario_file in scenario_files:
+        with open(scenario_file) as f:
+            texts = json.load(f)
+        directory = os.path.join(output_dir, Path(scenario_file).stem)
+        jobs += [
+            SampleJob(os.path.join(directory, f"{i:02d}_{slug(text)}.{fmt}"), text, backend, voice, fmt)
+            for i, text in enumerate(texts, 1)
+        ]
+    return jobs
+
+
+def write_sample(path: str, samples: np.ndarray, fmt: str, sample_rate: int = SAMPLE_RATE):
+    pcm = np.clip(np.round(samples * 32768), -32768, 32767).astype(np.int16)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if fmt == "wav":
+        with wave.open(tmp, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(sample_rate)
+            wf.writeframes(pcm.tobytes())
+    else:
+        from pydub import AudioSegment
+
+        # OGG/Opus at 48 kHz mono - LiveKit compatible
+        sound = AudioSegment(pcm.tobytes(), frame_rate=sample_rate, sample_width=2, channels=1)
+        sound.export(tmp, format="ogg", codec="libopus")
+    os.replace(tmp, path)
+
+
+def build_sample(job: SampleJob) -> tuple[str, str, float]:
+    """Synthesizes and writes one sample (runs in a pool worker). Returns (path, key, seconds)."""
+    samples = BACKENDS[job.backend](job.voice).synthesize(job.text)
+    write_sample(job.path, samples, job.format)
+    return job.path, job.key(), len(samples) / SAMPLE_RATE
+
+
+def build(jobs: list[SampleJob], output_dir: str, workers: int | None = None, force: bool = False) -> dict:
+    """Builds the samples whose key changed. Returns {'built': [...], 'skipped': [...]} of paths."""
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    def key_of(path):
+        return os.path.relpath(path, output_dir)
+
+    todo = [j for j in jobs if force or not os.path.exists(j.path) or manifest.get(key_of(j.path)) != j.key()]
+    skipped = [j.path for j in jobs if j not in todo]
+    print(f"Generating {len(todo)} audio sample(s) in '{output_dir}' ({len(skipped)} unchanged)...")
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 and len(todo) > 1 else None
+    built = []
+    try:
+        for path, key, seconds in pool.map(build_sample, todo) if pool else map(build_sample, todo):
+            manifest[key_of(path)] = key
+            built.append(path)
+            print(f" -> {path} ({seconds:.2f}s)")
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        # Keep what was built even if a later sample failed
+        os.makedirs(output_dir, exist_ok=True)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    return {"built": built, "skipped": skipped}
+
 
-for p in prompts:
-    print(f" -> Generating: {p['filename']}...")
-    # 1. Generate MP3 with Google TTS
-    mp3_path = os.path.join(OUTPUT_DIR, "temp.mp3")
-    tts = gTTS(p["text"], lang="en")
-    tts.save(mp3_path)
+def main():
+    import argparse
 
-    # 2. Convert to OGG (48kHz, Mono, Opus) - LiveKit Compatible
-    sound = AudioSegment.from_mp3(mp3_path)
-    # Opus usually likes 48kHz.
-    sound = sound.set_frame_rate(48000).set_channels(1)
+    parser = argparse.ArgumentParser(description="Build the spoken benchmark samples")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Directory the samples are written to")
+    parser.add_argument(
+        "--scenarios", nargs="*", default=SCENARIO_FILES, help="Scenario files (JSON list of prompts) to voice"
+    )
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="gtts", help="Synthesis backend")
+    parser.add_argument("--voice", help="Backend voice (gtts: language[:domain], tone: base pitch in Hz)")
+    parser.add_argument("--format", choices=FORMATS, default="ogg", help="ogg (Opus, needs ffmpeg) or wav")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every sample")
+    args = parser.parse_args()
 
-    out_path = os.path.join(OUTPUT_DIR, p["filename"])
-    # Export as OGG with libopus codec
-    sound.export(out_path, format="ogg", codec="libopus")
+    jobs = sample_jobs(args.output_dir, args.scenarios, args.backend, args.voice, args.format)
+    build(jobs, args.output_dir, args.jobs, args.force)
+    print("Done! Ready for benchmarking.")
 
-    # Cleanup
-    if os.path.exists(mp3_path):
-        os.remove(mp3_path)
 
-print("Done! Ready for benchmarking.")
+if __name__ == "__main__":
+    main()
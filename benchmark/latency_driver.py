@@ -0,0 +1,543 @@
+"""
+The benchmark driver's building blocks: the agent worker runner, the metric records
+it collects, and the latency test that sends prompts to a room and times the answers.
+
+system_benchmark.py is the command line around these; the load, open-loop,
+capacity and matrix modes import them from here.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from dotenv import load_dotenv
+from livekit import api, rtc
+
+# Shared metric record layout lives next to the agent hooks
+sys.path.append(str(Path(__file__).resolve().parent.parent / "agent"))
+from audio_analysis import AudioContinuityAnalyzer, AudioResponseDetector, consume_audio
+from clock_sync import ClockOffsetEstimator, ClockSync, precise_time
+from latency_histogram import REPORT_PERCENTILES, LatencyHistogram
+from lipsync import LipSyncAnalyzer
+from metric_protocol import METRIC_SOCKET_ENV, METRIC_TOPIC, MetricRecord, MetricSocketReader, decode_metrics
+from think_time import ThinkTime
+from turn_detection import AGENT_STATE_ATTRIBUTE, TurnCompletionDetector
+from video_analysis import VideoSmoothnessAnalyzer, VisualResponseDetector, consume_video
+
+# Load env variables
+load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
+
+LIVEKIT_URL = os.getenv("LIVEKIT_URL", "ws://localhost:7880")
+API_KEY = os.getenv("LIVEKIT_API_KEY", "devkey")
+API_SECRET = os.getenv("LIVEKIT_API_SECRET", "secret")
+
+
+@dataclass
+class AgentMetric:
+    timestamp: float
+    type: str
+    data: list
+    request_id: str | None = None
+
+
+def parse_metric_line(line: str) -> AgentMetric | None:
+    """
+    Parses a '[METRIC] <TYPE> <timestamp> <request_id> <data...>' line.
+
+    The trailing data is split at most once more so prompt text containing spaces
+    stays in a single field.
+    """
+    if not line.startswith("[METRIC]"):
+        return None
+    parts = line.split(" ", 4)
+    if len(parts) < 4:
+        return None
+    try:
+        m_ts = float(parts[2])
+    except ValueError:
+        return None
+    request_id = parts[3] if parts[3] != "-" else None
+    m_data = parts[4].split(" ", 1) if len(parts) > 4 else []
+    return AgentMetric(m_ts, parts[1], m_data, request_id)
+
+
+def metric_from_record(record: MetricRecord) -> AgentMetric:
+    """Converts a binary channel record into the same shape parse_metric_line produces."""
+    data = [f"{record.value:.0f}"] if record.value else []
+    if record.label:
+        data.append(record.label)
+    return AgentMetric(record.timestamp, record.type, data, record.request_id)
+
+
+def index_agent_metrics(metrics: list[AgentMetric]) -> dict[str, dict[str, AgentMetric]]:
+    """
+    Builds a request_id -> {"received": ..., "speaking": ...} index in a single pass.
+
+    Only the earliest AGENT_RECEIVED and AGENT_STATE 'speaking' per request are kept
+    (metrics may arrive out of order or twice when several transports are merged),
+    so joining driver results against it is O(prompts + metrics).
+    """
+    index: dict[str, dict[str, AgentMetric]] = {}
+    for m in metrics:
+        if m.request_id is None:
+            continue
+        if m.type == "AGENT_RECEIVED":
+            key = "received"
+        elif m.type == "AGENT_STATE" and m.data and m.data[0] == "speaking":
+            key = "speaking"
+        else:
+            continue
+        entry = index.setdefault(m.request_id, {})
+        current = entry.get(key)
+        if current is None or m.timestamp < current.timestamp:
+            entry[key] = m
+    return index
+
+
+def turn_breakdown(
+    res: dict, matched: dict[str, AgentMetric], clock: ClockOffsetEstimator | None = None
+) -> dict[str, float | None]:
+    """
+    Component latencies of one prompt: 'uplink' (with its clock 'uplink_uncertainty')
+    and 'thinking', from the agent metrics matched to its request ID.
+    """
+    turn = {"uplink": None, "uplink_uncertainty": None, "thinking": None}
+    found_received = matched.get("received")
+    found_speaking = matched.get("speaking")
+    if found_received:
+        # LiveKit Latency: Received Time (S) - Sent Time (S)
+        # Cross-process delta: map the agent timestamp onto the driver clock first
+        recv_ts = found_received.timestamp
+        if clock is not None and clock.has_estimate:
+            recv_driver_ts, turn["uplink_uncertainty"] = clock.to_driver_time(recv_ts)
+        else:
+            recv_driver_ts = recv_ts
+        turn["uplink"] = recv_driver_ts - res["sent_ts"]
+
+        if found_speaking:
+            # Processing Latency: Speaking Time (S) - Received Time (S)
+            # (both agent timestamps: same clock, no correction needed)
+            turn["thinking"] = found_speaking.timestamp - recv_ts
+    return turn
+
+
+def latency_breakdown(
+    results: list[dict],
+    metrics_by_request: dict[str, dict[str, AgentMetric]],
+    clock: ClockOffsetEstimator | None = None,
+) -> dict[str, list[float]]:
+    """
+    Splits each answered prompt into its component latencies.
+
+    Returns lists for 'uplink' (with 'uplink_uncertainty' when the clock is
+    corrected), 'thinking', 'total' and, for avatars, 'first_frame' and
+    'mouth_motion'.
+    """
+    livekit_delays = []
+    livekit_uncertainty = []
+    process_delays = []
+    total_delays = []
+    first_frame_delays = [res["first_frame_latency"] for res in results if res.get("first_frame_latency") is not None]
+    mouth_delays = [res["mouth_latency"] for res in results if res.get("mouth_latency") is not None]
+
+    for res in results:
+        if not res["response_ts"]:
+            continue
+
+        total_delays.append(res["total_latency"])
+        turn = turn_breakdown(res, metrics_by_request.get(res["request_id"], {}), clock)
+        if turn["uplink"] is not None:
+            livekit_delays.append(turn["uplink"])
+        if turn["uplink_uncertainty"] is not None:
+            livekit_uncertainty.append(turn["uplink_uncertainty"])
+        if turn["thinking"] is not None:
+            process_delays.append(turn["thinking"])
+
+    return {
+        "uplink": livekit_delays,
+        "uplink_uncertainty": livekit_uncertainty,
+        "thinking": process_delays,
+        "total": total_delays,
+        "first_frame": first_frame_delays,
+        "mouth_motion": mouth_delays,
+    }
+
+
+# Logged by livekit-agents once the worker is registered with the server and can take jobs
+WORKER_READY_LOG = "registered worker"
+
+
+class AgentRunner:
+    def __init__(
+        self, script_path: str, echo_logs: bool = True, metric_socket: bool = True, env: dict[str, str] | None = None
+    ):
+        self.script_path = script_path
+        self.echo_logs = echo_logs
+        self.metric_socket = metric_socket
+        self.env = env or {}
+        self.process = None
+        self.metrics: list[AgentMetric] = []
+        self.ready = threading.Event()
+        self._log_thread = None
+        self._metric_reader: MetricSocketReader | None = None
+        self._metric_thread = None
+
+    def _read_logs(self):
+        # Fallback metric path: '[METRIC]' lines on stdout (used when the socket is unavailable)
+        while True:
+            if self.process and self.process.stdout:
+                line = self.process.stdout.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    if self.echo_logs:
+                        print(f"[AGENT] {line}")  # Debug
+                    if WORKER_READY_LOG in line:
+                        self.ready.set()
+                    metric = parse_metric_line(line)
+                    if metric:
+                        self.metrics.append(metric)
+            else:
+                break
+
+    def _read_metric_socket(self):
+        reader = self._metric_reader
+        while reader is not None:
+            records = reader.recv()
+            if records is None:
+                break
+            for record in records:
+                self.metrics.append(metric_from_record(record))
+
+    def start(self):
+        print(f"🚀 Starting Agent: {self.script_path}")
+        # Assuming run with `python <script>`
+        env = {**os.environ, **self.env}
+        if self.metric_socket:
+            try:
+                self._metric_reader = MetricSocketReader()
+                env[METRIC_SOCKET_ENV] = self._metric_reader.path
+                self._metric_thread = threading.Thread(target=self._read_metric_socket, daemon=True)
+                self._metric_thread.start()
+            except (OSError, AttributeError) as e:
+                print(f"   -> Metric socket unavailable ({e}), falling back to stdout parsing")
+                self._metric_reader = None
+
+        cmd = [sys.executable, "-u", self.script_path, "dev"]  # -u for unbuffered
+        # stderr is merged into stdout so the agent's logging can never fill an unread pipe
+        self.process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, env=env
+        )
+        self._log_thread = threading.Thread(target=self._read_logs, daemon=True)
+        self._log_thread.start()
+
+        return self.process.pid
+
+    def wait_ready(self, timeout: float = 30.0) -> bool:
+        """Blocks until the worker has registered (or exited, or `timeout` passed). Returns whether it is ready."""
+        deadline = time.monotonic() + timeout
+        while not self.ready.wait(0.2):
+            if self.process is None or self.process.poll() is not None or time.monotonic() > deadline:
+                return False
+        return True
+
+    def stop(self):
+        if self.process:
+            print(f"🛑 Stopping Agent (PID: {self.process.pid})...")
+            # Check if process is still running
+            if self.process.poll() is None:
+                try:
+                    self.process.terminate()
+                    try:
+                        self.process.wait(timeout=5)
+                    except subprocess.TimeoutExpired:
+                        print("   -> Agent did not stop politely, killing...")
+                        self.process.kill()
+                        self.process.wait(timeout=1)
+                except Exception as e:
+                    print(f"   -> Error stopping agent: {e}")
+
+            self.process = None
+
+        if self._metric_reader:
+            self._metric_reader.close()
+            self._metric_reader = None
+
+
+def driver_token(room_name: str, identity: str = "bench_driver") -> str:
+    return (
+        api.AccessToken(API_KEY, API_SECRET)
+        .with_identity(identity)
+        .with_name("Benchmark Driver")
+        .with_grants(api.VideoGrants(room_join=True, room=room_name))
+        .to_jwt()
+    )
+
+
+async def send_prompt(room: rtc.Room, text: str, request_id: str) -> float:
+    """
+    Sends a chat prompt via Data Packet (standard LiveKit chat protocol).
+
+    The request ID is echoed by the agent hooks on every metric for this prompt.
+    Returns the send timestamp (precise_time).
+    """
+    t_sent = precise_time()
+    chat_data = json.dumps({"message": text, "timestamp": int(t_sent * 1000), "request_id": request_id}).encode("utf-8")
+    await room.local_participant.publish_data(payload=chat_data, topic="lk-chat-topic", reliable=True)
+    return t_sent
+
+
+async def run_latency_test(
+    room_name: str,
+    text_prompts: Iterable[str],
+    clock: ClockOffsetEstimator | None = None,
+    identity: str = "bench_driver",
+    prompt_gap: float | str | ThinkTime = 1.0,
+    turn_timeout: float = 30.0,
+    silence: float = 0.8,
+    response_timeout: float = 15.0,
+):
+    """
+    Sends each prompt over chat and measures the client-side response latency.
+
+    Returns (in-band agent metrics, per-prompt results). The in-band metrics are the
+    records the agent published on METRIC_TOPIC, if it has in-band reporting enabled.
+
+    If `clock` is given, it is fed with ping/pong exchanges before, during and after
+    the run so agent timestamps can be mapped onto the driver clock.
+
+    `identity` must be unique per room when several drivers run concurrently.
+
+    A prompt without a response (audio, or mouth motion for video agents) within
+    `response_timeout` seconds is a timeout. Otherwise it is followed by the agent's end
+    of turn: its state back to listening, or `silence` seconds without audio after it
+    spoke (at most `turn_timeout` after the prompt). `prompt_gap` is the think time
+    after that, in seconds or as a ThinkTime distribution.
+    """
+    think_time = ThinkTime.of(prompt_gap)
+    # Connect as a driver
+    token = driver_token(room_name, identity)
+
+    room = rtc.Room()
+
+    # The response is the first audible frame on any remote audio track (agent or avatar);
+    # avatar video tracks give the first frame and first mouth motion after each prompt
+    detector = AudioResponseDetector()
+    visual = VisualResponseDetector()
+    smoothness = VideoSmoothnessAnalyzer()
+    continuity = AudioContinuityAnalyzer()
+    completion = TurnCompletionDetector(silence=silence)
+    # One lip-sync analyzer per participant, pairing its own audio and video
+    lipsync: dict[str, LipSyncAnalyzer] = {}
+    media_tasks: list[asyncio.Task] = []
+
+    @room.on("track_subscribed")
+    def on_track_subscribed(track: rtc.Track, publication: rtc.RemoteTrackPublication, participant):
+        analyzer = lipsync.setdefault(participant.identity, LipSyncAnalyzer())
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            print(f"   -> 🔊 Listening to {participant.identity} ({publication.sid})")
+            handlers = [
+                detector.process,
+                completion.process,
+                continuity.process,
+                lambda _key, samples, rate, ts: analyzer.process_audio(samples, rate, ts),
+            ]
+            media_tasks.append(asyncio.create_task(consume_audio(track, publication.sid, handlers)))
+        elif track.kind == rtc.TrackKind.KIND_VIDEO:
+            print(f"   -> 🎥 Watching {participant.identity} ({publication.sid})")
+            handlers = [
+                visual.process,
+                smoothness.process,
+                lambda key, _luma, ts: analyzer.process_video(visual.mouth_roi(key), ts),
+            ]
+            media_tasks.append(asyncio.create_task(consume_video(track, publication.sid, handlers)))
+
+    @room.on("participant_attributes_changed")
+    def on_attributes_changed(changed: dict[str, str], participant: rtc.Participant):
+        if AGENT_STATE_ATTRIBUTE in changed:
+            completion.on_agent_state(changed[AGENT_STATE_ATTRIBUTE], precise_time())
+
+    # In-band agent metrics (agents in containers / on other hosts)
+    inband_metrics: list[AgentMetric] = []
+
+    @room.on("data_received")
+    def on_data_received(dp: rtc.DataPacket):
+        if dp.topic == METRIC_TOPIC:
+            inband_metrics.extend(metric_from_record(r) for r in decode_metrics(dp.data))
+
+    clock_sync = ClockSync(room, clock) if clock is not None else None
+
+    try:
+        await room.connect(LIVEKIT_URL, token)
+        print("   -> Connected to Room")
+
+        # Wait for agent
+        print("   -> Waiting for agent to join...")
+        start_wait = time.time()
+        while len(room.remote_participants) == 0:
+            if time.time() - start_wait > 30:
+                print("   -> ⚠️  Timeout waiting for agent to join room")
+                return inband_metrics, []
+            await asyncio.sleep(0.5)
+        print("   -> Agent found!")
+
+        # Collect detailed latencies
+        test_results = []  # List of dicts
+
+        # Give a moment
+        await asyncio.sleep(2)
+
+        if clock_sync:
+            await clock_sync.measure()
+            print(f"   -> 🕒 Clock sync: {clock.describe()}")
+            clock_sync.start()
+
+        for text in text_prompts:
+            request_id = uuid.uuid4().hex
+            print(f"\n   -> 📨 Sending: '{text}' (request {request_id[:8]})")
+            # Armed before sending so no frame between send and arm can be missed
+            armed_at = precise_time()
+            detector.arm(armed_at)
+            visual.arm(armed_at)
+            completion.arm(armed_at)
+            for analyzer in lipsync.values():
+                analyzer.start_turn(request_id)
+            smoothness.start_turn(request_id)
+            continuity.start_turn(request_id)
+            t_sent = await send_prompt(room, text, request_id)
+
+            t_response_detected = await detector.wait(timeout=response_timeout)
+            responded = t_response_detected is not None
+            if responded:
+                print(f"   -> ⚡ Response detected in {(t_response_detected - t_sent):.3f}s")
+
+            t_mouth = None
+            if visual.has_video:
+                # The mouth usually moves around the audio onset; wait out the rest of the timeout at most
+                t_mouth = await visual.wait(timeout=max(0.0, response_timeout - (precise_time() - t_sent)))
+                if t_mouth is not None:
+                    print(f"   -> 👄 Mouth motion after {(t_mouth - t_sent):.3f}s")
+            t_first_frame = visual.first_frame_ts
+
+            # End of the agent's turn instead of a fixed wait (nothing to wait for if it never answered)
+            turn_end = None
+            if responded:
+                turn_end = await completion.wait(timeout=max(0.0, turn_timeout - (precise_time() - t_sent)))
+                if turn_end is not None:
+                    print(f"   -> 🏁 Turn ended after {(turn_end.ts - t_sent):.3f}s ({turn_end.reason})")
+                else:
+                    print(f"   -> ⚠️  Turn still running after {turn_timeout:.0f}s, moving on")
+
+            test_results.append(
+                {
+                    "request_id": request_id,
+                    "prompt": text,
+                    "sent_ts": t_sent,
+                    "response_ts": t_response_detected if responded else None,
+                    "total_latency": (t_response_detected - t_sent) if responded else None,
+                    "first_frame_latency": (t_first_frame - t_sent) if t_first_frame else None,
+                    "mouth_latency": (t_mouth - t_sent) if t_mouth else None,
+                    "turn_duration": (turn_end.ts - t_sent) if turn_end else None,
+                    "turn_end": turn_end.reason if turn_end else None,
+                }
+            )
+
+            if not responded:
+                print("   -> ❌ Timeout waiting for response")
+
+            # Think time before the next prompt
+            await asyncio.sleep(think_time())
+
+        for res in test_results:
+            res["av_offsets"] = [o for a in lipsync.values() for o in a.offsets.get(res["request_id"], [])]
+            res["video"] = smoothness.summary(res["request_id"])
+            res["audio"] = continuity.summary(res["request_id"])
+
+        if clock_sync:
+            await clock_sync.stop()
+            await clock_sync.measure()
+            print(f"   -> 🕒 Clock sync: {clock.describe()}")
+
+    finally:
+        for task in media_tasks:
+            task.cancel()
+        try:
+            await room.disconnect()
+        except Exception:
+            pass
+
+    return inband_metrics, test_results
+
+
+def stored_turns(
+    results: list[dict], metrics_by_request: dict[str, dict[str, AgentMetric]], clock: ClockOffsetEstimator | None
+) -> list[dict]:
+    """Per-turn rows for the results store: every latency component plus the media summaries."""
+    turns = []
+    for res in results:
+        turn = turn_breakdown(res, metrics_by_request.get(res["request_id"], {}), clock)
+        turns.append(
+            {
+                "request_id": res["request_id"],
+                "prompt": res["prompt"],
+                "sent_ts": res["sent_ts"],
+                "total": res["total_latency"],
+                "uplink": turn["uplink"],
+                "thinking": turn["thinking"],
+                "first_frame": res.get("first_frame_latency"),
+                "mouth_motion": res.get("mouth_latency"),
+                "details": {
+                    "turn_duration": res.get("turn_duration"),
+                    "turn_end": res.get("turn_end"),
+                    "uplink_uncertainty": turn["uplink_uncertainty"],
+                    "av_offsets": res.get("av_offsets"),
+                    "audio": res.get("audio"),
+                    "video": res.get("video"),
+                },
+            }
+        )
+    return turns
+
+
+def histogram_of(values: list[float]) -> LatencyHistogram:
+    hist = LatencyHistogram()
+    for v in values:
+        hist.record(v)
+    return hist
+
+
+def print_latency_report(histograms: dict[str, LatencyHistogram], confidence: float = 0.95):
+    """Percentile table with bootstrap confidence intervals, one row per latency component."""
+
+    def fmt(value):
+        return f"{value:.3f}" if value is not None else "N/A"
+
+    def fmt_ci(ci):
+        return f"{ci[0]:.3f}-{ci[1]:.3f}" if ci is not None else ""
+
+    width = 30 + 9 + 14 * len(REPORT_PERCENTILES)
+    print("\n" + "=" * width)
+    print("BENCHMARK RESULTS - LATENCY BREAKDOWN (seconds)")
+    print("=" * width)
+    print(f"{'Metric':<30} | {'N':>4} | " + " | ".join(f"{f'p{q:g}':>11}" for q in REPORT_PERCENTILES))
+    print("-" * width)
+    for name, hist in histograms.items():
+        print(
+            f"{name:<30} | {hist.count:>4} | "
+            + " | ".join(f"{fmt(hist.percentile(q)):>11}" for q in REPORT_PERCENTILES)
+        )
+        if hist.count:
+            label = f"  {confidence:.0%} CI"
+            print(
+                f"{label:<30} | {'':>4} | "
+                + " | ".join(f"{fmt_ci(hist.bootstrap_ci(q, confidence)):>11}" for q in REPORT_PERCENTILES)
+            )
@@ -0,0 +1,169 @@
+"""
+Streaming lip-sync (A/V offset) measurement on the avatar's received streams.
+
+Two signals are sampled onto a common 10 ms grid in fixed-size ring buffers:
+
+- the audio energy envelope (RMS of each 10 ms block of the avatar's audio),
+- mouth openness from the video (fraction of dark pixels in the mouth region,
+  held between frames).
+
+Every `hop` seconds the most recent `window` of audio is cross-correlated against
+the mouth signal at every lag within ±`max_lag`, all lags at once as one
+NumPy matrix product. The best lag is the A/V offset: positive means the mouth
+moves after the sound (video late). Windows with too little speech or
+motion, or a weak correlation peak, are skipped. Memory stays constant however long
+the run is, because only the ring buffers and the per-turn offsets are kept.
+"""
+
+import math
+
+import numpy as np
+from audio_analysis import BLOCK_MS, block_levels_dbfs
+
+BIN_S = BLOCK_MS / 1000
+
+
+def mouth_openness(roi: np.ndarray) -> float:
+    """Fraction of the mouth region clearly darker than its median (the open mouth cavity)."""
+    return float(np.mean(roi < 0.6 * np.median(roi)))
+
+
+class _Ring:
+    """Fixed-size ring buffer of one value per 10 ms bin, remembering which bin each slot holds."""
+
+    def __init__(self, size: int):
+        self.values = np.zeros(size, dtype=np.float32)
+        self.bins = np.full(size, -1, dtype=np.int64)
+        self.last_bin = -1
+
+    def put(self, bins: np.ndarray, values: np.ndarray):
+        slots = bins % len(self.values)
+        self.values[slots] = values
+        self.bins[slots] = bins
+        self.last_bin = max(self.last_bin, int(bins[-1]))
+
+    def get(self, first_bin: int, count: int, hold: bool = False) -> np.ndarray | None:
+        """Values for bins [first_bin, first_bin + count). Missing bins are 0, or the last value with `hold`."""
+        wanted = np.arange(first_bin, first_bin + count)
+        slots = wanted % len(self.values)
+        present = self.bins[slots] == wanted
+        if not present.any():
+            return None
+        values = np.where(present, self.values[slots], 0.0)
+        if hold:
+            # Forward-fill gaps with the most recent present value (frames are ~3-4 bins apart)
+            last = np.maximum.accumulate(np.where(present, np.arange(count), -1))
+            values = np.where(last >= 0, values[np.maximum(last, 0)], values[present.argmax()])
+        return values
+
+
+class LipSyncAnalyzer:
+    def __init__(
+        self,
+        window: float = 2.0,
+        hop: float = 0.5,
+        max_lag: float = 0.5,
+        min_correlation: float = 0.3,
+        silence_dbfs: float = -45.0,
+    ):
+        self.window_bins = round(window / BIN_S)
+        self.hop_bins = round(hop / BIN_S)
+        self.lag_bins = round(max_lag / BIN_S)
+        self.min_correlation = min_correlation
+        self.silence_dbfs = silence_dbfs
+        size = self.window_bins + 2 * self.lag_bins + math.ceil(1.0 / BIN_S)  # + 1 s of arrival slack
+        self._audio = _Ring(size)
+        self._mouth = _Ring(size)
+        self._next_eval_bin: int | None = None
+        self.turn: str | None = None
+        self.offsets: dict[str | None, list[float]] = {}
+
+    def start_turn(self, turn: str | None):
+        """Offsets measured from now on are attributed to `turn` (e.g. a request ID)."""
+        self.turn = turn
+
+    def process_audio(self, samples: np.ndarray, sample_rate: int, received_ts: float):
+        block = sample_rate * BLOCK_MS // 1000
+        levels = block_levels_dbfs(samples, block)
+        if len(levels) == 0:
+            return
+        last_bin = math.floor(received_ts / BIN_S)
+        bins = np.arange(last_bin - len(levels) + 1, last_bin + 1)
+        # Energy envelope in dB above the silence floor, so pauses are 0 and loudness is compressed
+        self._audio.put(bins, np.maximum(levels - self.silence_dbfs, 0.0))
+        self._maybe_evaluate()
+
+    def process_video(self, roi: np.ndarray, received_ts: float):
+        self._mouth.put(np.array([math.floor(received_ts / BIN_S)]), np.array([mouth_openness(roi)]))
+        self._maybe_evaluate()
+
+    def _maybe_evaluate(self):
+        # Both streams must have covered the lagged window before it is evaluated
+        end_bin = min(self._audio.last_bin, self._mouth.last_bin)
+        if end_bin < 0:
+            return
+        if self._next_eval_bin is None:
+            self._next_eval_bin = end_bin + self.window_bins + self.lag_bins
+        if end_bin < self._next_eval_bin:
+            return
+        self._next_eval_bin = end_bin + self.hop_bins
+        offset = self.estimate(end_bin)
+        if offset is not None:
+            self.offsets.setdefault(self.turn, []).append(offset)
+
+    def estimate(self, end_bin: int) -> float | None:
+        """A/V offset (s) of the audio window ending `max_lag` before `end_bin`, or None if inconclusive."""
+        audio_start = end_bin - self.lag_bins - self.window_bins + 1
+        audio = self._audio.get(audio_start, self.window_bins)
+        mouth = self._mouth.get(audio_start - self.lag_bins, self.window_bins + 2 * self.lag_bins, hold=True)
+        if audio is None or mouth is None:
+            return None
+        if np.count_nonzero(audio) < 0.2 * self.window_bins or audio.std() < 1e-3:
+            return None  # not enough speech in the window
+
+        a = (audio - audio.mean()) / audio.std()
+        # Every lagged mouth window as a row: (2 * lag_bins + 1, window_bins)
+        lagged = np.lib.stride_tricks.sliding_window_view(mouth, self.window_bins)
+        std = lagged.std(axis=1)
+        valid = std > 1e-3
+        if not valid.any():
+            return None  # mouth didn't move
+        corr = np.where(
+            valid, (lagged - lagged.mean(axis=1, keepdims=True)) @ a / (np.where(valid, std, 1.0) * len(a)), -1
+        )
+        best = int(np.argmax(corr))
+        if corr[best] < self.min_correlation:
+            return None
+        return (best - self.lag_bins) * BIN_S
+
+    def all_offsets(self) -> list[float]:
+        return [o for offsets in self.offsets.values() for o in offsets]
+
+
+def print_lipsync_report(results: list[dict], vendor: str):
+    """Per-turn and overall A/V offset distribution (from the 'av_offsets' of each turn's result)."""
+    offsets = [o for res in results for o in res.get("av_offsets", [])]
+    if not offsets:
+        return
+
+    def ms(value):
+        return f"{value * 1000:+.0f} ms"
+
+    print("\n" + "=" * 84)
+    print(f"LIP-SYNC - A/V OFFSET ({vendor}, + = video late)")
+    print("=" * 84)
+    print(f"{'Turn':<36} | {'Windows':>7} | {'Median':>8} | {'Min':>8} | {'Max':>8}")
+    print("-" * 84)
+    for res in results:
+        turn = res.get("av_offsets", [])
+        label = res["prompt"][:36]
+        if turn:
+            print(
+                f"{label:<36} | {len(turn):>7} | {ms(float(np.median(turn))):>8} | "
+                f"{ms(min(turn)):>8} | {ms(max(turn)):>8}"
+            )
+        else:
+            print(f"{label:<36} | {0:>7} | {'N/A':>8} | {'N/A':>8} | {'N/A':>8}")
+    p5, p50, p95 = np.percentile(offsets, [5, 50, 95])
+    print("-" * 84)
+    print(f"{'All turns':<36} | {len(offsets):>7} | {ms(p50):>8} | p5 {ms(p5)}, p95 {ms(p95)}")
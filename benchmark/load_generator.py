@@ -0,0 +1,200 @@
+"""
+Concurrent multi-session load generator for system_benchmark.py (--sessions).
+
+Each virtual user gets its own room and identity, its own shuffled copy of the
+scenario prompts and its own start offset, and all of them run from one asyncio
+loop. Levels are run one after another so agent CPU/RSS can be attributed to each
+concurrency level from the SystemMonitor samples taken during that level.
+"""
+
+import asyncio
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+from clock_sync import ClockOffsetEstimator, precise_time
+from latency_driver import (
+    AgentMetric,
+    histogram_of,
+    index_agent_metrics,
+    latency_breakdown,
+    run_latency_test,
+    stored_turns,
+)
+from system_monitor import SystemMetrics
+from think_time import ThinkTime
+
+
+@dataclass
+class SessionResult:
+    index: int
+    room: str
+    results: list[dict]
+    inband_metrics: list[AgentMetric]
+    clock: ClockOffsetEstimator
+
+
+@dataclass
+class LoadLevelResult:
+    sessions: int
+    started_at: float
+    finished_at: float
+    session_results: list[SessionResult] = field(default_factory=list)
+
+
+def held(order: list[str], hold: float) -> Iterator[str]:
+    """Cycles through `order` until `hold` seconds after the first prompt is pulled."""
+    # Pulled lazily by run_latency_test, so the deadline starts at the first prompt
+    deadline = precise_time() + hold
+    i = 0
+    while precise_time() < deadline:
+        yield order[i % len(order)]
+        i += 1
+
+
+async def run_virtual_user(
+    index: int,
+    sessions: int,
+    prompts: list[str],
+    room_prefix: str = "benchmark-load",
+    prompt_gap: float | ThinkTime = 1.0,
+    max_stagger: float = 2.0,
+    seed: int = 0,
+    hold: float | None = None,
+    response_timeout: float = 15.0,
+    turn_timeout: float = 30.0,
+) -> SessionResult:
+    """
+    Runs one virtual user: own room, own identity, own prompt order and start offset.
+
+    With `hold`, the user keeps cycling through its prompts until `hold` seconds after
+    its first prompt instead of sending each prompt once. The timeouts are those of
+    run_latency_test.
+    """
+    rng = random.Random(seed * 100_003 + sessions * 1_009 + index)
+    schedule = list(prompts)
+    rng.shuffle(schedule)
+    await asyncio.sleep(rng.uniform(0, max_stagger))
+
+    room = f"{room_prefix}-c{sessions}-u{index}"
+    clock = ClockOffsetEstimator()
+    try:
+        inband, results = await run_latency_test(
+            room,
+            held(schedule, hold) if hold else schedule,
+            clock=clock,
+            identity=f"bench_driver-{index}",
+            prompt_gap=ThinkTime.of(prompt_gap).scaled(rng.uniform(0.8, 1.2), seed=rng.randrange(2**32)),
+            turn_timeout=turn_timeout,
+            response_timeout=response_timeout,
+        )
+    except Exception as e:
+        print(f"   -> ❌ Virtual user {index} ({room}) failed: {e}")
+        inband, results = [], []
+
+    for res in results:
+        res["session"] = index
+    return SessionResult(index, room, results, inband, clock)
+
+
+async def run_load_level(sessions: int, prompts: list[str], **kwargs) -> LoadLevelResult:
+    print(f"\n👥 Load level: {sessions} concurrent session(s)")
+    started_at = precise_time()
+    session_results = await asyncio.gather(*(run_virtual_user(i, sessions, prompts, **kwargs) for i in range(sessions)))
+    return LoadLevelResult(sessions, started_at, precise_time(), list(session_results))
+
+
+def run_load_sweep(levels: list[int], prompts: list[str], cooldown: float = 5.0, **kwargs) -> list[LoadLevelResult]:
+    """Runs each concurrency level in turn on a fresh event loop."""
+    level_results = []
+    for i, sessions in enumerate(levels):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            level_results.append(loop.run_until_complete(run_load_level(sessions, prompts, **kwargs)))
+            if i < len(levels) - 1:
+                # Let the agent tear down the previous level's jobs
+                loop.run_until_complete(asyncio.sleep(cooldown))
+        finally:
+            loop.close()
+    return level_results
+
+
+def summarize_level(
+    level: LoadLevelResult, agent_metrics: list[AgentMetric], samples: list[SystemMetrics]
+) -> dict[str, float | int | None]:
+    """Aggregates one level: pooled latency percentiles, per-session means and agent CPU/RSS during the level."""
+    metrics_by_request = index_agent_metrics(
+        agent_metrics + [m for sr in level.session_results for m in sr.inband_metrics]
+    )
+
+    total: list[float] = []
+    uplink: list[float] = []
+    session_means: list[float] = []
+    turns = 0
+    for sr in level.session_results:
+        turns += len(sr.results)
+        breakdown = latency_breakdown(sr.results, metrics_by_request, sr.clock)
+        total += breakdown["total"]
+        uplink += breakdown["uplink"]
+        if breakdown["total"]:
+            session_means.append(sum(breakdown["total"]) / len(breakdown["total"]))
+
+    window = [m for m in samples if level.started_at <= m.timestamp <= level.finished_at]
+    latency = histogram_of(total)
+
+    def avg(data):
+        return sum(data) / len(data) if data else None
+
+    return {
+        "sessions": level.sessions,
+        "turns": turns,
+        "answered": latency.count,
+        "p50": latency.percentile(50),
+        "p95": latency.percentile(95),
+        "p99": latency.percentile(99),
+        "latency_max": latency.max if latency.count else None,
+        "session_avg_min": min(session_means) if session_means else None,
+        "session_avg_max": max(session_means) if session_means else None,
+        "uplink_avg": avg(uplink),
+        "cpu_avg": avg([m.cpu_percent for m in window]),
+        "cpu_max": max((m.cpu_percent for m in window), default=None),
+        "rss_avg": avg([m.memory_mb for m in window]),
+        "rss_max": max((m.memory_mb for m in window), default=None),
+    }
+
+
+def level_turns(
+    level: LoadLevelResult, metrics_by_request: dict[str, dict[str, AgentMetric]], since: float | None = None
+) -> list[dict]:
+    """Results-store rows of a level's turns (sent at or after `since`), tagged with the level and virtual user."""
+    turns = []
+    for sr in level.session_results:
+        results = [r for r in sr.results if since is None or r["sent_ts"] >= since]
+        for turn in stored_turns(results, metrics_by_request, sr.clock):
+            turn["details"].update(sessions=level.sessions, session=sr.index)
+            turns.append(turn)
+    return turns
+
+
+def print_load_report(summaries: list[dict]):
+    def fmt(value, unit="s", digits=3):
+        return f"{value:.{digits}f} {unit}" if value is not None else "N/A"
+
+    print("\n" + "=" * 142)
+    print("LOAD TEST - LATENCY & AGENT RESOURCES vs CONCURRENCY")
+    print("=" * 142)
+    print(
+        f"{'Sessions':>8} | {'Turns':>5} | {'OK':>4} | {'p50':>9} | {'p95':>9} | {'p99':>9} | {'Max':>9} | "
+        f"{'Session avg range':>19} | {'Uplink avg':>10} | {'CPU avg':>8} | {'CPU max':>8} | {'RSS max':>10}"
+    )
+    print("-" * 142)
+    for s in summaries:
+        session_range = (
+            f"{s['session_avg_min']:.2f}-{s['session_avg_max']:.2f} s" if s["session_avg_min"] is not None else "N/A"
+        )
+        print(
+            f"{s['sessions']:>8} | {s['turns']:>5} | {s['answered']:>4} | {fmt(s['p50']):>9} | "
+            f"{fmt(s['p95']):>9} | {fmt(s['p99']):>9} | {fmt(s['latency_max']):>9} | {session_range:>19} | {fmt(s['uplink_avg']):>10} | "
+            f"{fmt(s['cpu_avg'], '%', 1):>8} | {fmt(s['cpu_max'], '%', 1):>8} | {fmt(s['rss_max'], 'MB', 1):>10}"
+        )
@@ -0,0 +1,193 @@
+"""
+Vendor x scenario matrix: every agent against every scenario, in one command.
+
+Each vendor gets one worker for the whole scenario set: it is started once, awaited
+until it has registered with the server and then reused for every scenario. The
+scenarios are spread round-robin over `parallel` rooms that run at the same time,
+each with its own driver and clock estimate. Vendors run one after another, because
+a dev-mode worker is dispatched to every new room and two vendors would otherwise
+answer each other's prompts.
+
+Each vendor's turns, resource samples and agent events are recorded as one run in
+the results store, with mode "matrix". `results_store.py compare` compares matrix
+runs with single-session latency runs by default. The report is the store's vendor
+comparison plus a scenario x vendor table of median response latency.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from clock_sync import ClockOffsetEstimator
+from latency_driver import AgentMetric, AgentRunner, index_agent_metrics, run_latency_test, stored_turns
+from results_store import (
+    DEFAULT_STORE,
+    ResultsStore,
+    RunMetadata,
+    connect,
+    print_vendor_comparison,
+    select_runs,
+    vendor_summary,
+)
+from system_monitor import SystemMonitor
+from think_time import ThinkTime
+
+AGENT_MAIN = Path(__file__).resolve().parent.parent / "agent" / "main.py"
+
+
+@dataclass
+class MatrixTarget:
+    vendor: str
+    script: str
+    env: dict[str, str] = field(default_factory=dict)
+
+
+def matrix_targets(agents: list[str] | None, run_modes: list[str] | None) -> list[MatrixTarget]:
+    """Agent scripts plus `agent/main.py` RUN_MODEs, each as one vendor."""
+    targets = [MatrixTarget(Path(a).stem.removesuffix("_agent"), a) for a in agents or []]
+    targets += [MatrixTarget(mode, str(AGENT_MAIN), {"RUN_MODE": mode}) for mode in run_modes or []]
+    return targets
+
+
+def partition_scenarios(prompts: list[str], rooms: int) -> list[list[str]]:
+    """Round-robin split of the scenarios over at most `rooms` rooms (no empty rooms)."""
+    rooms = max(1, min(rooms, len(prompts)))
+    return [prompts[i::rooms] for i in range(rooms)]
+
+
+async def run_rooms(
+    groups: list[list[str]], room_prefix: str, prompt_gap: float | ThinkTime, **timeouts
+) -> list[tuple[list[AgentMetric], list[dict], ClockOffsetEstimator]]:
+    async def one_room(i: int, group: list[str]):
+        clock = ClockOffsetEstimator()
+        room = f"{room_prefix}-r{i}"
+        try:
+            inband, results = await run_latency_test(
+                room, group, clock=clock, identity=f"bench_driver-{i}", prompt_gap=prompt_gap, **timeouts
+            )
+        except Exception as e:
+            print(f"   -> ❌ Room {room} failed: {e}")
+            inband, results = [], []
+        return inband, results, clock
+
+    return await asyncio.gather(*(one_room(i, group) for i, group in enumerate(groups)))
+
+
+def run_matrix_target(
+    target: MatrixTarget,
+    prompts: list[str],
+    store: ResultsStore,
+    scenario: str | None = None,
+    parallel: int = 2,
+    room_prefix: str = "benchmark-matrix",
+    prompt_gap: float | ThinkTime = 1.0,
+    response_timeout: float = 15.0,
+    turn_timeout: float = 30.0,
+    echo_logs: bool = False,
+    metric_socket: bool = True,
+) -> str:
+    """Runs every scenario against one vendor's worker and records it as one run. Returns the run ID."""
+    print(f"\n🧩 Matrix: {target.vendor} x {len(prompts)} scenario(s) in {min(parallel, len(prompts))} room(s)")
+    run_id = store.start_run(
+        RunMetadata.collect(
+            target.vendor, target.script, scenario, prompts, mode="matrix", parallel=parallel, **target.env
+        )
+    )
+    runner = AgentRunner(target.script, echo_logs=echo_logs, metric_socket=metric_socket, env=target.env)
+    monitor = SystemMonitor(runner.start())
+    monitor.start()
+    try:
+        print("Waiting for the agent worker to register...")
+        if not runner.wait_ready():
+            print(f"   -> ⚠️  {target.vendor} worker didn't report registration, continuing anyway")
+
+        safe_vendor = "".join(c if c.isalnum() else "-" for c in target.vendor)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            rooms = loop.run_until_complete(
+                run_rooms(
+                    partition_scenarios(prompts, parallel),
+                    f"{room_prefix}-{safe_vendor}",
+                    prompt_gap,
+                    response_timeout=response_timeout,
+                    turn_timeout=turn_timeout,
+                )
+            )
+        finally:
+            loop.close()
+    finally:
+        monitor.stop()
+        runner.stop()
+
+    agent_metrics = runner.metrics + [m for inband, _, _ in rooms for m in inband]
+    metrics_by_request = index_agent_metrics(agent_metrics)
+    turns = [t for _, results, clock in rooms for t in stored_turns(results, metrics_by_request, clock)]
+    store.add_turns(run_id, turns)
+    store.add_samples(run_id, monitor.metrics)
+    store.add_events(run_id, agent_metrics)
+    store.finish_run(run_id)
+    answered = sum(t["total"] is not None for t in turns)
+    print(f"   -> {target.vendor}: {answered}/{len(turns)} scenario(s) answered (run {run_id[:8]})")
+    return run_id
+
+
+def print_scenario_matrix(conn, runs: list[dict]):
+    """Median response latency of every scenario (row) per vendor (column)."""
+    vendors = list(dict.fromkeys(r["vendor"] for r in runs))
+    vendor_of = {r["run_id"]: r["vendor"] for r in runs}
+    cells: dict[str, dict[str, list[float]]] = {}
+    placeholders = ", ".join("?" * len(runs))
+    rows = conn.execute(f"SELECT run_id, prompt, total FROM turns WHERE run_id IN ({placeholders})", list(vendor_of))
+    for run_id, prompt, total in rows:
+        entry = cells.setdefault(prompt, {}).setdefault(vendor_of[run_id], [])
+        if total is not None:
+            entry.append(total)
+
+    def median(values):
+        return f"{float(np.median(values)):.3f}" if values else "timeout"
+
+    width = 36 + 13 * len(vendors)
+    print("\n" + "=" * width)
+    print("SCENARIO x VENDOR - MEDIAN RESPONSE LATENCY (seconds)")
+    print("=" * width)
+    print(f"{'Scenario':<34} | " + " | ".join(f"{v[:10]:>10}" for v in vendors))
+    print("-" * width)
+    for prompt, per_vendor in cells.items():
+        print(
+            f"{prompt[:34]:<34} | "
+            + " | ".join(f"{median(per_vendor[v]) if v in per_vendor else 'N/A':>10}" for v in vendors)
+        )
+
+
+def run_matrix(
+    targets: list[MatrixTarget],
+    prompts: list[str],
+    scenario: str | None = None,
+    store_path: str | Path = DEFAULT_STORE,
+    cooldown: float = 5.0,
+    **kwargs,
+) -> list[str]:
+    """Runs every vendor against every scenario, then prints the comparison tables."""
+    store = ResultsStore(store_path)
+    run_ids = []
+    try:
+        for i, target in enumerate(targets):
+            run_ids.append(run_matrix_target(target, prompts, store, scenario, **kwargs))
+            if i < len(targets) - 1:
+                # Let the previous worker's job processes exit before the next vendor starts
+                time.sleep(cooldown)
+    finally:
+        store.close()
+
+    if run_ids:
+        conn = connect(store_path)
+        runs = sorted(
+            (r for r in select_runs(conn) if r["run_id"] in run_ids), key=lambda r: run_ids.index(r["run_id"])
+        )
+        print_vendor_comparison(vendor_summary(conn, runs))
+        print_scenario_matrix(conn, runs)
+        print(f"\n💾 Runs stored in {store_path}: {', '.join(r[:8] for r in run_ids)}")
+    return run_ids
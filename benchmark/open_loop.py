@@ -0,0 +1,301 @@
+"""
+Open-loop arrival scheduler for the benchmark driver.
+
+A closed-loop driver waits for every response before sending the next prompt, so
+it never builds a queue and hides queueing delay. Here sessions start and prompts
+are sent on a precomputed schedule, whether or not earlier responses finished:
+
+- Poisson arrivals: sessions arrive at `rate` per second, each with `turns`
+  prompts separated by exponentially distributed think times.
+- Trace replay: a recorded JSON trace of session starts and turn times, replayed
+  `compression` times faster.
+
+Trace format (seconds, turn times relative to the session start):
+
+    [{"start": 0.0, "turns": [1.5, 9.2, 20.0]}, {"start": 4.1, "turns": [0.8, 6.3]}]
+
+Response latency is taken from the agent's 'speaking' metric for each request ID,
+mapped onto the driver clock, so it works with any number of prompts in flight.
+"""
+
+import asyncio
+import json
+import random
+import uuid
+from dataclasses import dataclass, field
+
+from clock_sync import ClockOffsetEstimator, ClockSync, precise_time
+from latency_driver import (
+    LIVEKIT_URL,
+    AgentMetric,
+    driver_token,
+    histogram_of,
+    index_agent_metrics,
+    metric_from_record,
+    send_prompt,
+)
+from latency_histogram import LatencyHistogram
+from livekit import rtc
+from metric_protocol import METRIC_TOPIC, decode_metrics
+
+
+@dataclass
+class SessionPlan:
+    start: float  # seconds after the schedule starts
+    turns: list[float]  # seconds after the session starts
+
+
+def poisson_schedule(
+    rate: float, duration: float, turns: int = 3, think_time: float = 4.0, seed: int = 0
+) -> list[SessionPlan]:
+    """Sessions arrive as a Poisson process of `rate`/s for `duration` s."""
+    rng = random.Random(seed)
+    plans = []
+    t = rng.expovariate(rate)
+    while t < duration:
+        offsets = []
+        turn_at = 0.0
+        for _ in range(turns):
+            offsets.append(turn_at)
+            turn_at += rng.expovariate(1 / think_time)
+        plans.append(SessionPlan(t, offsets))
+        t += rng.expovariate(rate)
+    return plans
+
+
+def load_trace(path: str, compression: float = 1.0) -> list[SessionPlan]:
+    """Loads a recorded arrival/turn-timing trace, compressing all times by `compression`."""
+    with open(path) as f:
+        raw = json.load(f)
+    plans = [SessionPlan(s["start"] / compression, [t / compression for t in s["turns"]]) for s in raw]
+    return sorted(plans, key=lambda p: p.start)
+
+
+def offered_load(plans: list[SessionPlan]) -> tuple[float, float]:
+    """Returns (sessions/s, prompts/s) offered by a schedule."""
+    if not plans:
+        return 0.0, 0.0
+    span = max(p.start + (p.turns[-1] if p.turns else 0.0) for p in plans) or 1.0
+    return len(plans) / span, sum(len(p.turns) for p in plans) / span
+
+
+@dataclass
+class Turn:
+    session: int
+    request_id: str
+    prompt: str
+    scheduled_ts: float
+    sent_ts: float | None = None
+
+
+@dataclass
+class OpenLoopResult:
+    label: str
+    plans: list[SessionPlan]
+    started_at: float
+    finished_at: float
+    turns: list[Turn]
+    inband_metrics: list[AgentMetric]
+    clocks: dict[int, ClockOffsetEstimator]
+    setup_times: list[float]
+    failed_sessions: list[int] = field(default_factory=list)  # sessions that raised (couldn't connect, ...)
+
+
+async def run_open_loop_session(
+    index: int,
+    plan: SessionPlan,
+    schedule_start: float,
+    prompts: list[str],
+    turns: list[Turn],
+    inband_metrics: list[AgentMetric],
+    clocks: dict[int, ClockOffsetEstimator],
+    setup_times: list[float],
+    room_prefix: str,
+    response_timeout: float,
+):
+    arrival = schedule_start + plan.start
+    await asyncio.sleep(max(0.0, arrival - precise_time()))
+
+    room = rtc.Room()
+    clock = clocks.setdefault(index, ClockOffsetEstimator())
+    clock_sync = ClockSync(room, clock)
+
+    @room.on("data_received")
+    def on_data_received(dp: rtc.DataPacket):
+        if dp.topic == METRIC_TOPIC:
+            inband_metrics.extend(metric_from_record(r) for r in decode_metrics(dp.data))
+
+    try:
+        await room.connect(LIVEKIT_URL, driver_token(f"{room_prefix}-s{index}", f"bench_driver-{index}"))
+        while len(room.remote_participants) == 0:
+            if precise_time() - arrival > 30:
+                raise TimeoutError("timeout waiting for agent")
+            await asyncio.sleep(0.1)
+        setup_times.append(precise_time() - arrival)
+        clock_sync.start(interval=0.5)
+
+        for turn_offset in plan.turns:
+            # Open loop: the send time only depends on the schedule. If the session
+            # setup ran late, overdue turns go out immediately.
+            scheduled = arrival + turn_offset
+            await asyncio.sleep(max(0.0, scheduled - precise_time()))
+            turn = Turn(index, uuid.uuid4().hex, prompts[len(turns) % len(prompts)], scheduled)
+            turns.append(turn)
+            turn.sent_ts = await send_prompt(room, turn.prompt, turn.request_id)
+
+        # Stay connected so the last responses (and their in-band metrics) arrive
+        await asyncio.sleep(response_timeout)
+    finally:
+        await clock_sync.stop()
+        try:
+            await room.disconnect()
+        except Exception:
+            pass
+
+
+async def run_open_loop(
+    label: str,
+    plans: list[SessionPlan],
+    prompts: list[str],
+    room_prefix: str = "benchmark-open",
+    response_timeout: float = 15.0,
+) -> OpenLoopResult:
+    sessions, prompt_rate = offered_load(plans)
+    print(f"\n🌊 Open loop [{label}]: {len(plans)} sessions, {sessions:.2f} sessions/s, {prompt_rate:.2f} prompts/s")
+
+    turns: list[Turn] = []
+    inband_metrics: list[AgentMetric] = []
+    clocks: dict[int, ClockOffsetEstimator] = {}
+    setup_times: list[float] = []
+    started_at = precise_time()
+    room_prefix = f"{room_prefix}-{''.join(c if c.isalnum() else '-' for c in label)}"
+    outcomes = await asyncio.gather(
+        *(
+            run_open_loop_session(
+                i,
+                plan,
+                started_at,
+                prompts,
+                turns,
+                inband_metrics,
+                clocks,
+                setup_times,
+                room_prefix,
+                response_timeout,
+            )
+            for i, plan in enumerate(plans)
+        ),
+        return_exceptions=True,
+    )
+    # A session that failed sent fewer turns (or none): report it, or overload looks like a lighter load
+    failed = []
+    for i, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"   -> ❌ Session {i} ({room_prefix}-s{i}) failed: {outcome!r}")
+            failed.append(i)
+    return OpenLoopResult(label, plans, started_at, precise_time(), turns, inband_metrics, clocks, setup_times, failed)
+
+
+def turn_latency(
+    turn: Turn, metrics_by_request: dict[str, dict[str, AgentMetric]], clocks: dict[int, ClockOffsetEstimator]
+) -> float | None:
+    """Agent 'speaking' (on the driver clock) - driver send time, or None if unsent or unanswered."""
+    speaking = metrics_by_request.get(turn.request_id, {}).get("speaking")
+    if turn.sent_ts is None or speaking is None:
+        return None
+    clock = clocks.get(turn.session)
+    speaking_ts = clock.to_driver_time(speaking.timestamp)[0] if clock and clock.has_estimate else speaking.timestamp
+    return speaking_ts - turn.sent_ts
+
+
+def open_loop_turns(result: OpenLoopResult, agent_metrics: list[AgentMetric]) -> list[dict]:
+    """Results-store rows of a level's sent turns; 'total' is the speaking-metric latency."""
+    index = index_agent_metrics(agent_metrics + result.inband_metrics)
+    return [
+        {
+            "request_id": turn.request_id,
+            "prompt": turn.prompt,
+            "sent_ts": turn.sent_ts,
+            "total": turn_latency(turn, index, result.clocks),
+            "details": {"level": result.label, "session": turn.session, "scheduled_ts": turn.scheduled_ts},
+        }
+        for turn in result.turns
+        if turn.sent_ts is not None
+    ]
+
+
+def summarize_open_loop(result: OpenLoopResult, agent_metrics: list[AgentMetric]) -> dict:
+    """Latency of every sent turn = agent 'speaking' (on the driver clock) - driver send time."""
+    index = index_agent_metrics(agent_metrics + result.inband_metrics)
+    latency = LatencyHistogram()
+    for turn in result.turns:
+        value = turn_latency(turn, index, result.clocks)
+        if value is not None:
+            latency.record(value)
+
+    sessions_rate, prompt_rate = offered_load(result.plans)
+    duration = max(result.finished_at - result.started_at, 1e-9)
+    sent = sum(1 for t in result.turns if t.sent_ts is not None)
+    sent_by_session: dict[int, int] = {}
+    for t in result.turns:
+        if t.sent_ts is not None:
+            sent_by_session[t.session] = sent_by_session.get(t.session, 0) + 1
+    return {
+        "label": result.label,
+        "offered_sessions": sessions_rate,
+        "offered_prompts": prompt_rate,
+        "sessions": len(result.plans),
+        "failed": len(result.failed_sessions),
+        # Turns the failed sessions were scheduled to send but never did
+        "unsent": sum(len(result.plans[i].turns) - sent_by_session.get(i, 0) for i in result.failed_sessions),
+        "sent": sent,
+        "answered": latency.count,
+        "throughput": latency.count / duration,
+        "p50": latency.percentile(50),
+        "p95": latency.percentile(95),
+        "max": latency.max if latency.count else None,
+        "setup_p95": histogram_of(result.setup_times).percentile(95),
+    }
+
+
+def find_saturation(summaries: list[dict], latency_factor: float = 2.0, min_completion: float = 0.9) -> int | None:
+    """
+    Index of the first load level past the knee: p95 latency above `latency_factor`
+    times the lightest level's p95, or fewer than `min_completion` of the scheduled
+    prompts answered (sent ones plus those failed sessions never sent). Levels must
+    be ordered by increasing offered load.
+    """
+    baseline = next((s["p95"] for s in summaries if s["p95"] is not None), None)
+    for i, s in enumerate(summaries):
+        scheduled = s["sent"] + s["unsent"]
+        completion = s["answered"] / scheduled if scheduled else (0.0 if s["failed"] else 1.0)
+        if completion < min_completion:
+            return i
+        if baseline is not None and s["p95"] is not None and s["p95"] > latency_factor * baseline:
+            return i
+    return None
+
+
+def print_open_loop_report(summaries: list[dict]):
+    def fmt(value):
+        return f"{value:.3f} s" if value is not None else "N/A"
+
+    summaries = sorted(summaries, key=lambda s: s["offered_prompts"])
+    saturation = find_saturation(summaries)
+    print("\n" + "=" * 121)
+    print("OPEN-LOOP LOAD - LATENCY vs OFFERED LOAD")
+    print("=" * 121)
+    print(
+        f"{'Level':<12} | {'Sessions/s':>10} | {'Prompts/s':>9} | {'Failed':>6} | {'Sent':>5} | {'OK':>5} | "
+        f"{'Done/s':>6} | {'p50':>9} | {'p95':>9} | {'Max':>9} | {'Setup p95':>9}"
+    )
+    print("-" * 121)
+    for i, s in enumerate(summaries):
+        marker = "  ⚠️ saturation" if i == saturation else ""
+        print(
+            f"{s['label']:<12} | {s['offered_sessions']:>10.3f} | {s['offered_prompts']:>9.3f} | "
+            f"{s['failed']:>6} | {s['sent']:>5} | {s['answered']:>5} | {s['throughput']:>6.2f} | "
+            f"{fmt(s['p50']):>9} | {fmt(s['p95']):>9} | {fmt(s['max']):>9} | {fmt(s['setup_p95']):>9}{marker}"
+        )
+    if saturation is None:
+        print("\nNo saturation point reached at the offered loads.")
@@ -0,0 +1,108 @@
+"""
+Per-phase resource attribution: CPU and memory per agent state.
+
+The agent hooks emit an AGENT_STATE metric on every state transition (listening,
+thinking, speaking, ...). Here those transitions become a step function over time.
+Every resource sample is labelled with the state the agent was in when the sample
+was taken, and statistics are computed per state. Samples before the first
+transition are labelled 'no session': the worker was up but no session had started.
+
+Agent timestamps are mapped onto the driver clock first when a clock estimate is
+available, so the timeline and the samples share one clock.
+"""
+
+import numpy as np
+from clock_sync import ClockOffsetEstimator
+from latency_driver import AgentMetric
+from proc_sampler import ProcSampler
+from system_monitor import SystemMetrics
+
+NO_SESSION = "no session"
+
+
+def state_timeline(
+    metrics: list[AgentMetric], clock: ClockOffsetEstimator | None = None
+) -> tuple[np.ndarray, list[str]]:
+    """Sorted (transition times, states) from AGENT_STATE metrics, de-duplicated across transports."""
+    transitions = set()
+    for m in metrics:
+        if m.type != "AGENT_STATE" or not m.data:
+            continue
+        ts = clock.to_driver_time(m.timestamp)[0] if clock is not None and clock.has_estimate else m.timestamp
+        transitions.add((m.timestamp, ts, m.data[-1]))
+    ordered = sorted(transitions)
+    return np.array([t for _, t, _ in ordered], dtype=np.float64), [s for _, _, s in ordered]
+
+
+def label_samples(times: np.ndarray, states: list[str], sample_ts: np.ndarray) -> np.ndarray:
+    """The agent state at each sample timestamp (vectorized step-function lookup)."""
+    labels = np.array([NO_SESSION, *states], dtype=object)
+    return labels[np.searchsorted(times, sample_ts, side="right")]
+
+
+def attribute(labels: np.ndarray, series: dict[str, np.ndarray]) -> dict[str, dict[str, float]]:
+    """Per state: sample share and avg/p95/max of every series (e.g. {'cpu': ..., 'rss': ...})."""
+    phases = {}
+    total = len(labels)
+    for state in dict.fromkeys(labels):  # first-seen order
+        mask = labels == state
+        stats = {"samples": int(mask.sum()), "share": float(mask.sum()) / total}
+        for name, values in series.items():
+            selected = values[mask]
+            selected = selected[~np.isnan(selected)]
+            if len(selected):
+                stats[f"{name}_avg"] = float(selected.mean())
+                stats[f"{name}_p95"] = float(np.percentile(selected, 95))
+                stats[f"{name}_max"] = float(selected.max())
+        phases[state] = stats
+    return phases
+
+
+def attribute_monitor_samples(
+    samples: list[SystemMetrics], metrics: list[AgentMetric], clock: ClockOffsetEstimator | None = None
+) -> dict[str, dict[str, float]]:
+    if not samples:
+        return {}
+    times, states = state_timeline(metrics, clock)
+    sample_ts = np.array([m.timestamp for m in samples])
+    series = {
+        "cpu": np.array([m.cpu_percent for m in samples], dtype=np.float64),
+        "rss": np.array([m.memory_mb for m in samples], dtype=np.float64),
+        "uss": np.array([np.nan if m.uss_mb is None else m.uss_mb for m in samples], dtype=np.float64),
+    }
+    return attribute(label_samples(times, states, sample_ts), series)
+
+
+def attribute_sampler(
+    sampler: ProcSampler, metrics: list[AgentMetric], clock: ClockOffsetEstimator | None = None, window: float = 0.05
+) -> dict[str, dict[str, float]]:
+    """Same attribution from the high-frequency /proc sampler (CPU over `window`, RSS)."""
+    ts, cpu = sampler.cpu_percent(window)
+    if not len(ts):
+        return {}
+    _, _, rss = sampler.samples()
+    times, states = state_timeline(metrics, clock)
+    return attribute(label_samples(times, states, ts), {"cpu": cpu, "rss": rss / (1024 * 1024)})
+
+
+def print_phase_report(phases: dict[str, dict[str, float]], title: str = "RESOURCES PER AGENT STATE"):
+    if not phases:
+        return
+
+    def fmt(stats, key, unit, digits=1):
+        return f"{stats[key]:.{digits}f}{unit}" if key in stats else "N/A"
+
+    print("\n" + "=" * 104)
+    print(title)
+    print("=" * 104)
+    print(
+        f"{'State':<14} | {'Samples':>7} | {'Time':>6} | {'CPU avg':>8} | {'CPU p95':>8} | {'CPU max':>8} | "
+        f"{'RSS avg':>10} | {'USS avg':>10}"
+    )
+    print("-" * 104)
+    for state, s in sorted(phases.items(), key=lambda kv: -kv[1]["share"]):
+        print(
+            f"{state:<14} | {s['samples']:>7} | {s['share']:>6.0%} | {fmt(s, 'cpu_avg', '%'):>8} | "
+            f"{fmt(s, 'cpu_p95', '%'):>8} | {fmt(s, 'cpu_max', '%'):>8} | {fmt(s, 'rss_avg', ' MB'):>10} | "
+            f"{fmt(s, 'uss_avg', ' MB'):>10}"
+        )
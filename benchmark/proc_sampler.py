@@ -0,0 +1,249 @@
+"""
+High-frequency CPU/RSS sampler for the agent process tree, reading /proc directly.
+
+SystemMonitor's 0.5 s psutil samples average away the bursts when TTS audio and
+avatar frames start. This sampler runs every 10-20 ms on a drift-free schedule:
+sample k is taken at start + k * interval on the monotonic clock. A late wake-up
+never shifts later samples; a slot that is overrun entirely is counted as missed.
+
+Each sample reads `/proc/<pid>/stat` (utime + stime) and `/proc/<pid>/statm`
+(resident pages) of every process in the tree, through file descriptors kept open
+and re-read with pread. The values go into preallocated NumPy ring buffers, so a
+long run never grows memory. CPU time is accumulated per PID, so a child that exits
+doesn't make the tree's cumulative CPU time go backwards.
+
+The kernel reports CPU time in clock ticks (usually 10 ms), so CPU% is computed over
+a window of several samples (`cpu_percent(window=0.05)`) rather than per sample.
+The sampler's own CPU cost is measured with the thread's CPU clock and reported
+with the results.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import psutil
+from clock_sync import precise_time
+
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def parse_stat_cpu_ticks(stat: bytes) -> int:
+    """utime + stime (clock ticks) from the contents of /proc/<pid>/stat."""
+    # The command name is in parentheses and may contain spaces: split after the last ')'
+    fields = stat[stat.rindex(b")") + 2 :].split()
+    return int(fields[11]) + int(fields[12])
+
+
+def parse_statm_resident_pages(statm: bytes) -> int:
+    return int(statm.split()[1])
+
+
+class _ProcFiles:
+    def __init__(self, pid: int):
+        self.stat = os.open(f"/proc/{pid}/stat", os.O_RDONLY)
+        try:
+            self.statm = os.open(f"/proc/{pid}/statm", os.O_RDONLY)
+        except OSError:
+            os.close(self.stat)
+            raise
+        self.last_ticks: int | None = None
+
+    def read(self) -> tuple[int, int]:
+        return (
+            parse_stat_cpu_ticks(os.pread(self.stat, 1024, 0)),
+            parse_statm_resident_pages(os.pread(self.statm, 256, 0)),
+        )
+
+    def close(self):
+        os.close(self.stat)
+        os.close(self.statm)
+
+
+class ProcSampler:
+    def __init__(self, pid: int, interval: float = 0.01, capacity: int = 1 << 16, refresh_interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        # Preallocated ring buffers: sample timestamp, cumulative tree CPU seconds, tree RSS bytes
+        self._ts = np.zeros(capacity, dtype=np.float64)
+        self._cpu_s = np.zeros(capacity, dtype=np.float64)
+        self._rss = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+        self.missed = 0
+        self.overhead_cpu_s = 0.0
+        self.elapsed_s = 0.0
+        self._files: dict[int, _ProcFiles] = {}
+        self._cpu_ticks_total = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def available() -> bool:
+        return os.path.exists("/proc/self/stat") and os.path.exists("/proc/self/statm")
+
+    def start(self):
+        if self.available():
+            self._thread.start()
+        else:
+            print("   -> /proc not available, high-frequency sampler disabled")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+
+    def _refresh_tree(self):
+        try:
+            root = psutil.Process(self.pid)
+            pids = {self.pid} | {p.pid for p in root.children(recursive=True)}
+        except psutil.Error:
+            pids = set()
+        for pid in set(self._files) - pids:
+            self._files.pop(pid).close()
+        for pid in pids - set(self._files):
+            try:
+                self._files[pid] = _ProcFiles(pid)
+            except OSError:
+                pass
+
+    def _sample(self, ts: float):
+        rss_pages = 0
+        for pid, files in list(self._files.items()):
+            try:
+                ticks, pages = files.read()
+            except (OSError, ValueError):
+                # Exited between refreshes: its CPU time so far stays in the total
+                self._files.pop(pid).close()
+                continue
+            if files.last_ticks is not None:
+                self._cpu_ticks_total += ticks - files.last_ticks
+            files.last_ticks = ticks
+            rss_pages += pages
+        slot = self.count % self.capacity
+        self._ts[slot] = ts
+        self._cpu_s[slot] = self._cpu_ticks_total / CLK_TCK
+        self._rss[slot] = rss_pages * PAGE_SIZE
+        self.count += 1
+
+    def _run(self):
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        next_refresh = start
+        k = 0
+        try:
+            while not self._stop_event.is_set():
+                now = time.perf_counter()
+                if now >= next_refresh:
+                    self._refresh_tree()
+                    next_refresh = now + self.refresh_interval
+                    if not self._files:
+                        break
+                self._sample(precise_time())
+
+                # Drift-free schedule: the next slot is derived from the start, not from "now"
+                k += 1
+                target = start + k * self.interval
+                now = time.perf_counter()
+                if now > target:
+                    skipped = int((now - target) / self.interval) + 1
+                    self.missed += skipped
+                    k += skipped
+                    target = start + k * self.interval
+                time.sleep(max(0.0, target - time.perf_counter()))
+        finally:
+            self.elapsed_s = time.perf_counter() - start
+            self.overhead_cpu_s = time.thread_time() - cpu_start
+            for files in self._files.values():
+                files.close()
+            self._files.clear()
+
+    def samples(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(timestamps, cumulative CPU seconds, RSS bytes) of the retained samples, oldest first."""
+        n = min(self.count, self.capacity)
+        if self.count <= self.capacity:
+            return self._ts[:n].copy(), self._cpu_s[:n].copy(), self._rss[:n].copy()
+        order = np.roll(np.arange(self.capacity), -(self.count % self.capacity))
+        return self._ts[order], self._cpu_s[order], self._rss[order]
+
+    def cpu_percent(self, window: float = 0.05) -> tuple[np.ndarray, np.ndarray]:
+        """(timestamps, CPU % of one core over the preceding `window` seconds) for every sample."""
+        ts, cpu_s, _ = self.samples()
+        if len(ts) < 2:
+            return ts, np.zeros(len(ts))
+        lag = max(1, round(window / self.interval))
+        earlier = np.maximum(np.arange(len(ts)) - lag, 0)
+        dt = ts - ts[earlier]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = np.where(dt > 0, 100 * (cpu_s - cpu_s[earlier]) / dt, 0.0)
+        return ts, pct
+
+    def overhead_percent(self) -> float | None:
+        """The sampler thread's own CPU use, in % of one core."""
+        return 100 * self.overhead_cpu_s / self.elapsed_s if self.elapsed_s else None
+
+    def describe(self) -> str:
+        overhead = self.overhead_percent()
+        cost = f"{overhead:.2f}% of one core" if overhead is not None else "N/A"
+        return (
+            f"{self.count} samples every {self.interval * 1000:.0f} ms "
+            f"({self.missed} missed slots), sampler cost {cost}"
+        )
+
+
+def span_spikes(sampler: ProcSampler, spans: list[tuple[str, float, float]], window: float = 0.05) -> list[dict]:
+    """CPU peak, p95 and average plus peak RSS for each (label, start, end) span of the run."""
+    ts, pct = sampler.cpu_percent(window)
+    _, _, rss = sampler.samples()
+    spikes = []
+    for label, start, end in spans:
+        mask = (ts >= start) & (ts < end)
+        if not mask.any():
+            spikes.append({"label": label, "samples": 0})
+            continue
+        span_pct = pct[mask]
+        spikes.append(
+            {
+                "label": label,
+                "samples": int(mask.sum()),
+                "cpu_peak": float(span_pct.max()),
+                "cpu_p95": float(np.percentile(span_pct, 95)),
+                "cpu_avg": float(span_pct.mean()),
+                "peak_at": float(ts[mask][span_pct.argmax()] - start),
+                "rss_peak_mb": float(rss[mask].max()) / (1024 * 1024),
+            }
+        )
+    return spikes
+
+
+def turn_spikes(sampler: ProcSampler, results: list[dict], window: float = 0.05, tail: float = 10.0) -> list[dict]:
+    """Spikes of each turn, from its prompt to the next one (the last turn gets `tail` seconds)."""
+    starts = [res["sent_ts"] for res in results]
+    ends = starts[1:] + [starts[-1] + tail] if starts else []
+    return span_spikes(
+        sampler, [(res["prompt"], s, e) for res, s, e in zip(results, starts, ends, strict=True)], window
+    )
+
+
+def print_spike_report(sampler: ProcSampler, spikes: list[dict], window: float = 0.05, per: str = "Turn"):
+    """Prints turn_spikes() or span_spikes() rows; `per` names what a row is."""
+    print("\n" + "=" * 100)
+    print(f"CPU SPIKES PER {per.upper()} ({window * 1000:.0f} ms windows, agent process tree)")
+    print("=" * 100)
+    print(
+        f"{per:<32} | {'Samples':>7} | {'CPU peak':>8} | {'Peak at':>8} | {'CPU p95':>8} | {'CPU avg':>8} | "
+        f"{'RSS peak':>10}"
+    )
+    print("-" * 100)
+    for s in spikes:
+        if not s["samples"]:
+            print(f"{s['label'][:32]:<32} | {0:>7} | {'N/A':>8}")
+            continue
+        print(
+            f"{s['label'][:32]:<32} | {s['samples']:>7} | {s['cpu_peak']:>7.0f}% | {s['peak_at']:>6.2f} s | "
+            f"{s['cpu_p95']:>7.0f}% | {s['cpu_avg']:>7.0f}% | {s['rss_peak_mb']:>7.1f} MB"
+        )
+    print(f"\nSampler: {sampler.describe()}")
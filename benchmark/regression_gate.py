@@ -0,0 +1,259 @@
+"""
+Statistical regression gate between two sets of stored benchmark runs.
+
+    python benchmark/regression_gate.py BASELINE CANDIDATE [--tolerance 0.1] [--alpha 0.05]
+
+BASELINE and CANDIDATE are run IDs (or unique prefixes) from the results store;
+several comma-separated runs per side are pooled. Both sides must have run the same
+prompts.
+
+For every per-turn latency component the gate reports:
+
+- the baseline and candidate percentiles, with a bootstrap confidence interval of the
+  relative change at each percentile;
+- a one-sided Mann-Whitney U test of "candidate latencies are larger", with
+  Holm-Bonferroni correction across the metrics tested;
+- the rank-biserial correlation as effect size: the probability that a candidate
+  turn is slower than a baseline turn, minus the reverse (-1 .. 1).
+
+A metric regresses when the test is significant AND the lower confidence bound of
+its relative change at the gate percentile exceeds `--tolerance`. In other words,
+it is worse with confidence, and by more than the tolerated amount. A drop in the
+answered fraction beyond `--completion-drop` also counts as a regression. The exit
+code is 1 on any regression, so the gate can run unattended.
+"""
+
+import math
+import sys
+
+import numpy as np
+from results_store import DEFAULT_STORE, TURN_COLUMNS, connect
+
+MIN_SAMPLES = 5
+
+
+def mann_whitney_u(baseline: np.ndarray, candidate: np.ndarray) -> tuple[float, float]:
+    """
+    (U of the candidate, one-sided p-value for "candidate tends to be larger").
+
+    Normal approximation with tie and continuity correction, which is accurate
+    enough from ~8 samples per side.
+    """
+    n1, n2 = len(baseline), len(candidate)
+    values = np.concatenate([baseline, candidate])
+    order = values.argsort(kind="mergesort")
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(1, len(values) + 1)
+    # Average ranks over ties
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    rank_sums = np.bincount(inverse, weights=ranks)
+    ranks = (rank_sums / counts)[inverse]
+
+    u = ranks[n1:].sum() - n2 * (n2 + 1) / 2
+    n = n1 + n2
+    tie_term = ((counts**3 - counts).sum()) / (n * (n - 1)) if n > 1 else 0.0
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return float(u), 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return float(u), 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def rank_biserial(u: float, n1: int, n2: int) -> float:
+    """Effect size of a Mann-Whitney U: P(candidate > baseline) - P(candidate < baseline)."""
+    return 2 * u / (n1 * n2) - 1
+
+
+def bootstrap_relative_change(
+    baseline: np.ndarray,
+    candidate: np.ndarray,
+    percentiles: tuple[float, ...],
+    confidence: float = 0.95,
+    resamples: int = 2000,
+    seed: int | None = 0,
+) -> dict[float, tuple[float, float, float]]:
+    """Per percentile: (relative change, CI low, CI high) of candidate vs baseline, resampling both sides."""
+    rng = np.random.default_rng(seed)
+    base_boot = np.percentile(baseline[rng.integers(0, len(baseline), (resamples, len(baseline)))], percentiles, axis=1)
+    cand_boot = np.percentile(
+        candidate[rng.integers(0, len(candidate), (resamples, len(candidate)))], percentiles, axis=1
+    )
+    alpha = (1 - confidence) / 2
+    changes = {}
+    for i, q in enumerate(percentiles):
+        base_q = float(np.percentile(baseline, q))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel = cand_boot[i] / base_boot[i] - 1
+        low, high = np.nanquantile(rel, [alpha, 1 - alpha])
+        changes[q] = (float(np.percentile(candidate, q)) / base_q - 1 if base_q else math.inf, low, high)
+    return changes
+
+
+def holm(p_values: dict[str, float]) -> dict[str, float]:
+    """Holm-Bonferroni adjusted p-values."""
+    adjusted = {}
+    running = 0.0
+    ordered = sorted(p_values.items(), key=lambda kv: kv[1])
+    for i, (name, p) in enumerate(ordered):
+        running = max(running, min(1.0, (len(ordered) - i) * p))
+        adjusted[name] = running
+    return adjusted
+
+
+def compare_runs(
+    baseline: dict[str, np.ndarray],
+    candidate: dict[str, np.ndarray],
+    tolerance: float = 0.1,
+    alpha: float = 0.05,
+    percentiles: tuple[float, ...] = (50, 95),
+    gate_percentile: float = 50,
+    confidence: float = 0.95,
+) -> list[dict]:
+    """One verdict per metric present on both sides with at least MIN_SAMPLES values."""
+    if gate_percentile not in percentiles:
+        percentiles = (*percentiles, gate_percentile)
+    rows = []
+    for name in baseline:
+        a, b = baseline[name], candidate.get(name)
+        if b is None or len(a) < MIN_SAMPLES or len(b) < MIN_SAMPLES:
+            continue
+        u, p = mann_whitney_u(a, b)
+        rows.append(
+            {
+                "metric": name,
+                "n": (len(a), len(b)),
+                "baseline": {q: float(np.percentile(a, q)) for q in percentiles},
+                "candidate": {q: float(np.percentile(b, q)) for q in percentiles},
+                "change": bootstrap_relative_change(a, b, percentiles, confidence),
+                "p": p,
+                "effect": rank_biserial(u, len(a), len(b)),
+            }
+        )
+    adjusted = holm({r["metric"]: r["p"] for r in rows})
+    for r in rows:
+        r["p_adjusted"] = adjusted[r["metric"]]
+        r["regressed"] = r["p_adjusted"] < alpha and r["change"][gate_percentile][1] > tolerance
+    return rows
+
+
+def resolve_runs(conn, spec: str) -> list[dict]:
+    """Comma-separated run IDs or unique prefixes -> run rows, with the benchmark 'mode' from their metadata."""
+    runs = []
+    for prefix in spec.split(","):
+        cursor = conn.execute(
+            "SELECT *, COALESCE(json_extract(metadata, '$.mode'), 'latency') AS mode FROM runs WHERE run_id LIKE ?",
+            (prefix.strip() + "%",),
+        )
+        columns = [c[0] for c in cursor.description]
+        matches = [dict(zip(columns, row, strict=True)) for row in cursor]
+        if len(matches) != 1:
+            raise ValueError(f"run '{prefix}' matches {len(matches)} stored runs")
+        runs.append(matches[0])
+    return runs
+
+
+def load_turn_values(conn, run_ids: list[str]) -> tuple[dict[str, np.ndarray], int]:
+    """(answered values per latency component, number of turns sent) of the given runs."""
+    placeholders = ", ".join("?" * len(run_ids))
+    sql = f"SELECT {', '.join(TURN_COLUMNS)} FROM turns WHERE run_id IN ({placeholders})"
+    rows = conn.execute(sql, run_ids).fetchall()
+    values = {
+        column: np.array([row[i] for row in rows if row[i] is not None], dtype=np.float64)
+        for i, column in enumerate(TURN_COLUMNS)
+    }
+    return values, len(rows)
+
+
+def print_gate_report(rows: list[dict], gate_percentile: float, tolerance: float, confidence: float):
+    print("\n" + "=" * 118)
+    print(f"REGRESSION GATE (p{gate_percentile:g} worse by > {tolerance:.0%} with significance)")
+    print("=" * 118)
+    print(
+        f"{'Metric':<14} | {'N base/cand':>11} | {'Pct':>5} | {'Baseline':>9} | {'Candidate':>9} | {'Change':>8} | "
+        f"{f'{confidence:.0%} CI':>17} | {'p (Holm)':>8} | {'Effect':>6} | Verdict"
+    )
+    print("-" * 118)
+    for r in rows:
+        verdict = "REGRESSION" if r["regressed"] else "ok"
+        for i, q in enumerate(r["baseline"]):
+            change, low, high = r["change"][q]
+            counts = f"{r['n'][0]}/{r['n'][1]}"
+            head = f"{r['metric']:<14} | {counts:>11}" if i == 0 else f"{'':<14} | {'':>11}"
+            tail = f" | {r['p_adjusted']:>8.4f} | {r['effect']:>+6.2f} | {verdict}" if i == 0 else ""
+            print(
+                f"{head} | {f'p{q:g}':>5} | {r['baseline'][q]:>8.3f}s | {r['candidate'][q]:>8.3f}s | "
+                f"{change:>+8.1%} | {f'{low:+.1%} .. {high:+.1%}':>17}{tail}"
+            )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fail if CANDIDATE runs are significantly slower than BASELINE runs")
+    parser.add_argument("baseline", help="Baseline run ID(s) or prefixes, comma-separated")
+    parser.add_argument("candidate", help="Candidate run ID(s) or prefixes, comma-separated")
+    parser.add_argument("--db", default=str(DEFAULT_STORE), help="Results database")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Tolerated relative slowdown (0.1 = 10%%)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level (after Holm correction)")
+    parser.add_argument("--percentile", type=float, default=50, help="Percentile the tolerance applies to")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Bootstrap confidence level")
+    parser.add_argument(
+        "--completion-drop", type=float, default=0.05, help="Tolerated drop of the answered fraction (0.05 = 5 points)"
+    )
+    parser.add_argument(
+        "--metrics", default=",".join(TURN_COLUMNS), help=f"Comma-separated metrics to gate ({','.join(TURN_COLUMNS)})"
+    )
+    parser.add_argument("--allow-different-scenarios", action="store_true", help="Skip the same-prompts check")
+    parser.add_argument(
+        "--allow-different-modes",
+        action="store_true",
+        help="Skip the same-mode check (e.g. gate a load run against a single-session baseline)",
+    )
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    try:
+        baseline_runs = resolve_runs(conn, args.baseline)
+        candidate_runs = resolve_runs(conn, args.candidate)
+    except ValueError as e:
+        parser.error(str(e))
+    scenarios = {r["scenario_hash"] for r in baseline_runs + candidate_runs}
+    if len(scenarios) > 1 and not args.allow_different_scenarios:
+        parser.error(f"the runs used different prompts ({', '.join(sorted(map(str, scenarios)))})")
+    modes = {r["mode"] for r in baseline_runs + candidate_runs}
+    if len(modes) > 1 and not args.allow_different_modes:
+        # Latency under load is not comparable with single-session latency
+        parser.error(f"the runs used different benchmark modes ({', '.join(sorted(modes))})")
+
+    metrics = [m for m in args.metrics.split(",") if m]
+    baseline, base_sent = load_turn_values(conn, [r["run_id"] for r in baseline_runs])
+    candidate, cand_sent = load_turn_values(conn, [r["run_id"] for r in candidate_runs])
+    rows = compare_runs(
+        {m: baseline[m] for m in metrics},
+        {m: candidate[m] for m in metrics},
+        tolerance=args.tolerance,
+        alpha=args.alpha,
+        gate_percentile=args.percentile,
+        confidence=args.confidence,
+    )
+
+    print(f"Baseline:  {', '.join(r['run_id'][:8] for r in baseline_runs)} ({baseline_runs[0]['vendor']})")
+    print(f"Candidate: {', '.join(r['run_id'][:8] for r in candidate_runs)} ({candidate_runs[0]['vendor']})")
+    print_gate_report(rows, args.percentile, args.tolerance, args.confidence)
+
+    regressions = [r["metric"] for r in rows if r["regressed"]]
+    base_done = len(baseline["total"]) / base_sent if base_sent else None
+    cand_done = len(candidate["total"]) / cand_sent if cand_sent else None
+    if base_done is not None and cand_done is not None:
+        print(f"\nAnswered: {base_done:.0%} -> {cand_done:.0%}")
+        if base_done - cand_done > args.completion_drop:
+            regressions.append("answered fraction")
+
+    if regressions:
+        print(f"\n❌ Regression: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ No significant regression")
+
+
+if __name__ == "__main__":
+    main()
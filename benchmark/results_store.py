@@ -0,0 +1,442 @@
+"""
+Persistent benchmark results: every run goes into a local SQLite database.
+
+One row per run holds its metadata (agent script, vendor, git commit, host, scenario
+file and a hash of its prompts). Per-turn latencies, the resource monitor's samples
+and the agent's metric events reference it. Rows are queued and written by a
+background thread in batched transactions, so the benchmark itself never waits
+on disk.
+
+The same module is a small CLI over the store:
+
+    python benchmark/results_store.py runs               # latest runs
+    python benchmark/results_store.py compare            # vendor comparison table
+    python benchmark/results_store.py compare --scenario benchmark/scenarios.json --last 20
+"""
+
+import hashlib
+import json
+import os
+import platform
+import queue
+import socket
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from clock_sync import precise_time
+from latency_histogram import LatencyHistogram
+
+DEFAULT_STORE = Path(__file__).resolve().parent / "results.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    vendor TEXT NOT NULL,
+    agent TEXT,
+    scenario TEXT,
+    scenario_hash TEXT,
+    git_commit TEXT,
+    git_dirty INTEGER,
+    host TEXT,
+    system TEXT,
+    python TEXT,
+    cpu_count INTEGER,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_vendor ON runs (vendor, scenario_hash, started_at);
+CREATE TABLE IF NOT EXISTS turns (
+    run_id TEXT NOT NULL REFERENCES runs (run_id),
+    turn INTEGER NOT NULL,
+    request_id TEXT,
+    prompt TEXT,
+    sent_ts REAL,
+    total REAL,
+    uplink REAL,
+    thinking REAL,
+    first_frame REAL,
+    mouth_motion REAL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_run ON turns (run_id);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id TEXT NOT NULL REFERENCES runs (run_id),
+    ts REAL NOT NULL,
+    cpu_percent REAL,
+    rss_mb REAL,
+    uss_mb REAL,
+    pss_mb REAL,
+    gpu_util REAL,
+    gpu_mem_mb REAL,
+    processes INTEGER
+);
+CREATE INDEX IF NOT EXISTS samples_run ON samples (run_id);
+CREATE TABLE IF NOT EXISTS events (
+    run_id TEXT NOT NULL REFERENCES runs (run_id),
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    request_id TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_run ON events (run_id);
+"""
+
+TURN_COLUMNS = ("total", "uplink", "thinking", "first_frame", "mouth_motion")
+
+# Benchmark modes recorded in the run metadata. Latency and matrix runs measure one
+# session per room at a time, so their turns are comparable with each other.
+MODES = ("latency", "matrix", "load", "open_loop", "capacity")
+LATENCY_MODES = ("latency", "matrix")
+
+
+def connect(path: str | Path = DEFAULT_STORE) -> sqlite3.Connection:
+    """Opens (and if needed creates) the store."""
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def git_revision(cwd: str | Path | None = None) -> tuple[str | None, bool | None]:
+    """(HEAD commit, whether the working tree has uncommitted changes), or (None, None) outside git."""
+    cwd = cwd or Path(__file__).resolve().parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd, capture_output=True, text=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def prompts_hash(prompts: list[str]) -> str:
+    """Identifies a scenario set by its prompts, so renamed or copied files still compare."""
+    return hashlib.sha256(json.dumps(list(prompts)).encode()).hexdigest()[:16]
+
+
+@dataclass
+class RunMetadata:
+    vendor: str
+    agent: str | None = None
+    scenario: str | None = None
+    scenario_hash: str | None = None
+    git_commit: str | None = None
+    git_dirty: bool | None = None
+    host: str = field(default_factory=socket.gethostname)
+    system: str = field(default_factory=platform.platform)  # OS and kernel
+    python: str = field(default_factory=platform.python_version)
+    cpu_count: int | None = field(default_factory=os.cpu_count)
+    extra: dict = field(default_factory=dict)  # e.g. command-line options
+
+    @classmethod
+    def collect(cls, vendor: str, agent: str | None, scenario: str | None, prompts: list[str], **extra):
+        commit, dirty = git_revision()
+        return cls(
+            vendor=vendor,
+            agent=agent,
+            scenario=scenario,
+            scenario_hash=prompts_hash(prompts),
+            git_commit=commit,
+            git_dirty=dirty,
+            extra=extra,
+        )
+
+
+class ResultsStore:
+    """
+    Queued writer for one store. `start_run()` returns the new run's ID immediately;
+    rows added afterwards are written in batches of up to `batch_size`, at least every
+    `flush_interval` seconds. `close()` writes whatever is still queued.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_STORE, batch_size: int = 1000, flush_interval: float = 1.0):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue()
+        self._ready = threading.Event()
+        self._error: Exception | None = None
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    def start_run(self, metadata: RunMetadata) -> str:
+        run_id = uuid.uuid4().hex
+        meta = asdict(metadata)
+        extra = meta.pop("extra")
+        row = (run_id, precise_time(), *meta.values(), json.dumps(extra))
+        self._queue.put(("INSERT INTO runs VALUES (?, ?, NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row))
+        return run_id
+
+    def finish_run(self, run_id: str):
+        self._queue.put(("UPDATE runs SET finished_at = ? WHERE run_id = ?", (precise_time(), run_id)))
+
+    def add_turns(self, run_id: str, turns: list[dict]):
+        """Turns as dicts with 'request_id', 'prompt', 'sent_ts', TURN_COLUMNS and an optional 'details' dict."""
+        for i, t in enumerate(turns):
+            row = (
+                run_id,
+                i,
+                t.get("request_id"),
+                t.get("prompt"),
+                t.get("sent_ts"),
+                *(t.get(c) for c in TURN_COLUMNS),
+                json.dumps(t["details"]) if t.get("details") else None,
+            )
+            self._queue.put(("INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row))
+
+    def add_samples(self, run_id: str, samples: list):
+        """SystemMonitor samples (SystemMetrics)."""
+        for m in samples:
+            row = (
+                run_id,
+                m.timestamp,
+                m.cpu_percent,
+                m.memory_mb,
+                m.uss_mb,
+                m.pss_mb,
+                m.gpu_util,
+                m.gpu_mem_mb,
+                len(m.processes),
+            )
+            self._queue.put(("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row))
+
+    def add_events(self, run_id: str, metrics: list):
+        """Agent metric events (AgentMetric)."""
+        for m in metrics:
+            row = (run_id, m.timestamp, m.type, m.request_id, json.dumps(m.data))
+            self._queue.put(("INSERT INTO events VALUES (?, ?, ?, ?, ?)", row))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error:
+            raise self._error
+
+    def _writer(self):
+        try:
+            conn = connect(self.path)
+        except sqlite3.Error as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        batch: list[tuple[str, list[tuple]]] = []  # runs of rows sharing a statement, in queue order
+        pending = 0
+        deadline = time.monotonic() + self.flush_interval
+        done = False
+        while not done:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is None:
+                    done = True
+                else:
+                    if batch and batch[-1][0] == item[0]:
+                        batch[-1][1].append(item[1])
+                    else:
+                        batch.append((item[0], [item[1]]))
+                    pending += 1
+            except queue.Empty:
+                pass
+            if pending and (done or pending >= self.batch_size or time.monotonic() >= deadline):
+                try:
+                    with conn:
+                        for sql, rows in batch:
+                            conn.executemany(sql, rows)
+                except sqlite3.Error as e:
+                    self._error = e
+                batch = []
+                pending = 0
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+        conn.close()
+
+
+def select_runs(
+    conn: sqlite3.Connection,
+    vendor: str | None = None,
+    scenario: str | None = None,
+    since: float | None = None,
+    last: int | None = None,
+    mode: str | tuple[str, ...] | None = None,
+) -> list[dict]:
+    """
+    Runs matching the filters, newest first. `scenario` matches the recorded file path or the prompts hash,
+    `mode` one or several benchmark modes recorded in the metadata (runs without one are latency runs).
+    """
+    where, params = [], []
+    if vendor:
+        where.append("vendor = ?")
+        params.append(vendor)
+    if scenario:
+        where.append("(scenario = ? OR scenario_hash = ?)")
+        params += [scenario, scenario]
+    if since:
+        where.append("started_at >= ?")
+        params.append(since)
+    if mode:
+        modes = (mode,) if isinstance(mode, str) else tuple(mode)
+        where.append(f"COALESCE(json_extract(metadata, '$.mode'), 'latency') IN ({', '.join('?' * len(modes))})")
+        params += modes
+    sql = "SELECT * FROM runs" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY started_at DESC"
+    cursor = conn.execute(sql, params)
+    columns = [c[0] for c in cursor.description]
+    runs = [dict(zip(columns, row, strict=True)) for row in cursor]
+    if last:
+        # The newest `last` runs of every vendor
+        counts: dict[str, int] = {}
+        kept = []
+        for r in runs:
+            counts[r["vendor"]] = counts.get(r["vendor"], 0) + 1
+            if counts[r["vendor"]] <= last:
+                kept.append(r)
+        runs = kept
+    return runs
+
+
+def _temp_run_table(conn: sqlite3.Connection, run_ids: list[str]):
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS selected_runs (run_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM selected_runs")
+    conn.executemany("INSERT INTO selected_runs VALUES (?)", [(r,) for r in run_ids])
+
+
+def vendor_summary(conn: sqlite3.Connection, runs: list[dict]) -> list[dict]:
+    """
+    One row per vendor over the given runs: latency percentiles of every turn
+    component, answered fraction and agent CPU / RSS.
+    """
+    _temp_run_table(conn, [r["run_id"] for r in runs])
+    vendors = {r["run_id"]: r["vendor"] for r in runs}
+    summary: dict[str, dict] = {}
+    for vendor in dict.fromkeys(vendors.values()):
+        summary[vendor] = {
+            "vendor": vendor,
+            "runs": 0,
+            "turns": 0,
+            "answered": 0,
+            **{c: LatencyHistogram() for c in TURN_COLUMNS},
+            "cpu_avg": None,
+            "cpu_max": None,
+            "rss_max": None,
+        }
+    for run_id in vendors:
+        summary[vendors[run_id]]["runs"] += 1
+
+    rows = conn.execute(
+        f"SELECT t.run_id, {', '.join('t.' + c for c in TURN_COLUMNS)} FROM turns t JOIN selected_runs USING (run_id)"
+    )
+    for run_id, *values in rows:
+        entry = summary[vendors[run_id]]
+        entry["turns"] += 1
+        entry["answered"] += values[0] is not None
+        for column, value in zip(TURN_COLUMNS, values, strict=True):
+            if value is not None:
+                entry[column].record(value)
+
+    resources = conn.execute(
+        "SELECT r.vendor, AVG(s.cpu_percent), MAX(s.cpu_percent), MAX(s.rss_mb) "
+        "FROM samples s JOIN selected_runs USING (run_id) JOIN runs r USING (run_id) GROUP BY r.vendor"
+    )
+    for vendor, cpu_avg, cpu_max, rss_max in resources:
+        summary[vendor].update(cpu_avg=cpu_avg, cpu_max=cpu_max, rss_max=rss_max)
+    return list(summary.values())
+
+
+def print_runs(runs: list[dict]):
+    print("\n" + "=" * 110)
+    print("STORED RUNS")
+    print("=" * 110)
+    print(f"{'Run':<10} | {'Started':<19} | {'Vendor':<14} | {'Scenario':<28} | {'Commit':<10} | {'Host':<14}")
+    print("-" * 110)
+    for r in runs:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r["started_at"]))
+        commit = (r["git_commit"] or "N/A")[:8] + ("+" if r["git_dirty"] else "")
+        scenario = Path(r["scenario"]).name if r["scenario"] else f"#{r['scenario_hash']}"
+        print(
+            f"{r['run_id'][:10]:<10} | {started:<19} | {r['vendor'][:14]:<14} | {scenario[:28]:<28} | "
+            f"{commit:<10} | {(r['host'] or '')[:14]:<14}"
+        )
+
+
+def print_vendor_comparison(summary: list[dict]):
+    def fmt(hist, q):
+        value = hist.percentile(q) if hist.count else None
+        return f"{value:.3f}" if value is not None else "N/A"
+
+    def num(value, unit):
+        return f"{value:.0f}{unit}" if value is not None else "N/A"
+
+    print("\n" + "=" * 128)
+    print("VENDOR COMPARISON (seconds)")
+    print("=" * 128)
+    print(
+        f"{'Vendor':<14} | {'Runs':>5} | {'Turns':>6} | {'Answered':>8} | {'Total p50':>9} | {'Total p95':>9} | "
+        f"{'Total p99':>9} | {'Uplink p50':>10} | {'Think p50':>9} | {'Frame p50':>9} | {'CPU avg':>7} | "
+        f"{'RSS max':>8}"
+    )
+    print("-" * 128)
+    for s in sorted(summary, key=lambda s: s["total"].percentile(50) if s["total"].count else float("inf")):
+        answered = f"{s['answered'] / s['turns']:.0%}" if s["turns"] else "N/A"
+        print(
+            f"{s['vendor'][:14]:<14} | {s['runs']:>5} | {s['turns']:>6} | {answered:>8} | "
+            f"{fmt(s['total'], 50):>9} | {fmt(s['total'], 95):>9} | {fmt(s['total'], 99):>9} | "
+            f"{fmt(s['uplink'], 50):>10} | {fmt(s['thinking'], 50):>9} | {fmt(s['first_frame'], 50):>9} | "
+            f"{num(s['cpu_avg'], '%'):>7} | {num(s['rss_max'], ' MB'):>8}"
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the benchmark results store")
+    parser.add_argument("--db", default=str(DEFAULT_STORE), help="Results database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("runs", "List stored runs"), ("compare", "Vendor comparison table")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--vendor", help="Only this vendor")
+        p.add_argument("--scenario", help="Only runs of this scenario file (or scenario hash)")
+        p.add_argument("--days", type=float, help="Only runs from the last N days")
+        p.add_argument("--last", type=int, help="Only the newest N runs per vendor")
+        p.add_argument(
+            "--mode",
+            choices=MODES,
+            default=None if name == "runs" else LATENCY_MODES,
+            help="Only runs of this benchmark mode (compare: latency and matrix runs by default, so loaded runs "
+            "don't skew it)",
+        )
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        parser.error(f"no results store at {args.db}")
+    conn = connect(args.db)
+    since = time.time() - args.days * 86400 if args.days else None
+    scenario = args.scenario
+    if scenario and Path(scenario).is_file():
+        # Match on content: the same prompts stored from another checkout or path
+        with open(scenario) as f:
+            scenario = prompts_hash(json.load(f))
+    runs = select_runs(conn, vendor=args.vendor, scenario=scenario, since=since, last=args.last, mode=args.mode)
+    if not runs:
+        print("No matching runs")
+        return
+    if args.command == "runs":
+        print_runs(runs)
+    else:
+        print_vendor_comparison(vendor_summary(conn, runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,133 +1,202 @@
+"""
+Plays the recorded scenario prompts (benchmark/audio_samples/*.ogg|wav) to the agent as
+a microphone, and measures voice-to-voice latency for each of them.
+
+Everything runs in-process: each room gets one connection with one published
+microphone track fed from a persistent AudioSource. Every sample comes from the
+sample cache as memory-mapped 48 kHz mono int16, loaded before the first room
+connects and shared by all rooms. A scenario is:
+
+1. the sample is pushed into the AudioSource at real-time speed (driver.play_pcm);
+2. the end of the user's speech is the moment its last audible frame leaves the source;
+3. the agent's response is the first audible block on its audio track;
+4. the scenario ends with the agent's turn (state back to listening, or silence),
+   followed by a think time before the next sample.
+
+Voice-to-voice latency is (3) - (2). Several rooms (`--rooms`) run the scenario set
+in parallel, each served by its own agent job.
+"""
+
+import asyncio
 import glob
 import os
-import subprocess
-import time
+from dataclasses import dataclass
 from pathlib import Path
 
+import numpy as np
+from audio_analysis import AudioResponseDetector, consume_audio
+from clock_sync import precise_time
 from dotenv import load_dotenv
+from driver import NUM_CHANNELS, SAMPLE_RATE, SPEECH_THRESHOLD_DBFS, play_pcm, speech_end
+from latency_driver import driver_token, histogram_of, print_latency_report
+from livekit import rtc
+from sample_cache import load_sample
+from think_time import ThinkTime
+from turn_detection import AGENT_STATE_ATTRIBUTE, TurnCompletionDetector, TurnEnd
 
 # 1. Configuration
-# Load env variables to get API keys for the CLI
 load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
 
 AUDIO_DIR = "benchmark/audio_samples"
 LIVEKIT_URL = os.getenv("LIVEKIT_URL", "ws://localhost:7880")
-API_KEY = os.getenv("LIVEKIT_API_KEY", "devkey")
-API_SECRET = os.getenv("LIVEKIT_API_SECRET", "secret")
 ROOM_NAME = "benchmark-room"
 
-# How long to wait between scenarios (to let Agent finish speaking)
-SCENARIO_DELAY_SECONDS = 15
-
-
-def run_scenario(audio_file):
-    filename = os.path.basename(audio_file)
-    print(f"\n🎬 STARTING SCENARIO: {filename}")
-    print("   (Injecting audio via LiveKit CLI...)")
-
-    # 2. Construct the 'lk' CLI command
-    # We use --publish to play the file as a microphone
-    cmd = [
-        "lk",
-        "room",
-        "join",
-        "--url",
-        LIVEKIT_URL,
-        "--api-key",
-        API_KEY,
-        "--api-secret",
-        API_SECRET,
-        "--identity",
-        f"tester_{filename}",  # Unique ID per test
-        "--publish",
-        audio_file,
-        ROOM_NAME,
-    ]
-
-    try:
-        # 3. Run the command
-        # We wait for the process to complete (audio file finished uploading/playing)
-        _result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-
-        # Note: 'lk' usually exits after publishing if we don't use --subscribe?
-        # Actually 'lk room join' stays open. We need to make sure we only publish
-        # and then exit, or kill it after a duration.
-        #
-        # FIX: The 'lk' tool stays connected indefinitely by default.
-        # We should probably run it with a timeout or use a flag if available.
-        # Since 'lk' doesn't have "publish and quit", we will use 'timeout' logic in python.
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error running scenario {filename}:")
-        print(e.stderr)
-    except Exception as e:
-        print(f"⚠️ execution error: {e}")
-
-
-def run_timed_scenario(audio_file, duration=10):
-    """
-    Runs lk CLI for a fixed duration (enough to say the prompt + hear response)
-    then kills it to move to next scenario.
-    """
-    filename = os.path.basename(audio_file)
-    print("\n------------------------------------------------")
-    print(f"🎬 SCENARIO: {filename}")
-    print("------------------------------------------------")
-
-    cmd = [
-        "lk",
-        "room",
-        "join",
-        "--url",
-        LIVEKIT_URL,
-        "--api-key",
-        API_KEY,
-        "--api-secret",
-        API_SECRET,
-        "--identity",
-        "tester_bot",
-        "--publish",
-        audio_file,
-        ROOM_NAME,
-    ]
-
-    # Start the process non-blocking
-    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-
-    print(f"   -> 🗣️  Speaking prompt (Process PID: {process.pid})...")
-
-    # Wait while the conversation happens (Agent responding)
-    # You can adjust this 'sleep' based on how long your agent usually talks
-    for i in range(duration):
-        print(f"   -> 👂 Listening... ({duration - i}s remaining)", end="\r")
-        time.sleep(1)
-
-    print("\n   -> ⏹️  Finished. Stopping connection.")
-    process.terminate()
+# A scenario ends when the agent's answer does (state back to listening, or silence).
+# The timeout is only a safety net; the think time is the pause before the next scenario.
+SCENARIO_TIMEOUT_SECONDS = 30
+SCENARIO_THINK_TIME = os.getenv("SCENARIO_THINK_TIME", "1")
+SILENCE_SECONDS = 0.8
+
+
+@dataclass
+class Scenario:
+    name: str
+    samples: np.ndarray
+    speech_end: float  # offset of the end of speech within the sample (s)
+
+
+@dataclass
+class ScenarioResult:
+    room: str
+    scenario: str
+    speech_end_ts: float
+    response_ts: float | None
+    turn_end: TurnEnd | None
+
+    @property
+    def voice_to_voice(self) -> float | None:
+        return self.response_ts - self.speech_end_ts if self.response_ts is not None else None
+
+
+def load_scenarios(files: list[str]) -> list[Scenario]:
+    scenarios = []
+    for path in files:
+        samples = load_sample(path)
+        scenarios.append(Scenario(os.path.basename(path), samples, speech_end(samples)))
+    return scenarios
+
+
+async def run_room(
+    room_name: str, scenarios: list[Scenario], think_time: ThinkTime, timeout: float = SCENARIO_TIMEOUT_SECONDS
+) -> list[ScenarioResult]:
+    """Runs the whole scenario set in one room over a single connection and microphone track."""
+    detector = AudioResponseDetector(threshold_dbfs=SPEECH_THRESHOLD_DBFS)
+    completion = TurnCompletionDetector(silence=SILENCE_SECONDS, threshold_dbfs=SPEECH_THRESHOLD_DBFS)
+    room = rtc.Room()
+    media_tasks: list[asyncio.Task] = []
+    results: list[ScenarioResult] = []
+
+    @room.on("track_subscribed")
+    def on_track_subscribed(track: rtc.Track, publication: rtc.RemoteTrackPublication, participant):
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            handlers = [detector.process, completion.process]
+            media_tasks.append(asyncio.create_task(consume_audio(track, publication.sid, handlers)))
+
+    @room.on("participant_attributes_changed")
+    def on_attributes_changed(changed: dict[str, str], participant: rtc.Participant):
+        if AGENT_STATE_ATTRIBUTE in changed:
+            completion.on_agent_state(changed[AGENT_STATE_ATTRIBUTE], precise_time())
+
+    source = rtc.AudioSource(SAMPLE_RATE, NUM_CHANNELS)
     try:
-        process.wait(timeout=2)
-    except subprocess.TimeoutExpired:
-        process.kill()
+        await room.connect(LIVEKIT_URL, driver_token(room_name, "tester_bot"))
+        track = rtc.LocalAudioTrack.create_audio_track("scenario_mic", source)
+        options = rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_MICROPHONE)
+        await room.local_participant.publish_track(track, options)
+
+        start_wait = precise_time()
+        while len(room.remote_participants) == 0:
+            if precise_time() - start_wait > 30:
+                print(f"   -> ⚠️  [{room_name}] Timeout waiting for agent to join room")
+                return results
+            await asyncio.sleep(0.5)
+        # Let the agent subscribe to the microphone before the first prompt
+        await asyncio.sleep(2)
+
+        for scenario in scenarios:
+            print(f"🎬 [{room_name}] SCENARIO: {scenario.name}")
+            started_at = precise_time()
+            detector.arm(started_at)
+            completion.arm(started_at)
+            timing = await play_pcm(source, scenario.samples, speech_end_offset=scenario.speech_end)
+            speech_end_ts = timing.speech_end_ts
+
+            response_ts = await detector.wait(max(0.0, timeout - (precise_time() - started_at)))
+            turn_end = None
+            if response_ts is not None:
+                print(f"   -> ⚡ [{room_name}] Voice-to-voice: {response_ts - speech_end_ts:.3f}s")
+                turn_end = await completion.wait(max(0.0, timeout - (precise_time() - started_at)))
+            else:
+                print(f"   -> ❌ [{room_name}] No response within {timeout}s")
+            if response_ts is not None and turn_end is None:
+                print(f"   -> ⚠️  [{room_name}] Turn still running after {timeout}s, moving on")
+            results.append(ScenarioResult(room_name, scenario.name, speech_end_ts, response_ts, turn_end))
+
+            # Think time between tests
+            await asyncio.sleep(think_time())
+    finally:
+        for task in media_tasks:
+            task.cancel()
+        await source.aclose()
+        await room.disconnect()
+    return results
+
+
+async def run_all(scenarios: list[Scenario], rooms: int, think_time: ThinkTime, timeout: float):
+    names = [ROOM_NAME] if rooms == 1 else [f"{ROOM_NAME}-{i}" for i in range(rooms)]
+    per_room = await asyncio.gather(*(run_room(name, scenarios, think_time, timeout) for name in names))
+    return [r for results in per_room for r in results]
+
+
+def print_scenario_report(results: list[ScenarioResult]):
+    print("\n" + "=" * 92)
+    print("SCENARIOS - VOICE-TO-VOICE LATENCY (end of user speech -> first agent audio)")
+    print("=" * 92)
+    print(f"{'Room':<20} | {'Scenario':<28} | {'Voice-to-voice':>14} | {'Turn':>8} | Ended by")
+    print("-" * 92)
+    for r in results:
+        v2v = f"{r.voice_to_voice:.3f} s" if r.voice_to_voice is not None else "timeout"
+        turn = f"{r.turn_end.ts - r.speech_end_ts:.1f} s" if r.turn_end else "N/A"
+        print(
+            f"{r.room[:20]:<20} | {r.scenario[:28]:<28} | {v2v:>14} | {turn:>8} | "
+            f"{r.turn_end.reason if r.turn_end else 'timeout'}"
+        )
+    print_latency_report(
+        {"Voice-to-Voice": histogram_of([r.voice_to_voice for r in results if r.voice_to_voice is not None])}
+    )
 
 
 def main():
-    # 1. Find all .ogg files
-    ogg_files = sorted(glob.glob(os.path.join(AUDIO_DIR, "*.ogg")))
-
-    if not ogg_files:
-        print(f"❌ No .ogg files found in {AUDIO_DIR}")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play the audio scenarios to the agent and measure its responses")
+    parser.add_argument("--audio-dir", default=AUDIO_DIR, help="Directory with the scenario samples (*.ogg, *.wav)")
+    parser.add_argument("--rooms", type=int, default=1, help="Rooms running the scenario set in parallel")
+    parser.add_argument(
+        "--think-time", default=SCENARIO_THINK_TIME, help="Pause after each answer (seconds or a distribution)"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=SCENARIO_TIMEOUT_SECONDS, help="Safety timeout per scenario (s)"
+    )
+    args = parser.parse_args()
+
+    # 1. Find all samples
+    sample_files = sorted(
+        path for pattern in ("*.ogg", "*.wav") for path in glob.glob(os.path.join(args.audio_dir, pattern))
+    )
+
+    if not sample_files:
+        print(f"❌ No .ogg or .wav files found in {args.audio_dir}")
         print("   Run 'python benchmark/generate_samples.py' first!")
         return
 
-    print(f"Found {len(ogg_files)} scenarios. Connecting to {LIVEKIT_URL}...")
-
-    # 2. Iterate through them
-    for ogg in ogg_files:
-        # Run each scenario for 15 seconds (Adjust if agent answers are long)
-        run_timed_scenario(ogg, duration=SCENARIO_DELAY_SECONDS)
+    # 2. Decode once, shared by every room
+    scenarios = load_scenarios(sample_files)
+    print(f"Found {len(scenarios)} scenarios. Connecting to {LIVEKIT_URL} ({args.rooms} room(s))...")
 
-        # Small buffer between tests
-        time.sleep(2)
+    # 3. Run them
+    results = asyncio.run(run_all(scenarios, args.rooms, ThinkTime.parse(args.think_time), args.timeout))
+    print_scenario_report(results)
 
     print("\n✅ All scenarios completed.")
 
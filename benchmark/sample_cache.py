@@ -0,0 +1,213 @@
+"""
+Decoded audio samples, cached on disk in the layout LiveKit wants (48 kHz mono int16).
+
+Any input is decoded once: WAV with the standard library, anything else (the
+OGG/Opus samples from generate_samples.py, MP3, ...) through pydub/ffmpeg. It is
+downmixed to mono and resampled with a polyphase FIR resampler in numpy. The result
+is stored as an `.npy` file named after the SHA-256 of the source file and the
+target format, so a renamed or copied sample is a hit and an edited one is a miss.
+
+Hits are loaded memory-mapped and kept per process. Every virtual user playing the
+same sample shares one read-only mapping, and across processes the page cache holds
+a single copy. Files are written atomically. When the cache outgrows `max_bytes`,
+the least recently used files are evicted.
+
+    python benchmark/sample_cache.py benchmark/audio_samples/*.ogg    # warm the cache
+"""
+
+import hashlib
+import math
+import os
+import threading
+import wave
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".sample_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+SAMPLE_RATE = 48000
+# FIR taps per polyphase branch, and the Kaiser window's beta (as in scipy.signal.resample_poly)
+TAPS_PER_PHASE = 20
+KAISER_BETA = 5.0
+
+
+def file_hash(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def decode(path: str | Path) -> tuple[np.ndarray, int]:
+    """(float32 samples shaped (frames, channels) in -1..1, sample rate) of any audio file."""
+    path = str(path)
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wf:
+            width, channels, rate = wf.getsampwidth(), wf.getnchannels(), wf.getframerate()
+            raw = wf.readframes(wf.getnframes())
+    else:
+        from pydub import AudioSegment
+
+        sound = AudioSegment.from_file(path)
+        width, channels, rate, raw = sound.sample_width, sound.channels, sound.frame_rate, sound.raw_data
+    return pcm_to_float(raw, width).reshape(-1, channels), rate
+
+
+def pcm_to_float(raw: bytes, width: int) -> np.ndarray:
+    if width == 1:
+        # 8-bit PCM is unsigned
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    if width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        return (values - ((values & 0x800000) << 1)).astype(np.float32) / (1 << 23)
+    if width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        return np.frombuffer(raw, dtype=dtype).astype(np.float32) / -np.iinfo(dtype).min
+    raise ValueError(f"unsupported sample width: {width} bytes")
+
+
+def lowpass_filter(up: int, down: int) -> np.ndarray:
+    """Kaiser-windowed sinc for resampling by up/down, cut off at the lower of the two Nyquist rates."""
+    factor = max(up, down)
+    n = 2 * (TAPS_PER_PHASE // 2) * factor + 1
+    t = np.arange(n) - (n - 1) / 2
+    return (np.sinc(t / factor) * np.kaiser(n, KAISER_BETA) * up / factor).astype(np.float64)
+
+
+def resample_poly(x: np.ndarray, up: int, down: int, chunk: int = 1 << 16) -> np.ndarray:
+    """
+    Resamples a 1-D signal by up/down.
+
+    The zero-stuffed upsampled signal is never built: output sample n only needs
+    the one polyphase branch of the filter that meets real input samples around
+    n * down / up. Branches and input windows are gathered for a chunk of outputs
+    at once, which is one multiply-add per branch tap and output sample.
+    """
+    g = math.gcd(up, down)
+    up, down = up // g, down // g
+    if up == down:
+        return x.astype(np.float32, copy=True)
+    h = lowpass_filter(up, down)
+    taps = math.ceil(len(h) / up)
+    # branches[p, j] = h[p + j * up]: the taps that meet real (non-stuffed) inputs at phase p
+    branches = np.zeros(taps * up)
+    branches[: len(h)] = h
+    branches = branches.reshape(taps, up).T
+    delay = (len(h) - 1) // 2
+    padded = np.concatenate([np.zeros(taps), x.astype(np.float64), np.zeros(taps)])
+
+    out_len = math.ceil(len(x) * up / down)
+    y = np.empty(out_len, dtype=np.float32)
+    j = np.arange(taps)
+    for start in range(0, out_len, chunk):
+        t = np.arange(start, min(start + chunk, out_len)) * down + delay
+        window = padded[(t // up)[:, None] - j + taps]
+        y[start : start + len(t)] = np.einsum("nj,nj->n", branches[t % up], window)
+    return y
+
+
+def to_pcm16(samples: np.ndarray, rate: int, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """(frames, channels) float samples -> mono int16 at `target_rate`."""
+    mono = samples.mean(axis=1) if samples.ndim == 2 else samples
+    resampled = resample_poly(mono, target_rate, rate)
+    return np.clip(np.round(resampled * 32768), -32768, 32767).astype(np.int16)
+
+
+class SampleCache:
+    def __init__(
+        self,
+        directory: str | Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        sample_rate: int = SAMPLE_RATE,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self._mapped: dict[tuple, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, digest: str) -> Path:
+        # Keyed by source content and target format
+        return self.directory / f"{digest}-{self.sample_rate}hz-mono-s16.npy"
+
+    def load(self, source: str | Path) -> np.ndarray:
+        """The source as read-only 48 kHz mono int16, memory-mapped from the cache."""
+        stat = os.stat(source)
+        key = (os.path.realpath(source), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._mapped:
+                return self._mapped[key]
+            cached = self.path_for(file_hash(source))
+            if cached.exists():
+                os.utime(cached)  # recency for eviction
+            else:
+                self._store(cached, to_pcm16(*decode(source), target_rate=self.sample_rate))
+            samples = np.load(cached, mmap_mode="r")
+            self._mapped[key] = samples
+            return samples
+
+    def _store(self, path: Path, samples: np.ndarray):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, "wb") as f:
+            np.save(f, samples)
+        os.replace(tmp, path)
+        self.evict(keep=path)
+
+    def evict(self, keep: Path | None = None) -> list[Path]:
+        """Removes least recently used files until the cache fits in `max_bytes`."""
+        files = []
+        for path in self.directory.glob("*.npy"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:  # evicted by another process
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        removed = []
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            # Open mappings keep their pages; the file only disappears from the directory
+            path.unlink(missing_ok=True)
+            total -= size
+            removed.append(path)
+        return removed
+
+
+_default_cache: SampleCache | None = None
+
+
+def load_sample(path: str | Path) -> np.ndarray:
+    """Loads through the process-wide default cache, so all callers share its mappings."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SampleCache()
+    return _default_cache.load(path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Decode audio samples into the 48 kHz mono cache")
+    parser.add_argument("files", nargs="+", help="Audio files (WAV, OGG, MP3, ...)")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Cache directory")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 2**20, help="Cache size bound (MB)")
+    args = parser.parse_args()
+
+    cache = SampleCache(args.cache_dir, int(args.max_mb * 2**20))
+    for path in args.files:
+        samples = cache.load(path)
+        print(f" -> {path}: {len(samples) / cache.sample_rate:.2f}s ({samples.nbytes / 1024:.0f} KB)")
+    used = sum(p.stat().st_size for p in cache.directory.glob("*.npy"))
+    print(f"Cache {cache.directory}: {used / 2**20:.1f} MB of {args.max_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
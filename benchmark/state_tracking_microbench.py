@@ -0,0 +1,204 @@
+"""
+Microbenchmark: polling vs event-driven agent state tracking.
+
+Replays the same schedule of agent state transitions (plus an idle stretch with no
+transitions at all) against:
+
+1. The old benchmark hook: a `while True` loop that compares `session.agent_state`
+   every 10 ms.
+2. The current benchmark hook: an `agent_state_changed` listener that timestamps
+   the transition when the event fires.
+
+Both send their "speaking" metrics as binary records over the same Unix socket the
+benchmark runner reads (metric_protocol.py), and a reader thread records what
+arrives. The ground truth is the transition time the simulated session stamps on
+the event it emits (like AgentStateChangedEvent.created_at), collected by a
+listener that belongs to neither strategy. For each strategy the report shows how
+often it woke up, how far the recorded metric timestamps were from the true
+transitions, and how long a metric took from the transition to the reader.
+
+Usage:
+    uv run python benchmark/state_tracking_microbench.py --transitions 200 --idle 5
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import threading
+from dataclasses import dataclass
+
+from clock_sync import precise_time
+from livekit import rtc
+from metric_protocol import MetricSocketReader, MetricSocketWriter, encode_metric
+
+STATES = ["listening", "thinking", "speaking"]
+
+
+@dataclass
+class StateChange:
+    old_state: str
+    new_state: str
+    created_at: float
+
+
+class SimulatedSession(rtc.EventEmitter):
+    """Stand-in for AgentSession: holds `agent_state` and emits a timestamped 'agent_state_changed'."""
+
+    def __init__(self):
+        super().__init__()
+        self.agent_state = "initializing"
+
+    def set_state(self, state: str):
+        old = self.agent_state
+        self.agent_state = state
+        self.emit("agent_state_changed", StateChange(old, state, precise_time()))
+
+
+class MetricSink:
+    """The runner's end of the metric socket: (metric timestamp, receive time) of every record."""
+
+    def __init__(self):
+        self.reader = MetricSocketReader()
+        self.writer = MetricSocketWriter(self.reader.path)
+        self.received: list[tuple[float, float]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            records = self.reader.recv()
+            if records is None:
+                return
+            now = precise_time()
+            self.received += [(r.timestamp, now) for r in records]
+
+    def emit(self, timestamp: float):
+        self.writer.send(encode_metric("AGENT_STATE", timestamp, None, "speaking"))
+
+    def close(self) -> list[tuple[float, float]]:
+        self._stop.set()
+        self._thread.join()
+        self.writer.close()
+        self.reader.close()
+        return self.received
+
+
+async def drive_transitions(session: SimulatedSession, gaps: list[float], idle: float):
+    for i, gap in enumerate(gaps):
+        await asyncio.sleep(gap)
+        session.set_state(STATES[i % len(STATES)])
+
+    # Idle stretch: nobody talks, nothing changes
+    await asyncio.sleep(idle)
+    # Let the last records reach the reader
+    await asyncio.sleep(0.3)
+
+
+def observe_truth(session: SimulatedSession) -> list[float]:
+    """True 'speaking' transition times, from the session's own events (independent of the strategies)."""
+    truth: list[float] = []
+
+    @session.on("agent_state_changed")
+    def on_change(ev: StateChange):
+        if ev.new_state == "speaking":
+            truth.append(ev.created_at)
+
+    return truth
+
+
+async def run_polling(gaps: list[float], idle: float) -> dict:
+    session = SimulatedSession()
+    truth = observe_truth(session)
+    sink = MetricSink()
+    wakeups = 0
+
+    async def monitor_state():
+        nonlocal wakeups
+        last_state = session.agent_state
+        while True:
+            wakeups += 1
+            current = session.agent_state
+            if current != last_state:
+                if current == "speaking":
+                    sink.emit(precise_time())
+                last_state = current
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(monitor_state())
+    t0 = precise_time()
+    await drive_transitions(session, gaps, idle)
+    elapsed = precise_time() - t0
+    task.cancel()
+
+    return {"truth": truth, "metrics": sink.close(), "wakeups": wakeups, "elapsed": elapsed}
+
+
+async def run_events(gaps: list[float], idle: float) -> dict:
+    session = SimulatedSession()
+    truth = observe_truth(session)
+    sink = MetricSink()
+    wakeups = 0
+
+    def on_agent_state_changed(ev: StateChange):
+        nonlocal wakeups
+        changed_at = precise_time()
+        wakeups += 1
+        if ev.new_state == "speaking":
+            sink.emit(changed_at)
+
+    session.on("agent_state_changed", on_agent_state_changed)
+    t0 = precise_time()
+    await drive_transitions(session, gaps, idle)
+    elapsed = precise_time() - t0
+
+    return {"truth": truth, "metrics": sink.close(), "wakeups": wakeups, "elapsed": elapsed}
+
+
+def summarize(name: str, result: dict):
+    pairs = list(zip(result["truth"], result["metrics"], strict=False))
+    errors_ms = [(metric_ts - truth) * 1000 for truth, (metric_ts, _) in pairs]
+    delays_ms = [(received - truth) * 1000 for truth, (_, received) in pairs]
+    missed = len(result["truth"]) - len(result["metrics"])
+
+    def stats(values):
+        return (statistics.mean(values), max(values)) if values else (float("nan"), float("nan"))
+
+    mean_err, max_err = stats(errors_ms)
+    mean_delay, max_delay = stats(delays_ms)
+    rate = result["wakeups"] / result["elapsed"] if result["elapsed"] else 0.0
+    print(
+        f"{name:<10} | {result['wakeups']:>8} | {rate:>9.1f} | {mean_err:>13.3f} | {max_err:>12.3f} | "
+        f"{mean_delay:>15.3f} | {max_delay:>14.3f} | {missed:>6}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polling vs event-driven agent state tracking")
+    parser.add_argument("--transitions", type=int, default=150, help="Number of state transitions to replay")
+    parser.add_argument("--idle", type=float, default=3.0, help="Seconds of idle time after the transitions")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Transition gaps between 20 ms and 300 ms, not aligned to the 10 ms poll grid
+    gaps = [rng.uniform(0.02, 0.3) for _ in range(args.transitions)]
+
+    polling = asyncio.run(run_polling(gaps, args.idle))
+    events = asyncio.run(run_events(gaps, args.idle))
+
+    print("=" * 110)
+    print("AGENT STATE TRACKING - POLLING (10 ms) vs EVENTS")
+    print("=" * 110)
+    print(
+        f"{'Strategy':<10} | {'Wakeups':>8} | {'Wakeups/s':>9} | {'Mean err (ms)':>13} | {'Max err (ms)':>12} | "
+        f"{'Mean delay (ms)':>15} | {'Max delay (ms)':>14} | {'Missed':>6}"
+    )
+    print("-" * 110)
+    summarize("polling", polling)
+    summarize("events", events)
+
+
+if __name__ == "__main__":
+    main()
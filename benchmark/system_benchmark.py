@@ -1,288 +1,278 @@
+import argparse
 import asyncio
-import os
-import subprocess
-import threading
-import time
-from dataclasses import dataclass
+import atexit
+import json
+import signal
+import sys
 from pathlib import Path
 
-import psutil
-from dotenv import load_dotenv
-from livekit import api, rtc
-
-# Load env variables
-load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
-
-LIVEKIT_URL = os.getenv("LIVEKIT_URL", "ws://localhost:7880")
-API_KEY = os.getenv("LIVEKIT_API_KEY", "devkey")
-API_SECRET = os.getenv("LIVEKIT_API_SECRET", "secret")
-
-
-@dataclass
-class SystemMetrics:
-    timestamp: float
-    cpu_percent: float
-    memory_percent: float
-    memory_mb: float
-    gpu_util: float | None = None
-    gpu_mem_mb: float | None = None
-
-
-@dataclass
-class AgentMetric:
-    timestamp: float
-    type: str
-    data: list
-
-
-class AgentRunner:
-    def __init__(self, script_path: str):
-        self.script_path = script_path
-        self.process = None
-        self.metrics: list[AgentMetric] = []
-        self._log_thread = None
-
-    def _read_logs(self):
-        while True:
-            if self.process and self.process.stdout:
-                line = self.process.stdout.readline()
-                if not line:
-                    break
-                line = line.strip()
-                if line:
-                    print(f"[AGENT] {line}")  # Debug
-                    if line.startswith("[METRIC]"):
-                        parts = line.split(" ")
-                        # [METRIC] TYPE TIMESTAMP ...
-                        if len(parts) >= 3:
-                            m_type = parts[1]
-                            m_ts = float(parts[2])
-                            m_data = parts[3:]
-                            self.metrics.append(AgentMetric(m_ts, m_type, m_data))
-            else:
-                break
-
-    def start(self):
-        print(f"🚀 Starting Agent: {self.script_path}")
-        # Assuming run with `python <script>`
-        import sys
+from audio_analysis import print_continuity_report
+from capacity_search import SLO, parse_capacity_levels, print_capacity_report, run_capacity_search
+from clock_sync import ClockOffsetEstimator
+from latency_driver import (
+    LIVEKIT_URL,
+    AgentRunner,
+    histogram_of,
+    index_agent_metrics,
+    latency_breakdown,
+    print_latency_report,
+    run_latency_test,
+    stored_turns,
+)
+from latency_histogram import LatencyHistogram, load_histograms, save_histograms
+from lipsync import print_lipsync_report
+from load_generator import level_turns, print_load_report, run_load_sweep, summarize_level
+from matrix_runner import matrix_targets, run_matrix
+from open_loop import (
+    load_trace,
+    open_loop_turns,
+    poisson_schedule,
+    print_open_loop_report,
+    run_open_loop,
+    summarize_open_loop,
+)
+from phase_attribution import attribute_monitor_samples, attribute_sampler, print_phase_report
+from proc_sampler import ProcSampler, print_spike_report, span_spikes, turn_spikes
+from results_store import ResultsStore, RunMetadata
+from system_monitor import GPU_BACKENDS, SystemMonitor, print_system_usage
+from think_time import ThinkTime
+from video_analysis import print_smoothness_report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--agent",
+        action="append",
+        help="Path to agent script. Omit to benchmark an already running agent (e.g. docker compose) "
+        "that publishes in-band metrics (BENCHMARK_INBAND_METRICS=1). Capacity and matrix modes take it once per vendor",
+    )
+    parser.add_argument("--room", default="benchmark-room", help="Room to run the benchmark in")
+    parser.add_argument("--text", action="append", help="Text prompt(s) to send")
+    parser.add_argument("--scenarios", help="JSON file with a list of prompts (e.g. benchmark/scenarios.json)")
+    parser.add_argument(
+        "--sessions",
+        help="Load mode: comma-separated concurrency levels, e.g. '1,2,4,8'. "
+        "Each level runs that many virtual users, each in its own room",
+    )
+    parser.add_argument(
+        "--rates",
+        help="Open-loop mode: comma-separated Poisson session arrival rates (sessions/s), e.g. '0.05,0.1,0.2'",
+    )
+    parser.add_argument("--trace", help="Open-loop mode: replay a recorded arrival/turn-timing JSON trace")
+    parser.add_argument(
+        "--compression",
+        default="1",
+        help="Trace time compression factor(s), comma-separated, e.g. '1,2,4' replays the trace 1x, 2x and 4x faster",
+    )
+    parser.add_argument("--duration", type=float, default=60.0, help="Open-loop arrival window per rate (s)")
+    parser.add_argument("--turns", type=int, default=3, help="Open-loop prompts per Poisson session")
+    parser.add_argument("--think-time", type=float, default=4.0, help="Open-loop mean think time between turns (s)")
+    parser.add_argument(
+        "--capacity",
+        metavar="START:STEP:MAX",
+        help="Capacity search: ramp concurrent sessions per worker (e.g. '1:2:16') until the SLO is breached",
+    )
+    parser.add_argument(
+        "--matrix",
+        action="store_true",
+        help="Matrix mode: every --agent / --run-mode against every scenario, one worker per vendor",
+    )
+    parser.add_argument(
+        "--run-mode",
+        action="append",
+        help="Matrix mode: run agent/main.py with this RUN_MODE as a vendor (e.g. tavus, anam; repeatable)",
+    )
+    parser.add_argument("--parallel", type=int, default=2, help="Matrix mode: rooms running scenarios at once")
+    parser.add_argument("--slo-p95", type=float, default=3.0, help="Capacity SLO: p95 response latency (s)")
+    parser.add_argument("--slo-p99", type=float, help="Capacity SLO: p99 response latency (s)")
+    parser.add_argument(
+        "--max-cpu", type=float, help="Capacity limit: agent CPU %% summed over cores (default: 80%% of all cores)"
+    )
+    parser.add_argument("--max-rss", type=float, help="Capacity limit: agent RSS (MB)")
+    parser.add_argument("--hold", type=float, default=60.0, help="Capacity: steady-state time per step (s)")
+    parser.add_argument("--warmup", type=float, default=10.0, help="Capacity: discarded ramp-up time per step (s)")
+    parser.add_argument(
+        "--prompt-gap",
+        type=ThinkTime.parse,
+        default="1",
+        help="Think time after the agent's turn ends: seconds or a distribution "
+        "('uniform:0.5:2', 'exp:1.5', 'lognormal:1:0.5')",
+    )
+    parser.add_argument(
+        "--response-timeout",
+        type=float,
+        default=15.0,
+        help="Time a prompt's response may take before it counts as a timeout (s); raise it with long think times",
+    )
+    parser.add_argument(
+        "--turn-timeout", type=float, default=30.0, help="Safety timeout for the agent's turn to end (s)"
+    )
+    parser.add_argument(
+        "--silence-ms", type=float, default=800.0, help="Agent silence that ends its turn without a state change (ms)"
+    )
+    parser.add_argument("--histogram-out", help="Write the latency histograms as JSON (mergeable across runs)")
+    parser.add_argument(
+        "--merge-histograms",
+        nargs="+",
+        metavar="JSON",
+        help="Merge histogram files from parallel driver processes, print the report and exit",
+    )
+    parser.add_argument(
+        "--gpu-backend",
+        choices=["auto", "none", *GPU_BACKENDS],
+        default="auto",
+        help="GPU sampling backend ('auto' uses the first available one, none if absent)",
+    )
+    parser.add_argument(
+        "--sample-ms",
+        type=float,
+        default=10.0,
+        help="Interval of the /proc CPU/RSS sampler used for per-turn spikes (ms, 0 disables)",
+    )
+    parser.add_argument(
+        "--store",
+        default=str(Path(__file__).resolve().parent / "results.db"),
+        help="SQLite results store the run is recorded in (query it with benchmark/results_store.py)",
+    )
+    parser.add_argument("--no-store", action="store_true", help="Don't record the run in the results store")
+    parser.add_argument("--vendor", help="Vendor label for the report and the store (default: from --agent)")
+    parser.add_argument("--quiet-agent", action="store_true", help="Don't echo the agent's stdout")
+    parser.add_argument(
+        "--stdout-metrics", action="store_true", help="Parse '[METRIC]' lines instead of using the metric socket"
+    )
+    return parser
+
+
+def run_metadata(
+    args: argparse.Namespace, vendor: str, prompts: list[str], agent: str | None = None, **extra
+) -> RunMetadata:
+    """What the results store records about a run started with these options (`extra`: mode-specific ones)."""
+    return RunMetadata.collect(
+        vendor,
+        agent or (args.agent[0] if args.agent else None),
+        args.scenarios,
+        prompts,
+        room=args.room,
+        prompt_gap=args.prompt_gap.spec,
+        response_timeout=args.response_timeout,
+        turn_timeout=args.turn_timeout,
+        livekit_url=LIVEKIT_URL,
+        **extra,
+    )
 
-        cmd = [sys.executable, "-u", self.script_path, "dev"]  # -u for unbuffered
-        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
-        self._log_thread = threading.Thread(target=self._read_logs, daemon=True)
-        self._log_thread.start()
 
-        return self.process.pid
+def vendor_of(args: argparse.Namespace, agent: str | None) -> str:
+    return args.vendor or (Path(agent).stem.removesuffix("_agent") if agent else args.room)
 
-    def stop(self):
-        if self.process:
-            print(f"🛑 Stopping Agent (PID: {self.process.pid})...")
-            # Check if process is still running
-            if self.process.poll() is None:
-                try:
-                    self.process.terminate()
-                    try:
-                        self.process.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        print("   -> Agent did not stop politely, killing...")
-                        self.process.kill()
-                        self.process.wait(timeout=1)
-                except Exception as e:
-                    print(f"   -> Error stopping agent: {e}")
-
-            self.process = None
-
-
-class SystemMonitor:
-    def __init__(self, pid: int, interval: float = 0.5):
-        self.pid = pid
-        self.interval = interval
-        self.stop_event = threading.Event()
-        self.metrics: list[SystemMetrics] = []
-        self._thread = threading.Thread(target=self._monitor_loop)
-        try:
-            self.process = psutil.Process(pid)
-        except psutil.NoSuchProcess:
-            self.process = None
 
-    def start(self):
-        if self.process:
-            self._thread.start()
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
 
-    def stop(self):
-        self.stop_event.set()
-        if self._thread.is_alive():
-            self._thread.join(timeout=2.0)
+    if args.merge_histograms:
+        merged: dict[str, LatencyHistogram] = {}
+        for path in args.merge_histograms:
+            for name, hist in load_histograms(path).items():
+                merged.setdefault(name, LatencyHistogram()).merge(hist)
+        print(f"Merged {len(args.merge_histograms)} histogram file(s)")
+        print_latency_report(merged)
+        return
 
-    def _get_gpu_metrics(self):
-        # basic nvidia-smi parsing
+    prompts = args.text or ["Hello, are you there?", "What is the capital of France?"]
+    if args.scenarios:
+        with open(args.scenarios) as f:
+            prompts = json.load(f)
+
+    if args.capacity:
+        if not args.agent:
+            parser.error("--capacity needs at least one --agent to start workers")
+        start, step, max_sessions = parse_capacity_levels(args.capacity)
+        slo = SLO(p95=args.slo_p95, p99=args.slo_p99, max_cpu=args.max_cpu, max_rss_mb=args.max_rss)
+        capacity_results = []
+        store = None if args.no_store else ResultsStore(args.store)
         try:
-            # Let's try querying for our specific PID using nvidia-smi
-            result = subprocess.run(
-                ["nvidia-smi", "--query-compute-apps=pid,used_memory", "--format=csv,noheader,nounits"],
-                capture_output=True,
-                text=True,
-            )
-            if result.returncode == 0:
-                for line in result.stdout.strip().split("\n"):
-                    parts = line.split(",")
-                    if len(parts) >= 2:
-                        try:
-                            p = int(parts[0].strip())
-                            if p == self.pid:
-                                return float(parts[1].strip())  # MB
-                        except ValueError:
-                            pass
-            return 0.0
-        except Exception:
-            return None
-
-    def _monitor_loop(self):
-        while not self.stop_event.is_set():
-            try:
-                # CPU/Mem
-                with self.process.oneshot():
-                    cpu = self.process.cpu_percent()
-                    mem_info = self.process.memory_info()
-                    mem_percent = self.process.memory_percent()
-
-                # GPU
-                gpu_mem = self._get_gpu_metrics()
-
-                self.metrics.append(
-                    SystemMetrics(
-                        timestamp=time.time(),
-                        cpu_percent=cpu,
-                        memory_percent=mem_percent,
-                        memory_mb=mem_info.rss / 1024 / 1024,
-                        gpu_mem_mb=gpu_mem,
-                    )
+            for agent_script in args.agent:
+                metadata = run_metadata(
+                    args,
+                    vendor_of(args, agent_script),
+                    prompts,
+                    agent=agent_script,
+                    mode="capacity",
+                    capacity=args.capacity,
+                    slo_p95=slo.p95,
+                    slo_p99=slo.p99,
+                    hold=args.hold,
+                    warmup=args.warmup,
                 )
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                break
-            except Exception:
-                # print(f"Monitor error: {e}")
-                pass
-
-            time.sleep(self.interval)
-
-
-async def run_latency_test(room_name: str, text_prompts: list[str]):
-    # Connect as a driver
-    token = (
-        api.AccessToken(API_KEY, API_SECRET)
-        .with_identity("bench_driver")
-        .with_name("Benchmark Driver")
-        .with_grants(api.VideoGrants(room_join=True, room=room_name))
-        .to_jwt()
-    )
-
-    room = rtc.Room()
-
-    current_active_speakers = []
-
-    @room.on("active_speakers_changed")
-    def on_active_speakers_changed(speakers: list[rtc.Participant]):
-        nonlocal current_active_speakers
-        current_active_speakers = speakers
-
-    try:
-        await room.connect(LIVEKIT_URL, token)
-        print("   -> Connected to Room")
-
-        # Wait for agent
-        print("   -> Waiting for agent to join...")
-        start_wait = time.time()
-        while len(room.remote_participants) == 0:
-            if time.time() - start_wait > 30:
-                print("   -> ⚠️  Timeout waiting for agent to join room")
-                return [], []
-            await asyncio.sleep(0.5)
-        print("   -> Agent found!")
-
-        # Collect detailed latencies
-        test_results = []  # List of dicts
-
-        # Give a moment
-        await asyncio.sleep(2)
-
-        for text in text_prompts:
-            print(f"\n   -> 📨 Sending: '{text}'")
-            t_sent = time.time()
-
-            # Send chat message via Data Packet (standard LiveKit chat protocol)
-            import json
-
-            chat_data = json.dumps({"message": text, "timestamp": int(t_sent * 1000)}).encode("utf-8")
-
-            await room.local_participant.publish_data(payload=chat_data, topic="lk-chat-topic", reliable=True)
-
-            # For now, let's poll for active speakers becoming the agent
-            responded = False
-            t_response_detected = 0
-            timeout = 15
-            poll_start = time.time()
-
-            while time.time() - poll_start < timeout:
-                # Check active speakers
-                # print(f"Active speakers: {[s.identity for s in current_active_speakers]}")
-                is_agent_speaking = any(
-                    ("agent" in s.identity or "tavus" in s.identity or "avatar" in s.identity)
-                    for s in current_active_speakers
+                capacity_results.append(
+                    run_capacity_search(
+                        agent_script,
+                        prompts,
+                        slo,
+                        start=start,
+                        step=step,
+                        max_sessions=max_sessions,
+                        hold=args.hold,
+                        warmup=args.warmup,
+                        prompt_gap=args.prompt_gap,
+                        response_timeout=args.response_timeout,
+                        turn_timeout=args.turn_timeout,
+                        room_prefix=f"{args.room}-capacity",
+                        echo_logs=not args.quiet_agent,
+                        metric_socket=not args.stdout_metrics,
+                        store=store,
+                        metadata=metadata,
+                    )
                 )
-
-                if is_agent_speaking:
-                    t_response_detected = time.time()
-                    print(f"   -> ⚡ Response detected in {(t_response_detected - t_sent):.3f}s")
-                    responded = True
-                    break
-
-                await asyncio.sleep(0.05)
-
-            test_results.append(
-                {
-                    "prompt": text,
-                    "sent_ts": t_sent,
-                    "response_ts": t_response_detected if responded else None,
-                    "total_latency": (t_response_detected - t_sent) if responded else None,
-                }
-            )
-
-            if not responded:
-                print("   -> ❌ Timeout waiting for response")
-
-            # Wait before next prompt
-            await asyncio.sleep(5)
-
-    finally:
+        except KeyboardInterrupt:
+            print("\n⚠️ Interrupted by user")
+        finally:
+            if store:
+                store.close()
+        print_capacity_report(capacity_results, slo)
+        if store:
+            print(f"\n💾 Capacity runs stored in {args.store}")
+        return
+
+    if args.matrix:
+        targets = matrix_targets(args.agent, args.run_mode)
+        if not targets:
+            parser.error("--matrix needs at least one --agent or --run-mode")
         try:
-            await room.disconnect()
-        except Exception:
-            pass
-
-    return [], test_results  # Latencies not used directly, using test_results
-
-
-def main():
-    import argparse
-    import atexit
-    import signal
-    import sys
-
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--agent", required=True, help="Path to agent script")
-    parser.add_argument("--text", action="append", help="Text prompt(s) to send")
-    args = parser.parse_args()
+            run_matrix(
+                targets,
+                prompts,
+                scenario=args.scenarios,
+                store_path=args.store,
+                parallel=args.parallel,
+                room_prefix=f"{args.room}-matrix",
+                prompt_gap=args.prompt_gap,
+                response_timeout=args.response_timeout,
+                turn_timeout=args.turn_timeout,
+                echo_logs=not args.quiet_agent,
+                metric_socket=not args.stdout_metrics,
+            )
+        except KeyboardInterrupt:
+            print("\n⚠️ Interrupted by user")
+        return
 
-    prompts = args.text or ["Hello, are you there?", "What is the capital of France?"]
+    if args.agent and len(args.agent) > 1:
+        parser.error("only --capacity and --matrix take more than one --agent")
 
-    runner = AgentRunner(args.agent)
+    runner = None
+    if args.agent:
+        runner = AgentRunner(args.agent[0], echo_logs=not args.quiet_agent, metric_socket=not args.stdout_metrics)
     monitor = None
+    sampler = None
+    store = None
+    vendor = vendor_of(args, args.agent[0] if args.agent else None)
+    run_id = None
 
     cleanup_done = False
 
     def cleanup(signu=None, frame=None):
-        nonlocal cleanup_done, monitor, runner
+        nonlocal cleanup_done, monitor, sampler, runner, store
         if cleanup_done:
             return
         cleanup_done = True
@@ -290,8 +280,12 @@ def main():
 
         if monitor:
             monitor.stop()
+        if sampler:
+            sampler.stop()
         if runner:
             runner.stop()
+        if store:
+            store.close()
 
         if signu is not None:
             sys.exit(0)
@@ -303,114 +297,193 @@ def main():
     atexit.register(cleanup)
 
     # 1. Start Agent
-    pid = runner.start()
-
     # 2. Start Monitor
-    monitor = SystemMonitor(pid)
-    monitor.start()
+    # (Both are skipped for a remote agent: only in-band metrics are available then)
+    if runner:
+        pid = runner.start()
+        monitor = SystemMonitor(pid, gpu_backend=args.gpu_backend)
+        monitor.start()
+        if args.sample_ms > 0:
+            sampler = ProcSampler(pid, interval=args.sample_ms / 1000)
+            sampler.start()
+    else:
+        print(f"📡 No --agent given: using the agent already serving '{args.room}' (in-band metrics only)")
 
     # 3. Run Test
     try:
-        # Give agent time to warmup
-        print("Waiting 10s for agent warmup...")
-        time.sleep(10)
+        if runner:
+            # Warmup: until the worker has registered rather than a fixed sleep
+            print("Waiting for the agent worker to register...")
+            if not runner.wait_ready():
+                print("   -> ⚠️  Agent worker didn't report registration, continuing anyway")
+
+        # Every mode below is recorded as one run
+        if not args.no_store:
+            store = ResultsStore(args.store)
+            if args.rates or args.trace:
+                mode = {"mode": "open_loop", "rates": args.rates, "trace": args.trace, "compression": args.compression}
+            elif args.sessions:
+                mode = {"mode": "load", "sessions": args.sessions}
+            else:
+                mode = {"mode": "latency"}
+            run_id = store.start_run(run_metadata(args, vendor, prompts, **mode))
+
+        def record(turns: list[dict], events: list):
+            """Writes the run's turns, resource samples and agent events, and closes the store."""
+            nonlocal store
+            if not store:
+                return
+            store.add_turns(run_id, turns)
+            store.add_samples(run_id, monitor.metrics if monitor else [])
+            store.add_events(run_id, events)
+            store.finish_run(run_id)
+            store.close()
+            store = None
+            print(f"\n💾 Run {run_id[:8]} ({vendor}) stored in {args.store}")
+
+        def report_sampler(spans: list[tuple[str, float, float]], per: str):
+            """CPU spikes of the /proc sampler per level of a load or open-loop run (turns overlap there)."""
+            if not sampler:
+                return
+            sampler.stop()
+            if sampler.count:
+                print_spike_report(sampler, span_spikes(sampler, spans), per=per)
+
+        if args.rates or args.trace:
+            if args.trace:
+                levels = [(f"trace x{c}", load_trace(args.trace, float(c))) for c in args.compression.split(",")]
+            else:
+                levels = [
+                    (f"{r}/s", poisson_schedule(float(r), args.duration, args.turns, args.think_time, seed=i))
+                    for i, r in enumerate(args.rates.split(","))
+                ]
+
+            open_loop_results = []
+            for label, plans in levels:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                try:
+                    open_loop_results.append(
+                        loop.run_until_complete(
+                            run_open_loop(
+                                label,
+                                plans,
+                                prompts,
+                                room_prefix=f"{args.room}-open",
+                                response_timeout=args.response_timeout,
+                            )
+                        )
+                    )
+                finally:
+                    loop.close()
+
+            if monitor:
+                monitor.stop()
+            agent_metrics = runner.metrics if runner else []
+            print_open_loop_report([summarize_open_loop(r, agent_metrics) for r in open_loop_results])
+            report_sampler([(r.label, r.started_at, r.finished_at) for r in open_loop_results], "Level")
+            record(
+                [t for r in open_loop_results for t in open_loop_turns(r, agent_metrics)],
+                agent_metrics + [m for r in open_loop_results for m in r.inband_metrics],
+            )
+            return
+
+        if args.sessions:
+            levels = [int(n) for n in args.sessions.split(",")]
+            level_results = run_load_sweep(
+                levels,
+                prompts,
+                room_prefix=f"{args.room}-load",
+                prompt_gap=args.prompt_gap,
+                response_timeout=args.response_timeout,
+                turn_timeout=args.turn_timeout,
+            )
+            if monitor:
+                monitor.stop()
+            samples = monitor.metrics if monitor else []
+            agent_metrics = runner.metrics if runner else []
+            print_load_report([summarize_level(level, agent_metrics, samples) for level in level_results])
+            report_sampler(
+                [(f"{level.sessions} sessions", level.started_at, level.finished_at) for level in level_results],
+                "Level",
+            )
+            events = agent_metrics + [
+                m for level in level_results for sr in level.session_results for m in sr.inband_metrics
+            ]
+            metrics_by_request = index_agent_metrics(events)
+            record([t for level in level_results for t in level_turns(level, metrics_by_request)], events)
+            return
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
-            _, results = loop.run_until_complete(run_latency_test("benchmark-room", prompts))
+            clock = ClockOffsetEstimator()
+            inband_metrics, results = loop.run_until_complete(
+                run_latency_test(
+                    args.room,
+                    prompts,
+                    clock=clock,
+                    prompt_gap=args.prompt_gap,
+                    turn_timeout=args.turn_timeout,
+                    response_timeout=args.response_timeout,
+                    silence=args.silence_ms / 1000,
+                )
+            )
         finally:
             loop.close()
 
         # 4. Report
-        print("\n" + "=" * 60)
-        print("BENCHMARK RESULTS - LATENCY BREAKDOWN")
-        print("=" * 60)
-        print(f"{'Metric':<30} | {'Avg':<8} | {'Min':<8} | {'Max':<8}")
-        print("-" * 60)
-
-        # Calculate Logic
-        livekit_delays = []
-        process_delays = []
-        total_delays = []
-
-        agent_metrics = runner.metrics
-
-        for res in results:
-            if not res["response_ts"]:
-                continue
-
-            sent_ts_ms = int(res["sent_ts"] * 1000)
-
-            # Find matching RECEIVED
-            found_received = None
-            for m in agent_metrics:
-                if m.type == "AGENT_RECEIVED":
-                    # Check if timestamp matches sent (approx)
-                    try:
-                        m_ts_ms = int(m.timestamp)
-                        if abs(m_ts_ms - sent_ts_ms) < 200:
-                            found_received = m
-                            break
-                    except (ValueError, IndexError):
-                        pass
-
-            # Find matching SPEAKING
-            found_speaking = None
-            if found_received:
-                for m in agent_metrics:
-                    if m.type == "AGENT_STATE" and "speaking" in str(m.data[0]):
-                        if m.timestamp > float(found_received.data[0]):
-                            found_speaking = m
-                            break
-
-            # Calculate Component Latencies
-            total = res["total_latency"]
-            total_delays.append(total)
-
-            if found_received:
-                # LiveKit Latency: Received Time (S) - Sent Time (S)
-                recv_ts = float(found_received.data[0])
-                lk_lat = recv_ts - res["sent_ts"]
-                livekit_delays.append(lk_lat)
-
-                if found_speaking:
-                    # Processing Latency: Speaking Time (S) - Received Time (S)
-                    proc_lat = found_speaking.timestamp - recv_ts
-                    process_delays.append(proc_lat)
-
-        def print_stat(name, data):
-            if data:
-                print(f"{name:<30} | {sum(data) / len(data):.3f} s  | {min(data):.3f} s  | {max(data):.3f} s")
-            else:
-                print(f"{name:<30} | N/A      | N/A      | N/A")
-
-        print_stat("LiveKit (Network Uplink)", livekit_delays)
-        print_stat("Google API (Thinking)", process_delays)
-        print_stat("Total Response Latency", total_delays)
-
-        monitor.stop()
-
-        # System Stats
-        if monitor.metrics:
-            print("\n" + "=" * 60)
-            print("SYSTEM USAGE")
-            print("=" * 60)
-            avg_cpu = sum(m.cpu_percent for m in monitor.metrics) / len(monitor.metrics)
-            max_cpu = max(m.cpu_percent for m in monitor.metrics)
-            avg_mem = sum(m.memory_mb for m in monitor.metrics) / len(monitor.metrics)
-            max_mem = max(m.memory_mb for m in monitor.metrics)
-
-            print(f"CPU Usage (avg): {avg_cpu:.1f}%")
-            print(f"CPU Usage (max): {max_cpu:.1f}%")
-            print(f"Memory (avg):    {avg_mem:.1f} MB")
-            print(f"Memory (max):    {max_mem:.1f} MB")
-
-            gpu_data = [m.gpu_mem_mb for m in monitor.metrics if m.gpu_mem_mb is not None]
-            if gpu_data:
-                print(f"GPU Mem (max):   {max(gpu_data):.1f} MB")
+        # Local (socket/stdout) and in-band metrics may overlap; the index keeps the first per request
+        agent_metrics = (runner.metrics if runner else []) + inband_metrics
+        metrics_by_request = index_agent_metrics(agent_metrics)
+        breakdown = latency_breakdown(results, metrics_by_request, clock)
+        histograms = {
+            name: histogram_of(breakdown[key])
+            for name, key in (
+                ("LiveKit (Network Uplink)", "uplink"),
+                ("Google API (Thinking)", "thinking"),
+                ("Total Response Latency", "total"),
+                ("Avatar First Frame", "first_frame"),
+                ("Avatar Mouth Motion", "mouth_motion"),
+            )
+            # Visual rows only for agents that publish video
+            if breakdown[key] or key not in ("first_frame", "mouth_motion")
+        }
+        if args.histogram_out:
+            save_histograms(args.histogram_out, histograms)
+            print(f"💾 Latency histograms written to {args.histogram_out}")
+
+        print_latency_report(histograms)
+        uncertainty = breakdown["uplink_uncertainty"]
+        if breakdown["uplink"]:
+            if uncertainty:
+                print(f"\nUplink clock correction: ± {max(uncertainty) * 1000:.1f} ms")
             else:
-                print("GPU Mem:         N/A (or 0)")
+                print("\nUplink clock correction: none (clock uncorrected)")
+        print(f"\nClock offset (agent - driver): {clock.describe()}")
+        print_continuity_report(results)
+        print_smoothness_report(results)
+        print_lipsync_report(results, vendor)
+
+        if monitor:
+            monitor.stop()
+        if sampler:
+            sampler.stop()
+
+        record(stored_turns(results, metrics_by_request, clock), agent_metrics)
+
+        if monitor:
+            print_system_usage(monitor.metrics)
+        if sampler and sampler.count:
+            print_spike_report(sampler, turn_spikes(sampler, results))
+        if monitor or sampler:
+            if monitor:
+                print_phase_report(attribute_monitor_samples(monitor.metrics, agent_metrics, clock))
+            if sampler and sampler.count:
+                print_phase_report(
+                    attribute_sampler(sampler, agent_metrics, clock),
+                    title=f"CPU PER AGENT STATE ({sampler.interval * 1000:.0f} ms sampler, 50 ms windows)",
+                )
 
     except KeyboardInterrupt:
         print("\n⚠️ Interrupted by user")
@@ -0,0 +1,230 @@
+"""
+Resource monitor for the agent under test.
+
+LiveKit agent workers run every job in a child process, so the monitor samples the
+whole process tree of the PID it is given: children are picked up as they spawn
+and dropped when they exit. Each sample holds per-process and total CPU, RSS, USS
+(memory unique to the process) and PSS (shared pages split between their users).
+Total RSS double-counts shared libraries across the tree; PSS doesn't.
+
+GPU usage comes from an optional backend (NVML through `pynvml`). When no backend
+is available GPU sampling is skipped entirely.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+import psutil
+from clock_sync import precise_time
+
+MB = 1024 * 1024
+
+
+@dataclass
+class ProcessMetrics:
+    pid: int
+    name: str
+    cpu_percent: float
+    rss_mb: float
+    uss_mb: float | None = None
+    pss_mb: float | None = None
+
+
+@dataclass
+class SystemMetrics:
+    timestamp: float
+    cpu_percent: float  # whole tree, percent of one core
+    memory_percent: float
+    memory_mb: float  # whole tree RSS
+    gpu_util: float | None = None
+    gpu_mem_mb: float | None = None
+    uss_mb: float | None = None
+    pss_mb: float | None = None
+    processes: list[ProcessMetrics] = field(default_factory=list)
+
+
+class NvmlGpuBackend:
+    """GPU memory of the monitored processes and device utilisation through NVML (`pip install nvidia-ml-py`)."""
+
+    name = "nvml"
+
+    def __init__(self):
+        import pynvml
+
+        pynvml.nvmlInit()
+        self._nvml = pynvml
+        self._devices = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+
+    def sample(self, pids: set[int]) -> tuple[float | None, float | None]:
+        """Returns (max device utilisation %, GPU memory MB used by `pids`)."""
+        util = None
+        mem = 0.0
+        for device in self._devices:
+            try:
+                util = max(util or 0.0, float(self._nvml.nvmlDeviceGetUtilizationRates(device).gpu))
+                for proc in self._nvml.nvmlDeviceGetComputeRunningProcesses(device):
+                    if proc.pid in pids and proc.usedGpuMemory:
+                        mem += proc.usedGpuMemory / MB
+            except self._nvml.NVMLError:
+                continue
+        return util, mem
+
+    def close(self):
+        try:
+            self._nvml.nvmlShutdown()
+        except self._nvml.NVMLError:
+            pass
+
+
+GPU_BACKENDS = {"nvml": NvmlGpuBackend}
+
+
+def load_gpu_backend(name: str = "auto"):
+    """Instantiates a GPU backend by name ('auto' tries all, 'none' disables). Returns None if unavailable."""
+    if name == "none":
+        return None
+    candidates = GPU_BACKENDS if name == "auto" else {name: GPU_BACKENDS[name]}
+    for backend_name, backend in candidates.items():
+        try:
+            return backend()
+        except Exception as e:
+            if name != "auto":
+                print(f"   -> GPU backend '{backend_name}' unavailable ({e}), skipping GPU sampling")
+    return None
+
+
+class SystemMonitor:
+    def __init__(self, pid: int, interval: float = 0.5, gpu_backend: str = "auto", full_memory: bool = True):
+        self.pid = pid
+        self.interval = interval
+        self.full_memory = full_memory
+        self.stop_event = threading.Event()
+        self.metrics: list[SystemMetrics] = []
+        self._thread = threading.Thread(target=self._monitor_loop)
+        self._gpu_backend_name = gpu_backend
+        self.gpu = None
+        # Process objects are kept between samples: cpu_percent() measures since the previous call
+        self._tracked: dict[int, psutil.Process] = {}
+        try:
+            self.process = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            self.process = None
+
+    def start(self):
+        if self.process:
+            self.gpu = load_gpu_backend(self._gpu_backend_name)
+            self._thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        if self.gpu:
+            self.gpu.close()
+            self.gpu = None
+
+    def _refresh_tree(self) -> list[psutil.Process]:
+        try:
+            tree = [self.process] + self.process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+        alive = {}
+        for proc in tree:
+            known = self._tracked.get(proc.pid)
+            if known is None:
+                # First cpu_percent() call only sets the baseline
+                try:
+                    proc.cpu_percent()
+                except psutil.Error:
+                    continue
+                known = proc
+            alive[proc.pid] = known
+        self._tracked = alive
+        return list(alive.values())
+
+    def _sample_process(self, proc: psutil.Process) -> ProcessMetrics | None:
+        try:
+            with proc.oneshot():
+                cpu = proc.cpu_percent()
+                name = proc.name()
+                if self.full_memory:
+                    try:
+                        mem = proc.memory_full_info()
+                        return ProcessMetrics(proc.pid, name, cpu, mem.rss / MB, mem.uss / MB, mem.pss / MB)
+                    except psutil.AccessDenied:
+                        pass
+                return ProcessMetrics(proc.pid, name, cpu, proc.memory_info().rss / MB)
+        except psutil.Error:
+            return None
+
+    def _monitor_loop(self):
+        total_memory = psutil.virtual_memory().total / MB
+        while not self.stop_event.is_set():
+            tree = self._refresh_tree()
+            if not tree:
+                break
+            processes = [m for m in map(self._sample_process, tree) if m is not None]
+            if processes:
+                rss = sum(p.rss_mb for p in processes)
+                full = all(p.uss_mb is not None for p in processes)
+                gpu_util, gpu_mem = self.gpu.sample({p.pid for p in processes}) if self.gpu else (None, None)
+                self.metrics.append(
+                    SystemMetrics(
+                        timestamp=precise_time(),
+                        cpu_percent=sum(p.cpu_percent for p in processes),
+                        memory_percent=100 * rss / total_memory,
+                        memory_mb=rss,
+                        gpu_util=gpu_util,
+                        gpu_mem_mb=gpu_mem,
+                        uss_mb=sum(p.uss_mb for p in processes) if full else None,
+                        pss_mb=sum(p.pss_mb for p in processes) if full else None,
+                        processes=processes,
+                    )
+                )
+
+            time.sleep(self.interval)
+
+
+def print_system_usage(samples: list[SystemMetrics]):
+    if not samples:
+        return
+
+    def stats(values):
+        values = [v for v in values if v is not None]
+        if not values:
+            return "N/A"
+        return f"avg {sum(values) / len(values):8.1f} | max {max(values):8.1f}"
+
+    print("\n" + "=" * 60)
+    print("SYSTEM USAGE (agent process tree)")
+    print("=" * 60)
+    print(f"CPU %:        {stats([m.cpu_percent for m in samples])}")
+    print(f"RSS MB:       {stats([m.memory_mb for m in samples])}")
+    print(f"USS MB:       {stats([m.uss_mb for m in samples])}")
+    print(f"PSS MB:       {stats([m.pss_mb for m in samples])}")
+    gpu_mem = [m.gpu_mem_mb for m in samples if m.gpu_mem_mb is not None]
+    if gpu_mem:
+        print(f"GPU Mem MB:   {stats(gpu_mem)}")
+        print(f"GPU Util %:   {stats([m.gpu_util for m in samples])}")
+    else:
+        print("GPU:          N/A (no GPU backend)")
+    print(f"Processes:    max {max(len(m.processes) for m in samples)}")
+
+    # Per process, over the samples it appeared in
+    per_pid: dict[int, list[ProcessMetrics]] = {}
+    for m in samples:
+        for p in m.processes:
+            per_pid.setdefault(p.pid, []).append(p)
+    print(
+        "\n"
+        + f"{'PID':>8} | {'Name':<16} | {'Samples':>7} | {'CPU avg':>8} | {'CPU max':>8} | {'RSS max':>9} | {'USS max':>9}"
+    )
+    print("-" * 84)
+    for pid, series in sorted(per_pid.items(), key=lambda kv: -sum(p.cpu_percent for p in kv[1])):
+        uss = [p.uss_mb for p in series if p.uss_mb is not None]
+        print(
+            f"{pid:>8} | {series[-1].name[:16]:<16} | {len(series):>7} | "
+            f"{sum(p.cpu_percent for p in series) / len(series):>7.1f}% | {max(p.cpu_percent for p in series):>7.1f}% | "
+            f"{max(p.rss_mb for p in series):>6.1f} MB | " + (f"{max(uss):>6.1f} MB" if uss else f"{'N/A':>9}")
+        )
@@ -0,0 +1,108 @@
+"""
+End-of-turn detection for the driver: when has the agent finished answering?
+
+The next prompt should follow the agent's actual end of turn, not a fixed sleep.
+Two signals are combined:
+
+- the agent's state, published by livekit-agents as the `lk.agent.state` participant
+  attribute: back to 'listening' after it has been 'speaking';
+- the agent's audio (fed frame by frame like AudioResponseDetector): audible after
+  the prompt, then silent for `silence` seconds.
+
+An avatar may still be playing buffered audio when the agent already reports
+'listening', so the state only ends the turn once the audio has also been quiet for
+a short guard time. Whichever signal comes first ends the turn; the caller adds a
+safety timeout.
+"""
+
+import asyncio
+from dataclasses import dataclass
+
+import numpy as np
+from audio_analysis import BLOCK_MS, block_levels_dbfs
+from clock_sync import precise_time
+
+# Participant attribute livekit-agents keeps up to date with the agent's state
+AGENT_STATE_ATTRIBUTE = "lk.agent.state"
+
+
+@dataclass
+class TurnEnd:
+    ts: float  # end of the agent's speech (silence) or the state change (listening)
+    reason: str  # 'listening' or 'silence'
+
+
+class TurnCompletionDetector:
+    def __init__(self, silence: float = 0.8, threshold_dbfs: float = -45.0, guard: float = 0.25):
+        self.silence = silence
+        self.threshold_dbfs = threshold_dbfs
+        self.guard = min(guard, silence)
+        self.end: TurnEnd | None = None
+        self._armed_at: float | None = None
+        self._spoke = False
+        self._last_audible: float | None = None
+        self._listening_at: float | None = None
+        self._event = asyncio.Event()
+
+    def arm(self, t: float):
+        """Starts watching for the end of the turn that begins at `t` (the prompt)."""
+        self._armed_at = t
+        self._spoke = False
+        self._last_audible = None
+        self._listening_at = None
+        self.end = None
+        self._event.clear()
+
+    def on_agent_state(self, state: str, ts: float):
+        if self._armed_at is None or ts < self._armed_at:
+            return
+        if state in ("thinking", "speaking"):
+            self._spoke = self._spoke or state == "speaking"
+            self._listening_at = None
+        elif state == "listening" and self._spoke:
+            self._listening_at = ts
+        self._check(ts)
+
+    def process(self, track: str, samples: np.ndarray, sample_rate: int, received_ts: float):
+        """Audio handler (same signature as AudioResponseDetector.process)."""
+        if self._armed_at is None:
+            return
+        block = sample_rate * BLOCK_MS // 1000
+        levels = block_levels_dbfs(samples, block)
+        audible = np.flatnonzero(levels >= self.threshold_dbfs)
+        if len(audible):
+            # Arrival time of the end of the last audible block
+            last = received_ts - (len(levels) - 1 - audible[-1]) * block / sample_rate
+            if last >= self._armed_at:
+                self._spoke = True
+                self._last_audible = max(self._last_audible or 0.0, last)
+        self._check(received_ts)
+
+    def _check(self, now: float):
+        if self._armed_at is None:
+            return
+        quiet_for = now - self._last_audible if self._last_audible is not None else None
+        if self._listening_at is not None and (quiet_for is None or quiet_for >= self.guard):
+            self._complete(TurnEnd(self._listening_at, "listening"))
+        elif quiet_for is not None and quiet_for >= self.silence:
+            self._complete(TurnEnd(self._last_audible, "silence"))
+
+    def _complete(self, end: TurnEnd):
+        self.end = end
+        self._armed_at = None
+        self._event.set()
+
+    async def wait(self, timeout: float, poll: float = 0.05) -> TurnEnd | None:
+        """The end of the turn, or None if it hasn't ended within `timeout`."""
+        deadline = precise_time() + timeout
+        while not self._event.is_set():
+            remaining = deadline - precise_time()
+            if remaining <= 0:
+                self._armed_at = None
+                return None
+            try:
+                await asyncio.wait_for(self._event.wait(), min(remaining, poll))
+            except TimeoutError:
+                # Audio frames may stop entirely after the agent's turn: time advances without them
+                self._check(precise_time())
+        return self.end
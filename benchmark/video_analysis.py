@@ -0,0 +1,370 @@
+"""
+Driver-side analysis of the avatar's video track.
+
+The driver subscribes to every remote video track through rtc.VideoStream in I420,
+so the Y plane is usable as a greyscale image without a colour conversion. Every
+frame's luma is handed to the analyzers here.
+
+VisualResponseDetector gives two latencies per prompt:
+
+- first frame: the first video frame received after the prompt was sent,
+- mouth motion: the first frame where the mouth region moves clearly more than
+  while the avatar was idle (mean absolute luma difference to the previous frame,
+  above `idle_factor` times the idle level and at least `motion_threshold`).
+
+The mouth region is found once per track with OpenCV's frontal face detector (the
+lower middle of the face box) and falls back to a fixed box in the lower centre of
+the frame, which is where talking-head avatars put the mouth. Detection runs in the
+default executor, off the event loop; frames use the fixed box until it returns.
+
+VideoSmoothnessAnalyzer tracks frame pacing per turn: inter-frame arrival intervals,
+effective fps for each second, duplicate (frozen) frames, and stalls (arrival gaps or
+frozen runs longer than `stall_threshold`). A frame is a duplicate when, in every cell
+of a 32x32 grid, the mean absolute luma difference to the previous frame is below
+`freeze_threshold` grey levels. The difference is taken over every other pixel of
+every other row, so any detail of 2 px or more counts and lip or eye motion of an
+otherwise idle avatar is not a freeze. It is cheap enough to run on every session of
+a load test.
+"""
+
+import asyncio
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import numpy as np
+from clock_sync import precise_time
+from latency_histogram import LatencyHistogram
+from livekit import rtc
+
+# (x0, y0, x1, y1) as fractions of the frame
+DEFAULT_MOUTH_REGION = (0.35, 0.55, 0.65, 0.80)
+
+# Face detection attempts per track before settling for the default region
+_LOCATE_ATTEMPTS = 10
+
+
+def luma_plane(frame: rtc.VideoFrame) -> np.ndarray:
+    """Y plane of an I420 frame as a (height, width) uint8 view, without copying."""
+    y = np.frombuffer(frame.get_plane(0), dtype=np.uint8)
+    stride = len(y) // frame.height
+    return y.reshape(frame.height, stride)[:, : frame.width]
+
+
+def region_slice(shape: tuple[int, int], region: tuple[float, float, float, float]) -> tuple[slice, slice]:
+    h, w = shape
+    x0, y0, x1, y1 = region
+    return slice(int(y0 * h), max(int(y1 * h), int(y0 * h) + 1)), slice(int(x0 * w), max(int(x1 * w), int(x0 * w) + 1))
+
+
+_face_cascade = None
+_face_cascade_lock = threading.Lock()
+
+
+def face_cascade():
+    """The process-wide frontal face classifier, loaded on first use."""
+    global _face_cascade
+    if _face_cascade is None:
+        import cv2  # only needed when a track's mouth is located
+
+        _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    return _face_cascade
+
+
+def locate_mouth_region(luma: np.ndarray) -> tuple[float, float, float, float] | None:
+    """Mouth box from the largest detected face (lower third, middle half), or None. Blocking."""
+    small = np.ascontiguousarray(luma[::2, ::2])
+    # One classifier is shared by all tracks' executor threads
+    with _face_cascade_lock:
+        faces = face_cascade().detectMultiScale(small, scaleFactor=1.1, minNeighbors=5)
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    sh, sw = small.shape
+    return ((x + 0.25 * w) / sw, (y + 0.65 * h) / sh, (x + 0.75 * w) / sw, (y + 0.95 * h) / sh)
+
+
+@dataclass
+class _VideoTrackState:
+    region: tuple[float, float, float, float] | None = None
+    locate_attempts: int = 0
+    locating: asyncio.Future | None = None
+    previous: np.ndarray | None = None
+    idle_motion: float | None = None
+    run: int = 0
+    run_start: float = 0.0
+
+
+class VisualResponseDetector:
+    """First frame and first mouth motion after `arm()`, across all video tracks."""
+
+    def __init__(
+        self,
+        motion_threshold: float = 2.0,
+        idle_factor: float = 3.0,
+        min_frames: int = 2,
+        region: tuple[float, float, float, float] | None = None,
+        locate_face: bool = True,
+    ):
+        self.motion_threshold = motion_threshold
+        self.idle_factor = idle_factor
+        self.min_frames = min_frames
+        self.region = region
+        self.locate_face = locate_face and region is None
+        self.first_frame_ts: float | None = None
+        self.mouth_ts: float | None = None
+        self._armed_at: float | None = None
+        self._tracks: dict[str, _VideoTrackState] = {}
+        self._event = asyncio.Event()
+
+    @property
+    def has_video(self) -> bool:
+        return bool(self._tracks)
+
+    def arm(self, t: float):
+        self._armed_at = t
+        self.first_frame_ts = None
+        self.mouth_ts = None
+        self._event.clear()
+        for state in self._tracks.values():
+            state.run = 0
+
+    def _mouth_region(self, state: _VideoTrackState, luma: np.ndarray) -> tuple[float, float, float, float]:
+        if self.region is not None:
+            return self.region
+        if (
+            state.region is None
+            and self.locate_face
+            and state.locating is None
+            and state.locate_attempts < _LOCATE_ATTEMPTS
+        ):
+            state.locate_attempts += 1
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:  # fed outside an event loop (offline analysis)
+                state.region = locate_mouth_region(luma)
+            else:
+                # The frame buffer is reused once the handlers return
+                state.locating = loop.run_in_executor(None, locate_mouth_region, luma.copy())
+                state.locating.add_done_callback(lambda future: self._located(state, future))
+        return state.region or DEFAULT_MOUTH_REGION
+
+    @staticmethod
+    def _located(state: _VideoTrackState, future: asyncio.Future):
+        state.locating = None
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            # No OpenCV or no classifier data: keep the default region for this track
+            state.locate_attempts = _LOCATE_ATTEMPTS
+            return
+        state.region = future.result()
+
+    def mouth_motion(self, track: str, luma: np.ndarray) -> float | None:
+        """Mean absolute luma change of the mouth region since the track's previous frame."""
+        state = self._tracks.setdefault(track, _VideoTrackState())
+        rows, cols = region_slice(luma.shape, self._mouth_region(state, luma))
+        roi = luma[rows, cols][::2, ::2].astype(np.int16)
+        previous, state.previous = state.previous, roi
+        if previous is None or previous.shape != roi.shape:
+            return None
+        return float(np.mean(np.abs(roi - previous)))
+
+    def mouth_roi(self, track: str) -> np.ndarray | None:
+        """The downscaled mouth region of the track's latest frame."""
+        state = self._tracks.get(track)
+        return state.previous if state else None
+
+    def process(self, track: str, luma: np.ndarray, received_ts: float):
+        motion = self.mouth_motion(track, luma)
+        state = self._tracks[track]
+        threshold = max(self.motion_threshold, self.idle_factor * (state.idle_motion or 0.0))
+        if motion is not None and motion < threshold:
+            # Slow average of the motion while not talking (blinks, breathing, compression noise)
+            state.idle_motion = motion if state.idle_motion is None else 0.95 * state.idle_motion + 0.05 * motion
+
+        if self._armed_at is None or received_ts < self._armed_at:
+            return
+        if self.first_frame_ts is None:
+            self.first_frame_ts = received_ts
+        if self.mouth_ts is not None or motion is None:
+            return
+
+        if motion < threshold:
+            state.run = 0
+            return
+        if state.run == 0:
+            state.run_start = received_ts
+        state.run += 1
+        if state.run >= self.min_frames:
+            self.mouth_ts = state.run_start
+            self._event.set()
+
+    async def wait(self, timeout: float) -> float | None:
+        """Returns the mouth motion timestamp, or None if the mouth didn't move within `timeout`."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except TimeoutError:
+            self._armed_at = None
+            return None
+        return self.mouth_ts
+
+
+def cell_difference(luma: np.ndarray, previous: np.ndarray, grid: int = 32) -> float:
+    """
+    Largest mean absolute luma difference of a cell of a grid x grid tiling (edge rows
+    and columns that don't fill a cell are dropped).
+    """
+    h, w = luma.shape
+    ch, cw = max(1, h // grid), max(1, w // grid)
+    rows, cols = h // ch, w // cw
+    a, b = luma[: rows * ch, : cols * cw], previous[: rows * ch, : cols * cw]
+    diff = np.maximum(a, b) - np.minimum(a, b)  # |a - b| without widening to int16
+    return float(diff.reshape(rows, ch, cols, cw).sum(axis=(1, 3), dtype=np.uint32).max()) / (ch * cw)
+
+
+@dataclass
+class _TurnVideoStats:
+    frames: int = 0
+    duplicates: int = 0
+    intervals: LatencyHistogram = field(default_factory=LatencyHistogram)
+    fps: list[int] = field(default_factory=list)  # frames received in each complete second
+    stalls: list[float] = field(default_factory=list)  # durations (s)
+
+
+@dataclass
+class _SmoothnessTrackState:
+    last_ts: float | None = None
+    last_luma: np.ndarray | None = None
+    frozen_since: float | None = None  # first repeat of the current frozen run
+    second: int | None = None
+    second_frames: int = 0
+
+
+class VideoSmoothnessAnalyzer:
+    """Frame pacing, fps, frozen frames and stalls of the remote video tracks, per turn."""
+
+    def __init__(self, stall_threshold: float = 0.2, freeze_threshold: float = 0.5):
+        self.stall_threshold = stall_threshold
+        self.freeze_threshold = freeze_threshold
+        self.turn: str | None = None
+        self.turns: dict[str | None, _TurnVideoStats] = {}
+        self._tracks: dict[str, _SmoothnessTrackState] = {}
+
+    def start_turn(self, turn: str | None):
+        self.turn = turn
+
+    def _stats(self) -> _TurnVideoStats:
+        return self.turns.setdefault(self.turn, _TurnVideoStats())
+
+    def process(self, track: str, luma: np.ndarray, received_ts: float):
+        state = self._tracks.setdefault(track, _SmoothnessTrackState())
+        stats = self._stats()
+        stats.frames += 1
+
+        gap = False
+        if state.last_ts is not None:
+            interval = received_ts - state.last_ts
+            stats.intervals.record(interval)
+            gap = interval > self.stall_threshold
+            if gap:
+                # The gap is its own stall; a frozen run before it ends where the gap starts
+                self._end_frozen_run(state, state.last_ts)
+                stats.stalls.append(interval)
+
+        small = luma[::2, ::2]
+        previous = state.last_luma
+        if (
+            previous is not None
+            and previous.shape == small.shape
+            and cell_difference(small, previous) < self.freeze_threshold
+        ):
+            stats.duplicates += 1
+            if state.frozen_since is None:
+                state.frozen_since = received_ts if gap else state.last_ts
+        else:
+            self._end_frozen_run(state, received_ts)
+        # The frame buffer is reused once the handlers return
+        state.last_luma = small.copy()
+        state.last_ts = received_ts
+
+        second = int(received_ts)
+        if state.second != second:
+            if state.second is not None and second == state.second + 1:
+                stats.fps.append(state.second_frames)
+            elif state.second is not None:
+                # Whole seconds without a single frame
+                stats.fps.extend([state.second_frames] + [0] * (second - state.second - 1))
+            state.second = second
+            state.second_frames = 0
+        state.second_frames += 1
+
+    def _end_frozen_run(self, state: _SmoothnessTrackState, until: float):
+        if state.frozen_since is not None and until - state.frozen_since > self.stall_threshold:
+            self._stats().stalls.append(until - state.frozen_since)
+        state.frozen_since = None
+
+    def summary(self, turn: str | None) -> dict | None:
+        stats = self.turns.get(turn)
+        if stats is None or stats.frames == 0:
+            return None
+        return {
+            "frames": stats.frames,
+            "duplicates": stats.duplicates,
+            "fps_median": float(np.median(stats.fps)) if stats.fps else None,
+            "fps_min": min(stats.fps) if stats.fps else None,
+            "interval_p50": stats.intervals.percentile(50),
+            "interval_p95": stats.intervals.percentile(95),
+            "interval_p99": stats.intervals.percentile(99),
+            "stalls": len(stats.stalls),
+            "stall_time": sum(stats.stalls),
+            "stall_max": max(stats.stalls, default=0.0),
+        }
+
+
+def print_smoothness_report(results: list[dict]):
+    """Per-turn video smoothness, from the 'video' summary of each turn's result."""
+    if not any(res.get("video") for res in results):
+        return
+
+    def ms(value):
+        return f"{value * 1000:.0f} ms" if value is not None else "N/A"
+
+    print("\n" + "=" * 112)
+    print("AVATAR VIDEO SMOOTHNESS (per turn)")
+    print("=" * 112)
+    print(
+        f"{'Turn':<30} | {'Frames':>6} | {'FPS med':>7} | {'FPS min':>7} | {'Int p50':>8} | {'Int p95':>8} | "
+        f"{'Int p99':>8} | {'Frozen':>6} | {'Stalls':>6} | {'Stall time':>10}"
+    )
+    print("-" * 112)
+    for res in results:
+        v = res.get("video")
+        label = res["prompt"][:30]
+        if not v:
+            print(f"{label:<30} | {'N/A':>6}")
+            continue
+        fps_med = f"{v['fps_median']:.1f}" if v["fps_median"] is not None else "N/A"
+        fps_min = str(v["fps_min"]) if v["fps_min"] is not None else "N/A"
+        print(
+            f"{label:<30} | {v['frames']:>6} | {fps_med:>7} | {fps_min:>7} | {ms(v['interval_p50']):>8} | "
+            f"{ms(v['interval_p95']):>8} | {ms(v['interval_p99']):>8} | {v['duplicates']:>6} | {v['stalls']:>6} | "
+            f"{ms(v['stall_time']):>10}"
+        )
+
+
+# (track key, luma plane, received timestamp)
+VideoHandler = Callable[[str, np.ndarray, float], None]
+
+
+async def consume_video(track: rtc.Track, key: str, handlers: list[VideoHandler]):
+    """Feeds the luma of every frame of a remote video track to the handlers until the track ends."""
+    stream = rtc.VideoStream(track, format=rtc.VideoBufferType.I420)
+    try:
+        async for event in stream:
+            received_ts = precise_time()
+            luma = luma_plane(event.frame)
+            for handler in handlers:
+                handler(key, luma, received_ts)
+    finally:
+        await stream.aclose()
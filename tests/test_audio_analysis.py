@@ -0,0 +1,82 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from audio_analysis import AudioContinuityAnalyzer, AudioResponseDetector, block_levels_dbfs
+
+RATE = 48000
+BLOCK = RATE // 100
+
+
+def tone(blocks, amplitude=8000):
+    t = np.arange(blocks * BLOCK) / RATE
+    return (amplitude * np.sin(2 * np.pi * 1000 * t)).astype(np.int16)
+
+
+def silence(blocks):
+    return np.zeros(blocks * BLOCK, dtype=np.int16)
+
+
+def test_block_levels():
+    levels = block_levels_dbfs(np.concatenate([silence(1), tone(1, 32767)]), BLOCK)
+    assert levels[0] < -150
+    assert abs(levels[1] - (-3.01)) < 0.1
+
+
+def test_onset_is_start_of_first_audible_block():
+    detector = AudioResponseDetector()
+    detector.arm(100.0)
+    # 50 ms frame received at 100.5: 20 ms silence, then 30 ms of speech
+    detector.process("TR_a", np.concatenate([silence(2), tone(3)]), RATE, 100.5)
+    assert detector.onset_ts is not None
+    assert abs(detector.onset_ts - 100.47) < 1e-9
+    assert detector.onset_track == "TR_a"
+
+
+def test_ongoing_speech_needs_silence_first():
+    detector = AudioResponseDetector()
+    detector.arm(10.0)
+    # Previous utterance still playing when the prompt was sent
+    detector.process("TR_a", tone(5), RATE, 10.05)
+    assert detector.onset_ts is None
+    detector.process("TR_a", np.concatenate([silence(1), tone(2)]), RATE, 10.08)
+    assert abs(detector.onset_ts - 10.06) < 1e-9
+
+
+def test_single_click_is_ignored():
+    detector = AudioResponseDetector(min_blocks=2)
+    detector.arm(0.0)
+    detector.process("TR_a", np.concatenate([silence(1), tone(1), silence(2)]), RATE, 1.0)
+    assert detector.onset_ts is None
+
+
+def test_continuity_gaps_and_underruns():
+    analyzer = AudioContinuityAnalyzer(target_buffer=0.03)
+    analyzer.start_turn("turn-1")
+    t = 50.0
+    for i in range(200):
+        t += 0.01
+        if i == 100:
+            t += 0.08  # 80 ms late: a gap, and the 30 ms buffer runs dry
+        analyzer.process("TR_a", silence(1), RATE, t)
+
+    summary = analyzer.summary("turn-1")
+    assert summary["frames"] == 200
+    assert summary["gaps"] == 1
+    assert abs(summary["gap_max"] - 0.08) < 1e-6
+    assert summary["underruns"] == 1
+    assert abs(summary["underrun_time"] - 0.06) < 1e-6
+    assert summary["jitter_p50"] < 1e-4
+
+
+def test_steady_frames_have_no_gaps():
+    analyzer = AudioContinuityAnalyzer()
+    for i in range(100):
+        analyzer.process("TR_a", silence(1), RATE, 1.0 + i * 0.01 + (0.003 if i % 2 else 0.0))
+    summary = analyzer.summary(None)
+    assert summary["gaps"] == 0
+    assert summary["underruns"] == 0
+    assert abs(summary["jitter_p95"] - 0.003) < 1e-4
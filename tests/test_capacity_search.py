@@ -0,0 +1,98 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+import capacity_search
+from capacity_search import SLO, check_slo, parse_capacity_levels, ramp_levels, run_capacity_search, summarize_step
+from clock_sync import ClockOffsetEstimator
+from latency_driver import histogram_of
+from load_generator import LoadLevelResult, SessionResult
+from system_monitor import SystemMetrics
+from think_time import ThinkTime
+
+
+def step(**overrides):
+    base = {"sessions": 4, "sent": 20, "answered": 20, "p50": 1.0, "p95": 1.5, "p99": 1.8, "cpu_avg": 60.0}
+    base["rss_max"] = 400.0
+    base.update(overrides)
+    return base
+
+
+def test_step_within_slo_has_no_breaches():
+    assert check_slo(step(), SLO(p95=2.0, p99=2.5, max_cpu=100.0, max_rss_mb=500.0)) == []
+
+
+def test_breaches_are_ranked_by_overshoot():
+    slo = SLO(p95=2.0, max_cpu=100.0, max_rss_mb=500.0)
+    breaches = check_slo(step(p95=2.2, cpu_avg=150.0), slo)
+    assert [name for name, _ in breaches] == ["cpu", "latency p95"]
+
+
+def test_unanswered_prompts_breach_the_slo():
+    breaches = check_slo(step(answered=15), SLO(p95=2.0, max_cpu=100.0))
+    assert breaches[0][0] == "unanswered prompts"
+
+
+def test_ramp_parsing():
+    assert parse_capacity_levels("8") == (1, 1, 8)
+    assert parse_capacity_levels("2:3:10") == (2, 3, 10)
+    assert ramp_levels(2, 3, 10) == [2, 5, 8, 10]
+
+
+def test_step_percentiles_skip_warmup_and_match_the_latency_report():
+    latencies = [0.5 + 0.1 * i for i in range(30)]
+    results = [
+        {"request_id": f"r{i}", "sent_ts": 100.0 + i, "response_ts": 100.0 + i + v, "total_latency": v}
+        for i, v in enumerate(latencies)
+    ]
+    level = LoadLevelResult(1, 100.0, 140.0, [SessionResult(0, "r", results, [], ClockOffsetEstimator())])
+    samples = [SystemMetrics(105.0, 500.0, 1.0, 900.0), SystemMetrics(120.0, 50.0, 1.0, 300.0)]
+    step = summarize_step(level, [], samples, warmup=10.0)
+
+    steady = histogram_of(latencies[10:])
+    assert step["sent"] == 20 and step["answered"] == 20
+    assert (step["p50"], step["p95"], step["p99"]) == tuple(steady.percentile(q) for q in (50, 95, 99))
+    assert step["cpu_avg"] == 50.0 and step["rss_max"] == 300.0
+
+
+def test_capacity_steps_use_the_prompt_gap(monkeypatch):
+    class FakeRunner:
+        def __init__(self, *args, **kwargs):
+            self.metrics = []
+
+        def start(self):
+            return 0
+
+        def wait_ready(self):
+            return True
+
+        def stop(self):
+            pass
+
+    class FakeMonitor:
+        metrics = []
+
+        def __init__(self, pid):
+            pass
+
+        def start(self):
+            pass
+
+        def stop(self):
+            pass
+
+    sweeps = []
+
+    def fake_sweep(levels, prompts, **kwargs):
+        sweeps.append(kwargs)
+        return [LoadLevelResult(levels[0], 0.0, 1.0, [])]
+
+    monkeypatch.setattr(capacity_search, "AgentRunner", FakeRunner)
+    monkeypatch.setattr(capacity_search, "SystemMonitor", FakeMonitor)
+    monkeypatch.setattr(capacity_search, "run_load_sweep", fake_sweep)
+    gap = ThinkTime.parse("uniform:0.5:2")
+    result = run_capacity_search("agent/tavus_agent.py", ["hi"], SLO(), max_sessions=2, cooldown=0, prompt_gap=gap)
+
+    assert result.capacity == 2
+    assert [kwargs["prompt_gap"] for kwargs in sweeps] == [gap, gap]
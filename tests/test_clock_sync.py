@@ -0,0 +1,90 @@
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent"))
+
+import clock_sync
+import metric_protocol
+from clock_sync import ClockOffsetEstimator, ClockSample
+
+
+def simulate(estimator, offset, drift, start=1000.0, duration=30.0, n=200, seed=1):
+    """Agent clock = driver clock + offset + drift * (t - start), with asymmetric random network delays."""
+    rng = random.Random(seed)
+    for i in range(n):
+        t1 = start + duration * i / n
+        up = 0.002 + rng.expovariate(1 / 0.01)
+        down = 0.002 + rng.expovariate(1 / 0.02)
+        processing = 0.0005
+
+        def agent(t):
+            return t + offset + drift * (t - start)
+
+        t2 = agent(t1 + up)
+        t3 = agent(t1 + up + processing)
+        t4 = t1 + up + processing + down
+        estimator.add(ClockSample(t1, t2, t3, t4))
+
+
+def test_sample_offset_and_delay():
+    s = ClockSample(t1=10.0, t2=15.01, t3=15.02, t4=10.04)
+    assert abs(s.offset - 4.995) < 1e-9
+    assert abs(s.delay - 0.03) < 1e-9
+
+
+def test_estimator_recovers_offset_within_bound():
+    estimator = ClockOffsetEstimator()
+    simulate(estimator, offset=0.750, drift=0.0)
+
+    offset, uncertainty = estimator.offset_at(1015.0)
+    assert abs(offset - 0.750) <= uncertainty
+    assert uncertainty < 0.01
+
+
+def test_estimator_tracks_drift():
+    estimator = ClockOffsetEstimator()
+    simulate(estimator, offset=-2.0, drift=50e-6, duration=300.0, n=1500)
+
+    _, drift, _, _ = estimator.fit()
+    assert abs(drift - 50e-6) < 10e-6
+
+    # An agent timestamp late in the run maps back onto the driver clock
+    true_driver_ts = 1290.0
+    agent_ts = true_driver_ts - 2.0 + 50e-6 * (true_driver_ts - 1000.0)
+    driver_ts, uncertainty = estimator.to_driver_time(agent_ts)
+    assert abs(driver_ts - true_driver_ts) <= uncertainty
+
+
+def test_estimator_without_samples_is_unbounded():
+    estimator = ClockOffsetEstimator()
+    assert not estimator.has_estimate
+    offset, uncertainty = estimator.offset_at(0.0)
+    assert offset == 0.0
+    assert uncertainty == float("inf")
+
+
+def test_fit_is_cached_until_a_sample_is_added(monkeypatch):
+    estimator = ClockOffsetEstimator()
+    simulate(estimator, offset=0.5, drift=0.0, n=50)
+    selections = []
+    best_samples = estimator._best_samples
+
+    def counting():
+        selections.append(1)
+        return best_samples()
+
+    monkeypatch.setattr(estimator, "_best_samples", counting)
+    first = estimator.to_driver_time(1010.0)
+    assert estimator.to_driver_time(1010.0) == first and estimator.fit()
+    assert len(selections) == 1
+
+    # A new sample invalidates the cached fit
+    estimator.add(ClockSample(1040.0, 1040.501, 1040.502, 1040.003))
+    estimator.to_driver_time(1040.0)
+    assert len(selections) == 2
+
+
+def test_driver_and_agent_share_one_clock():
+    assert clock_sync.precise_time is metric_protocol.precise_time
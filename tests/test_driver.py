@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from driver import SAMPLE_RATE, play_pcm, speech_end
+
+
+class FakeSource:
+    def __init__(self):
+        self.frames = []
+        self.queued_duration = 0.0
+
+    async def capture_frame(self, frame):
+        self.frames.append((time.perf_counter(), frame.samples_per_channel, bytes(frame.data.cast("B"))))
+
+    async def wait_for_playout(self):
+        pass
+
+
+def tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (8000 * np.sin(2 * np.pi * 1000 * t)).astype(np.int16)
+
+
+def test_speech_end_ignores_trailing_silence():
+    samples = np.concatenate([np.zeros(SAMPLE_RATE // 4, np.int16), tone(1.0), np.zeros(SAMPLE_RATE // 2, np.int16)])
+    assert speech_end(samples) == 1.25
+    assert speech_end(np.zeros(SAMPLE_RATE, np.int16)) == 1.0
+
+
+def test_play_pcm_sends_every_frame_once_in_real_time():
+    samples = np.concatenate([tone(0.3), np.zeros(SAMPLE_RATE // 5 + 100, np.int16)])
+    source = FakeSource()
+    timing = asyncio.run(play_pcm(source, samples, lead=0.0))
+
+    # 0.5 s plus a padded partial frame: 51 full 10 ms frames, no empty or duplicate frames
+    assert len(source.frames) == 51
+    assert all(spc == SAMPLE_RATE // 100 for _, spc, _ in source.frames)
+    sent = b"".join(data for _, _, data in source.frames)
+    assert sent[: samples.nbytes] == samples.tobytes() and sent[samples.nbytes :] == bytes(len(sent) - samples.nbytes)
+
+    # Frame k goes out at start + k * 10 ms: no drift across the sample
+    start = source.frames[0][0]
+    lateness = [t - (start + k * 0.01) for k, (t, _, _) in enumerate(source.frames)]
+    assert min(lateness) > -0.002
+    assert abs(lateness[-1]) < 0.02
+
+    # The end of speech is the 30th frame, not the end of the padded sample
+    assert abs((timing.speech_end_ts - timing.started_at) - 0.29) < 0.02
+    assert timing.finished_at >= timing.speech_end_ts
@@ -0,0 +1,43 @@
+import os
+import sys
+import wave
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from driver import SAMPLE_RATE, speech_end
+from generate_samples import ToneBackend, build, sample_jobs, tone_duration
+
+
+def test_tone_backend_is_deterministic_with_known_duration():
+    text = "Can I get the check, please?"
+    samples = ToneBackend().synthesize(text)
+    assert np.array_equal(samples, ToneBackend().synthesize(text))
+    assert not np.array_equal(samples, ToneBackend("200").synthesize(text))
+
+    end, total = tone_duration(text)
+    assert abs(len(samples) / SAMPLE_RATE - total) < 0.01
+    # The driver's end-of-speech detection finds the end the backend promises
+    pcm = (samples * 32768).astype(np.int16)
+    assert abs(speech_end(pcm) - end) < 0.03
+
+
+def test_build_is_incremental(tmp_path):
+    scenarios = tmp_path / "scenarios_ci.json"
+    scenarios.write_text('["Do you have any vegan options?", "Thank you, keep the change."]')
+    out = str(tmp_path / "samples")
+
+    jobs = sample_jobs(out, [str(scenarios)], "tone", None, "wav")
+    assert len(jobs) == 5
+    first = build(jobs, out, workers=2)
+    assert len(first["built"]) == 5 and first["skipped"] == []
+    with wave.open(os.path.join(out, "scenarios_ci", "01_do_you_have_any_vegan_options.wav")) as wf:
+        assert wf.getframerate() == SAMPLE_RATE and wf.getnchannels() == 1
+
+    assert build(jobs, out, workers=1)["built"] == []
+    # A new voice changes every hash, a changed prompt only its own sample
+    assert len(build(sample_jobs(out, [str(scenarios)], "tone", "150", "wav"), out, workers=1)["built"]) == 5
+    scenarios.write_text('["Do you have any vegan options?", "Keep the change."]')
+    rebuilt = build(sample_jobs(out, [str(scenarios)], "tone", "150", "wav"), out, workers=1)["built"]
+    assert rebuilt == [os.path.join(out, "scenarios_ci", "02_keep_the_change.wav")]
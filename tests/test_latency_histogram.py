@@ -0,0 +1,53 @@
+import math
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent"))
+
+from latency_histogram import LatencyHistogram
+
+
+def filled(values):
+    hist = LatencyHistogram()
+    for v in values:
+        hist.record(v)
+    return hist
+
+
+def test_percentiles_within_bucket_precision():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(0, 0.8) for _ in range(5000)]
+    hist = filled(values)
+    ordered = sorted(values)
+    for q in (50, 90, 99, 99.9):
+        exact = ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+        assert abs(hist.percentile(q) - exact) <= exact * 0.001 + 1e-6
+    assert hist.min == min(values)
+    assert hist.max == max(values)
+
+
+def test_merge_equals_recording_everything_in_one():
+    rng = random.Random(7)
+    a = [rng.uniform(0.1, 5.0) for _ in range(300)]
+    b = [rng.uniform(1.0, 30.0) for _ in range(200)]
+    merged = filled(a).merge(LatencyHistogram.from_dict(filled(b).to_dict()))
+    single = filled(a + b)
+    assert merged.counts == single.counts
+    assert merged.count == 500
+    assert merged.percentile(95) == single.percentile(95)
+
+
+def test_bootstrap_ci_brackets_the_estimate():
+    rng = random.Random(11)
+    hist = filled([rng.expovariate(1.0) for _ in range(400)])
+    low, high = hist.bootstrap_ci(95)
+    assert low <= hist.percentile(95) <= high
+    assert high > low
+
+
+def test_empty_histogram():
+    hist = LatencyHistogram()
+    assert hist.percentile(50) is None
+    assert hist.bootstrap_ci(50) is None
+    assert hist.mean is None
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from lipsync import LipSyncAnalyzer
+
+RATE = 48000
+
+
+def syllables(duration, seed=0):
+    """Speech-like on/off envelope, one value per 10 ms."""
+    rng = np.random.default_rng(seed)
+    env = np.zeros(int(duration * 100))
+    i = 0
+    while i < len(env):
+        length = rng.integers(8, 30)
+        env[i : i + length] = rng.uniform(0.3, 1.0) if rng.random() < 0.7 else 0.0
+        i += length
+    return env
+
+
+def run(delay, duration=12.0, fps=25):
+    env = syllables(duration)
+    rng = np.random.default_rng(1)
+    analyzer = LipSyncAnalyzer()
+    analyzer.start_turn("turn-1")
+    start = 1000.0
+    next_frame = start
+    for i, level in enumerate(env):
+        t = start + (i + 1) * 0.01
+        samples = (rng.standard_normal(RATE // 100) * 8000 * level).astype(np.int16)
+        analyzer.process_audio(samples, RATE, t)
+        while next_frame <= t:
+            # The mouth follows the sound `delay` seconds later
+            k = int(np.clip(round((next_frame - delay - start) * 100), 0, len(env) - 1))
+            roi = np.full((20, 40), 150, dtype=np.uint8)
+            roi.flat[: int(env[k] * 300)] = 30
+            analyzer.process_video(roi, next_frame)
+            next_frame += 1 / fps
+    return analyzer
+
+
+def test_recovers_video_delay():
+    analyzer = run(delay=0.12)
+    offsets = analyzer.offsets["turn-1"]
+    assert len(offsets) >= 5
+    assert abs(np.median(offsets) - 0.12) <= 0.04
+
+
+def test_recovers_video_lead():
+    offsets = run(delay=-0.08).all_offsets()
+    assert abs(np.median(offsets) + 0.08) <= 0.04
+
+
+def test_silence_gives_no_offsets():
+    analyzer = LipSyncAnalyzer()
+    for i in range(500):
+        t = 10.0 + i * 0.01
+        analyzer.process_audio(np.zeros(RATE // 100, dtype=np.int16), RATE, t)
+        if i % 4 == 0:
+            analyzer.process_video(np.full((20, 40), 150, dtype=np.uint8), t)
+    assert analyzer.all_offsets() == []
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+import load_generator
+from clock_sync import ClockOffsetEstimator
+from latency_driver import AgentMetric
+from load_generator import LoadLevelResult, SessionResult, held, level_turns, run_virtual_user, summarize_level
+from system_monitor import SystemMetrics
+
+PROMPTS = [f"prompt {i}" for i in range(8)]
+
+
+def test_held_deadline_starts_at_the_first_prompt():
+    prompts = held(["a", "b"], 0.05)
+    time.sleep(0.1)  # created long before the first prompt is pulled
+    sent = list(prompts)
+    assert sent[:3] == ["a", "b", "a"]
+
+
+def run_user(monkeypatch, index, seed=0, fail=False):
+    calls = []
+
+    async def fake_latency_test(room, prompts, clock, identity, prompt_gap, turn_timeout, response_timeout):
+        if fail:
+            raise ConnectionError("room unavailable")
+        sent = list(prompts)
+        calls.append((room, identity, sent, prompt_gap, response_timeout))
+        return [], [{"request_id": f"{index}-{i}", "prompt": p} for i, p in enumerate(sent)]
+
+    monkeypatch.setattr(load_generator, "run_latency_test", fake_latency_test)
+    result = asyncio.run(run_virtual_user(index, 4, PROMPTS, max_stagger=0.0, seed=seed, response_timeout=40.0))
+    return result, calls
+
+
+def test_virtual_users_are_seeded_per_user(monkeypatch):
+    first, [(room, identity, order, _, response_timeout)] = run_user(monkeypatch, 1)
+    again, [(_, _, order_again, _, _)] = run_user(monkeypatch, 1)
+    other, [(_, _, other_order, _, _)] = run_user(monkeypatch, 2)
+
+    assert room == "benchmark-load-c4-u1" and identity == "bench_driver-1"
+    assert response_timeout == 40.0
+    assert sorted(order) == PROMPTS and order == order_again
+    assert other_order != order
+    assert all(res["session"] == 1 for res in first.results)
+
+
+def test_failed_virtual_user_has_no_results(monkeypatch, capsys):
+    result, _ = run_user(monkeypatch, 3, fail=True)
+    assert result.results == [] and result.inband_metrics == []
+    assert "Virtual user 3" in capsys.readouterr().out
+
+
+def turn(request_id, sent_ts, latency):
+    return {
+        "request_id": request_id,
+        "prompt": "hi",
+        "sent_ts": sent_ts,
+        "response_ts": sent_ts + latency if latency is not None else None,
+        "total_latency": latency,
+    }
+
+
+def test_summarize_level_windows_samples_and_averages_sessions():
+    level = LoadLevelResult(
+        sessions=2,
+        started_at=100.0,
+        finished_at=110.0,
+        session_results=[
+            SessionResult(0, "r0", [turn("a", 101.0, 1.0), turn("b", 103.0, 3.0)], [], ClockOffsetEstimator()),
+            SessionResult(1, "r1", [turn("c", 102.0, 4.0), turn("d", 104.0, None)], [], ClockOffsetEstimator()),
+        ],
+    )
+    agent_metrics = [AgentMetric(101.25, "AGENT_RECEIVED", [], "a")]
+    samples = [
+        SystemMetrics(99.0, 500.0, 1.0, 900.0),  # before the level
+        SystemMetrics(105.0, 40.0, 1.0, 300.0),
+        SystemMetrics(108.0, 60.0, 1.0, 350.0),
+        SystemMetrics(111.0, 500.0, 1.0, 900.0),  # after it
+    ]
+    summary = summarize_level(level, agent_metrics, samples)
+
+    assert summary["turns"] == 4 and summary["answered"] == 3
+    # Histogram percentiles: exact to the bucket width (0.1%)
+    assert (summary["p50"], summary["p95"], summary["latency_max"]) == pytest.approx((3.0, 4.0, 4.0), rel=1e-3)
+    assert summary["session_avg_min"] == 2.0 and summary["session_avg_max"] == 4.0
+    assert summary["uplink_avg"] == 0.25
+    assert summary["cpu_avg"] == 50.0 and summary["cpu_max"] == 60.0
+    assert summary["rss_max"] == 350.0
+
+
+def test_level_turns_are_tagged_and_windowed():
+    level = LoadLevelResult(
+        sessions=2,
+        started_at=100.0,
+        finished_at=110.0,
+        session_results=[
+            SessionResult(0, "r0", [turn("a", 101.0, 1.0), turn("b", 103.0, 3.0)], [], ClockOffsetEstimator()),
+            SessionResult(1, "r1", [turn("c", 102.0, 4.0)], [], ClockOffsetEstimator()),
+        ],
+    )
+    turns = level_turns(level, {}, since=102.0)
+
+    assert [(t["request_id"], t["total"]) for t in turns] == [("b", 3.0), ("c", 4.0)]
+    assert [(t["details"]["sessions"], t["details"]["session"]) for t in turns] == [(2, 0), (2, 1)]
@@ -0,0 +1,75 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+import matrix_runner
+from clock_sync import ClockOffsetEstimator
+from latency_driver import AgentRunner
+from matrix_runner import AGENT_MAIN, MatrixTarget, matrix_targets, partition_scenarios, run_matrix_target
+from results_store import LATENCY_MODES, ResultsStore, connect, select_runs
+
+
+def test_matrix_targets_from_scripts_and_run_modes():
+    targets = matrix_targets(["agent/tavus_agent.py"], ["anam"])
+    assert [t.vendor for t in targets] == ["tavus", "anam"]
+    assert targets[1].script == str(AGENT_MAIN)
+    assert targets[1].env == {"RUN_MODE": "anam"}
+
+
+def test_partition_scenarios_round_robin():
+    assert partition_scenarios(["a", "b", "c", "d", "e"], 2) == [["a", "c", "e"], ["b", "d"]]
+    assert partition_scenarios(["a"], 4) == [["a"]]
+
+
+def test_agent_runner_waits_for_worker_registration(tmp_path):
+    script = tmp_path / "fake_agent.py"
+    script.write_text(
+        "import os, sys, time\n"
+        "print('starting', os.environ['RUN_MODE'])\n"
+        "time.sleep(0.2)\n"
+        'print(\'INFO livekit.agents - registered worker {"id": "AW_1"}\')\n'
+        "time.sleep(30)\n"
+    )
+    runner = AgentRunner(str(script), echo_logs=False, metric_socket=False, env={"RUN_MODE": "fake"})
+    runner.start()
+    try:
+        assert runner.wait_ready(timeout=10)
+    finally:
+        runner.stop()
+
+
+def test_matrix_run_is_compared_with_latency_runs(tmp_path, monkeypatch):
+    class FakeRunner:
+        def __init__(self, *args, **kwargs):
+            self.metrics = []
+
+        def start(self):
+            return 0
+
+        def wait_ready(self):
+            return True
+
+        def stop(self):
+            pass
+
+    async def fake_rooms(groups, room_prefix, prompt_gap, **timeouts):
+        results = [
+            {"request_id": f"r{i}", "prompt": p, "sent_ts": float(i), "total_latency": 1.5}
+            for i, p in enumerate(groups[0])
+        ]
+        return [([], results, ClockOffsetEstimator())]
+
+    monitor = SimpleNamespace(start=lambda: None, stop=lambda: None, metrics=[])
+    monkeypatch.setattr(matrix_runner, "AgentRunner", FakeRunner)
+    monkeypatch.setattr(matrix_runner, "SystemMonitor", lambda pid: monitor)
+    monkeypatch.setattr(matrix_runner, "run_rooms", fake_rooms)
+
+    store = ResultsStore(tmp_path / "results.db")
+    run_id = run_matrix_target(MatrixTarget("tavus", "agent/tavus_agent.py"), ["hi", "bye"], store, parallel=1)
+    store.close()
+
+    conn = connect(tmp_path / "results.db")
+    assert [r["run_id"] for r in select_runs(conn, mode="matrix")] == [run_id]
+    assert [r["run_id"] for r in select_runs(conn, mode=LATENCY_MODES)] == [run_id]
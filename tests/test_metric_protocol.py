@@ -0,0 +1,49 @@
+import os
+import socket
+import sys
+
+# metric_protocol is shared by the agent hooks and the benchmark runner
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent"))
+
+import pytest
+from metric_protocol import RECORD, MetricSocketReader, MetricSocketWriter, decode_metrics, encode_metric
+
+
+def test_record_roundtrip():
+    buf = encode_metric("AGENT_STATE", 1700000000.123456, "0123456789abcdef0123456789abcdef", label="speaking")
+    assert len(buf) == RECORD.size
+
+    (record,) = decode_metrics(buf)
+    assert record.type == "AGENT_STATE"
+    assert record.timestamp == 1700000000.123456
+    assert record.request_id == "0123456789abcdef0123456789abcdef"
+    assert record.label == "speaking"
+    assert record.value == 0.0
+
+
+def test_decode_batch_skips_trailing_garbage():
+    buf = encode_metric("AGENT_RECEIVED", 1.0, None, value=1000) + encode_metric("AGENT_STATE", 2.0, "r", "idle")
+    records = decode_metrics(buf + b"\x01\x02")
+    assert [r.type for r in records] == ["AGENT_RECEIVED", "AGENT_STATE"]
+    assert records[0].request_id is None
+    assert records[0].value == 1000
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix domain sockets required")
+def test_socket_channel_delivers_records():
+    reader = MetricSocketReader()
+    writer = MetricSocketWriter(reader.path)
+    try:
+        assert writer.send(encode_metric("AGENT_STATE", 5.0, "abc", label="thinking"))
+        (record,) = reader.recv()
+        assert record.request_id == "abc"
+        assert record.label == "thinking"
+    finally:
+        writer.close()
+        reader.close()
+
+    # Reader gone: sending must not raise, the caller falls back to stdout
+    orphan = MetricSocketWriter(reader.path)
+    assert not orphan.send(encode_metric("AGENT_STATE", 6.0, "abc", label="idle"))
+    assert orphan.dropped == 1
+    orphan.close()
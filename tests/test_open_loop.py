@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+import open_loop
+from clock_sync import ClockOffsetEstimator
+from latency_driver import AgentMetric
+from open_loop import (
+    OpenLoopResult,
+    SessionPlan,
+    Turn,
+    find_saturation,
+    load_trace,
+    offered_load,
+    open_loop_turns,
+    poisson_schedule,
+    run_open_loop,
+    summarize_open_loop,
+)
+
+
+def level(p95, sent=10, answered=10, failed=0, unsent=0):
+    return {"p95": p95, "sent": sent, "answered": answered, "failed": failed, "unsent": unsent}
+
+
+def test_poisson_schedule_is_seeded_and_within_the_window():
+    plans = poisson_schedule(2.0, 100.0, turns=3, think_time=4.0, seed=1)
+    assert plans == poisson_schedule(2.0, 100.0, turns=3, think_time=4.0, seed=1)
+    assert all(0 < p.start < 100.0 for p in plans)
+    assert all(len(p.turns) == 3 and p.turns[0] == 0.0 for p in plans)
+    assert 160 < len(plans) < 240  # ~rate * duration
+
+
+def test_load_trace_compresses_and_sorts(tmp_path):
+    path = tmp_path / "trace.json"
+    path.write_text(json.dumps([{"start": 8.0, "turns": [0.0, 4.0]}, {"start": 2.0, "turns": [1.0]}]))
+    plans = load_trace(str(path), compression=2.0)
+    assert plans == [SessionPlan(1.0, [0.5]), SessionPlan(4.0, [0.0, 2.0])]
+
+
+def test_offered_load():
+    assert offered_load([]) == (0.0, 0.0)
+    # Span runs to the last turn: 2 sessions, 3 prompts over 6 s
+    assert offered_load([SessionPlan(1.0, [0.5]), SessionPlan(4.0, [0.0, 2.0])]) == (2 / 6, 3 / 6)
+
+
+def test_find_saturation():
+    assert find_saturation([level(1.0), level(1.5), level(1.9)]) is None
+    assert find_saturation([level(1.0), level(1.5), level(2.5)]) == 2
+    assert find_saturation([level(1.0), level(1.2, answered=8)]) == 1
+    # Failed sessions' unsent prompts count as unanswered
+    assert find_saturation([level(1.0), level(1.2, sent=9, answered=9, failed=1, unsent=3)]) == 1
+    assert find_saturation([level(1.0), level(None, sent=0, answered=0, failed=4, unsent=12)]) == 1
+
+
+def test_summarize_open_loop_counts_failed_sessions():
+    plans = [SessionPlan(0.0, [0.0, 1.0]), SessionPlan(0.5, [0.0, 1.0, 2.0])]
+    turns = [
+        Turn(0, "a", "hi", 0.0, sent_ts=100.0),
+        Turn(0, "b", "hi", 1.0, sent_ts=101.0),
+        Turn(1, "c", "hi", 0.5, sent_ts=100.5),  # session 1 failed after its first turn
+    ]
+    metrics = [
+        AgentMetric(101.0, "AGENT_STATE", ["speaking"], "a"),
+        AgentMetric(103.0, "AGENT_STATE", ["speaking"], "b"),
+    ]
+    result = OpenLoopResult("1/s", plans, 100.0, 110.0, turns, [], {0: ClockOffsetEstimator()}, [0.2, 0.4], [1])
+    summary = summarize_open_loop(result, metrics)
+
+    assert summary["sessions"] == 2 and summary["failed"] == 1 and summary["unsent"] == 2
+    assert summary["sent"] == 3 and summary["answered"] == 2
+    assert (summary["p50"], summary["p95"], summary["max"]) == pytest.approx((1.0, 2.0, 2.0), rel=1e-3)
+    assert summary["setup_p95"] == pytest.approx(0.4, rel=1e-3)
+    assert abs(summary["throughput"] - 0.2) < 1e-9
+
+
+def test_open_loop_turns_are_the_sent_turns():
+    turns = [
+        Turn(0, "a", "hi", 0.0, sent_ts=100.0),
+        Turn(0, "b", "bye", 1.0, sent_ts=101.0),
+        Turn(1, "c", "hi", 0.5),  # never sent
+    ]
+    metrics = [AgentMetric(101.5, "AGENT_STATE", ["speaking"], "a")]
+    result = OpenLoopResult("1/s", [], 100.0, 110.0, turns, [], {}, [], [])
+    rows = open_loop_turns(result, metrics)
+
+    assert [(r["request_id"], r["prompt"], r["total"]) for r in rows] == [("a", "hi", 1.5), ("b", "bye", None)]
+    assert rows[1]["details"] == {"level": "1/s", "session": 0, "scheduled_ts": 1.0}
+
+
+def test_run_open_loop_logs_failed_sessions(monkeypatch, capsys):
+    async def fake_session(index, plan, *args):
+        if index == 1:
+            raise ConnectionError("connect refused")
+
+    monkeypatch.setattr(open_loop, "run_open_loop_session", fake_session)
+    plans = [SessionPlan(0.0, [0.0]), SessionPlan(0.0, [0.0]), SessionPlan(0.0, [0.0])]
+    result = asyncio.run(run_open_loop("2/s", plans, ["hi"]))
+
+    assert result.failed_sessions == [1]
+    assert "Session 1 (benchmark-open-2-s-s1) failed" in capsys.readouterr().out
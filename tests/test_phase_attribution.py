@@ -0,0 +1,33 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from latency_driver import AgentMetric
+from phase_attribution import NO_SESSION, attribute, label_samples, state_timeline
+
+
+def test_samples_are_labelled_with_the_state_in_effect():
+    metrics = [
+        AgentMetric(10.0, "AGENT_STATE", ["listening"]),
+        AgentMetric(12.0, "AGENT_STATE", ["thinking"], "r1"),
+        AgentMetric(12.0, "AGENT_STATE", ["thinking"], "r1"),  # same transition through a second transport
+        AgentMetric(13.0, "AGENT_STATE", ["speaking"], "r1"),
+        AgentMetric(12.5, "LLM_LATENCY", [0.5], "r1"),
+    ]
+    times, states = state_timeline(metrics)
+    assert states == ["listening", "thinking", "speaking"]
+    labels = label_samples(times, states, np.array([9.0, 10.0, 11.9, 12.2, 14.0]))
+    assert list(labels) == [NO_SESSION, "listening", "listening", "thinking", "speaking"]
+
+
+def test_attribute_per_state_statistics():
+    labels = np.array(["listening", "speaking", "speaking", "listening"], dtype=object)
+    phases = attribute(labels, {"cpu": np.array([5.0, 80.0, 100.0, 15.0]), "uss": np.full(4, np.nan)})
+    assert phases["speaking"]["samples"] == 2
+    assert phases["speaking"]["share"] == 0.5
+    assert phases["speaking"]["cpu_avg"] == 90.0
+    assert phases["listening"]["cpu_max"] == 15.0
+    assert "uss_avg" not in phases["listening"]
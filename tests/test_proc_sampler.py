@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from proc_sampler import ProcSampler, parse_stat_cpu_ticks, parse_statm_resident_pages, span_spikes, turn_spikes
+
+
+def test_parse_stat_with_spaces_in_command_name():
+    stat = b"1234 (python (job) 2) S 1 1234 1234 0 -1 4194560 500 0 0 0 731 42 0 0 20 0 9 0 123 456 789\n"
+    assert parse_stat_cpu_ticks(stat) == 731 + 42
+    assert parse_statm_resident_pages(b"52000 7310 1800 1 0 9000 0\n") == 7310
+
+
+def test_ring_buffer_keeps_latest_samples_in_order():
+    sampler = ProcSampler(os.getpid(), capacity=4)
+    for i in range(6):
+        sampler._sample(float(i))
+    ts, _, _ = sampler.samples()
+    assert list(ts) == [2.0, 3.0, 4.0, 5.0]
+
+
+@pytest.mark.skipif(not ProcSampler.available(), reason="needs /proc")
+def test_sampler_measures_a_busy_thread():
+    sampler = ProcSampler(os.getpid(), interval=0.01)
+    sampler.start()
+    deadline = time.perf_counter() + 0.5
+    while time.perf_counter() < deadline:
+        pass
+    sampler.stop()
+
+    assert sampler.count >= 20
+    _, pct = sampler.cpu_percent(window=0.1)
+    assert np.median(pct[10:]) > 50
+    assert sampler.overhead_percent() < 50
+
+
+def test_spikes_per_span_and_per_turn(monkeypatch):
+    sampler = ProcSampler(os.getpid())
+    ts = np.arange(0.0, 4.0, 0.01)
+    pct = np.where((ts >= 1.5) & (ts < 1.6), 400.0, 20.0)
+    monkeypatch.setattr(sampler, "cpu_percent", lambda window: (ts, pct))
+    monkeypatch.setattr(sampler, "samples", lambda: (ts, None, np.full(len(ts), 100 * 1024 * 1024)))
+
+    levels = span_spikes(sampler, [("1 sessions", 0.0, 1.0), ("4 sessions", 1.0, 3.0), ("later", 5.0, 6.0)])
+    assert [s["label"] for s in levels] == ["1 sessions", "4 sessions", "later"]
+    assert levels[0]["cpu_peak"] == 20.0 and levels[2]["samples"] == 0
+    assert levels[1]["cpu_peak"] == 400.0 and abs(levels[1]["peak_at"] - 0.5) < 1e-9
+    assert levels[1]["rss_peak_mb"] == 100.0
+
+    turns = turn_spikes(sampler, [{"prompt": "a", "sent_ts": 1.0}, {"prompt": "b", "sent_ts": 2.0}], tail=1.0)
+    assert [(s["label"], s["samples"], s["cpu_peak"]) for s in turns] == [("a", 100, 400.0), ("b", 100, 20.0)]
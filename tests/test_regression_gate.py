@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+import regression_gate
+from regression_gate import compare_runs, holm, mann_whitney_u, rank_biserial
+from results_store import ResultsStore, RunMetadata
+
+
+def test_mann_whitney_u_counts_pairs_with_ties():
+    baseline = np.array([1.0, 2.0, 3.0, 3.0])
+    candidate = np.array([3.0, 4.0, 5.0])
+    u, p = mann_whitney_u(baseline, candidate)
+    # Pairs where the candidate is larger, ties count half
+    expected = sum((c > b) + 0.5 * (c == b) for c in candidate for b in baseline)
+    assert u == expected
+    assert 0 < p < 0.1
+    assert rank_biserial(u, 4, 3) == 2 * expected / 12 - 1
+
+
+def test_holm_is_monotone_and_capped():
+    adjusted = holm({"a": 0.01, "b": 0.04, "c": 0.03})
+    assert adjusted == {"a": 0.03, "c": 0.06, "b": 0.06}
+
+
+def test_gate_flags_only_a_real_slowdown():
+    rng = np.random.default_rng(1)
+    baseline = {"total": rng.normal(1.0, 0.1, 40), "uplink": rng.normal(0.05, 0.005, 40)}
+    candidate = {"total": rng.normal(1.4, 0.1, 40), "uplink": rng.normal(0.05, 0.005, 40)}
+    rows = {r["metric"]: r for r in compare_runs(baseline, candidate, tolerance=0.1)}
+    assert rows["total"]["regressed"]
+    assert rows["total"]["effect"] > 0.9
+    assert not rows["uplink"]["regressed"]
+
+    # Significant but within tolerance
+    slightly = {"total": baseline["total"] * 1.05, "uplink": baseline["uplink"]}
+    assert not any(r["regressed"] for r in compare_runs(baseline, slightly, tolerance=0.1))
+
+
+def test_gate_refuses_runs_of_different_modes(tmp_path, monkeypatch, capsys):
+    db = tmp_path / "results.db"
+    store = ResultsStore(db)
+    run_ids = []
+    for mode, total in ((None, 1.0), ("load", 3.0)):
+        extra = {"mode": mode} if mode else {}
+        run_id = store.start_run(RunMetadata.collect("tavus", "agent/tavus_agent.py", None, ["hi"], **extra))
+        store.add_turns(run_id, [{"request_id": f"r{i}", "prompt": "hi", "total": total} for i in range(10)])
+        store.finish_run(run_id)
+        run_ids.append(run_id)
+    store.close()
+
+    argv = ["regression_gate.py", *run_ids, "--db", str(db), "--metrics", "total"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as exit_info:
+        regression_gate.main()
+    assert exit_info.value.code == 2
+    assert "different benchmark modes (latency, load)" in capsys.readouterr().err
+
+    # Explicitly allowed: the load run is gated (and fails) like any other
+    monkeypatch.setattr(sys, "argv", [*argv, "--allow-different-modes"])
+    with pytest.raises(SystemExit) as exit_info:
+        regression_gate.main()
+    assert exit_info.value.code == 1
@@ -0,0 +1,77 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from latency_driver import AgentMetric
+from results_store import (
+    LATENCY_MODES,
+    ResultsStore,
+    RunMetadata,
+    connect,
+    prompts_hash,
+    select_runs,
+    vendor_summary,
+)
+from system_monitor import SystemMetrics
+
+
+def store_run(store, vendor, totals, cpu, **extra):
+    run_id = store.start_run(RunMetadata.collect(vendor, f"agent/{vendor}_agent.py", None, ["hi", "bye"], **extra))
+    store.add_turns(
+        run_id,
+        [{"request_id": f"r{i}", "prompt": "hi", "sent_ts": float(i), "total": t} for i, t in enumerate(totals)],
+    )
+    store.add_samples(run_id, [SystemMetrics(0.0, cpu, 1.0, 200.0), SystemMetrics(0.5, cpu * 3, 1.0, 250.0)])
+    store.add_events(run_id, [AgentMetric(0.1, "AGENT_STATE", ["speaking"], "r0")])
+    store.finish_run(run_id)
+    return run_id
+
+
+def test_runs_round_trip_and_compare(tmp_path):
+    path = tmp_path / "results.db"
+    store = ResultsStore(path, batch_size=3)
+    store_run(store, "tavus", [1.0, 2.0, None], cpu=10.0)
+    store_run(store, "tavus", [3.0], cpu=20.0)
+    store_run(store, "anam", [0.5, 0.7], cpu=5.0)
+    store.close()
+
+    conn = connect(path)
+    runs = select_runs(conn)
+    assert len(runs) == 3
+    assert all(r["finished_at"] is not None and r["scenario_hash"] == prompts_hash(["hi", "bye"]) for r in runs)
+    assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 3
+
+    summary = {s["vendor"]: s for s in vendor_summary(conn, runs)}
+    assert summary["tavus"]["runs"] == 2
+    assert summary["tavus"]["turns"] == 4
+    assert summary["tavus"]["answered"] == 3
+    assert summary["tavus"]["total"].max == 3.0
+    assert summary["tavus"]["rss_max"] == 250.0
+    assert summary["anam"]["cpu_avg"] == 10.0
+
+    newest = select_runs(conn, last=1)
+    assert sorted(r["vendor"] for r in newest) == ["anam", "tavus"]
+    assert select_runs(conn, vendor="anam", scenario=prompts_hash(["hi", "bye"]))[0]["vendor"] == "anam"
+
+
+def test_select_runs_by_mode(tmp_path):
+    path = tmp_path / "results.db"
+    store = ResultsStore(path)
+    single = store_run(store, "tavus", [1.0], cpu=10.0)  # recorded before modes were
+    latency = store_run(store, "tavus", [1.0], cpu=10.0, mode="latency")
+    load = store_run(store, "tavus", [4.0], cpu=80.0, mode="load", sessions="1,4")
+    matrix = store_run(store, "anam", [2.0], cpu=10.0, mode="matrix", parallel=2)
+    store.close()
+
+    conn = connect(path)
+    assert {r["run_id"] for r in select_runs(conn, mode="latency")} == {single, latency}
+    assert [r["run_id"] for r in select_runs(conn, mode="load")] == [load]
+    assert [r["run_id"] for r in select_runs(conn, mode="matrix")] == [matrix]
+    assert len(select_runs(conn)) == 4
+
+    # compare's default: the matrix run is compared with the latency runs, the load run isn't
+    compared = select_runs(conn, mode=LATENCY_MODES)
+    assert {r["run_id"] for r in compared} == {single, latency, matrix}
+    summary = {s["vendor"]: s for s in vendor_summary(conn, compared)}
+    assert summary["anam"]["total"].max == 2.0 and summary["tavus"]["turns"] == 2
@@ -0,0 +1,13 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from run_scenarios import ScenarioResult
+from turn_detection import TurnEnd
+
+
+def test_voice_to_voice_latency():
+    answered = ScenarioResult("room", "01.ogg", 10.0, 11.2, TurnEnd(15.0, "listening"))
+    assert abs(answered.voice_to_voice - 1.2) < 1e-9
+    assert ScenarioResult("room", "02.ogg", 10.0, None, None).voice_to_voice is None
@@ -0,0 +1,73 @@
+import os
+import sys
+import wave
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from sample_cache import SampleCache, decode, file_hash, resample_poly, to_pcm16
+
+
+def write_wav(path, samples: np.ndarray, rate: int):
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(samples.shape[1] if samples.ndim == 2 else 1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+
+
+def sine(freq: float, rate: int, seconds: float = 1.0) -> np.ndarray:
+    return np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate)
+
+
+def test_resample_poly_matches_the_ideal_signal():
+    for rate in (16000, 22050, 24000, 44100):
+        y = resample_poly(0.5 * sine(1000, rate), 48000, rate)
+        assert len(y) == 48000
+        ideal = 0.5 * sine(1000, 48000)
+        assert np.abs(y[1000:-1000] - ideal[1000:-1000]).max() < 1e-3
+
+
+def test_resample_poly_removes_content_above_the_new_nyquist():
+    y = resample_poly(0.5 * sine(10000, 48000), 16000, 48000)
+    assert np.abs(y[500:-500]).max() < 0.01
+
+
+def test_stereo_wav_is_downmixed_and_resampled(tmp_path):
+    left = 8000 * sine(440, 24000)
+    write_wav(tmp_path / "stereo.wav", np.stack([left, np.zeros_like(left)], axis=1), 24000)
+    samples, rate = decode(tmp_path / "stereo.wav")
+    assert samples.shape == (24000, 2) and rate == 24000
+
+    mono = to_pcm16(samples, rate)
+    assert mono.dtype == np.int16 and len(mono) == 48000
+    assert abs(np.abs(mono[1000:-1000]).max() - 4000) < 50
+
+
+def test_cache_is_content_addressed_and_memory_mapped(tmp_path):
+    cache = SampleCache(tmp_path / "cache")
+    write_wav(tmp_path / "a.wav", 8000 * sine(440, 16000), 16000)
+    write_wav(tmp_path / "b.wav", 8000 * sine(440, 16000), 16000)
+
+    a = cache.load(tmp_path / "a.wav")
+    assert isinstance(a, np.memmap) and not a.flags.writeable and len(a) == 48000
+    assert cache.load(tmp_path / "a.wav") is a  # one mapping per process
+    # Same content under another name: same cache file
+    b = SampleCache(tmp_path / "cache").load(tmp_path / "b.wav")
+    assert np.array_equal(a, b)
+    assert len(list((tmp_path / "cache").glob("*.npy"))) == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = SampleCache(tmp_path / "cache", max_bytes=250_000)  # room for two 1 s samples (96 KB each)
+    for i, name in enumerate(["a", "b", "c"]):
+        write_wav(tmp_path / f"{name}.wav", 8000 * sine(440 + 100 * i, 48000), 48000)
+    cache.load(tmp_path / "a.wav")
+    cache.load(tmp_path / "b.wav")
+    a, b = (cache.path_for(file_hash(tmp_path / f"{name}.wav")) for name in "ab")
+    os.utime(a, (1, 1))
+    os.utime(b, (2, 2))
+    cache.load(tmp_path / "c.wav")
+    assert not a.exists() and b.exists()
+    assert len(list(cache.directory.glob("*.npy"))) == 2
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Benchmark scripts import their siblings directly, like the agent scripts do
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from latency_driver import AgentMetric, index_agent_metrics, parse_metric_line
+from results_store import ResultsStore, connect
+from system_benchmark import build_parser, run_metadata
+
+
+def test_parse_metric_line_keeps_prompt_text_together():
+    m = parse_metric_line("[METRIC] AGENT_RECEIVED 1700000000.25 abc123 1700000000000 What is the capital of France?")
+    assert m is not None
+    assert m.type == "AGENT_RECEIVED"
+    assert m.timestamp == 1700000000.25
+    assert m.request_id == "abc123"
+    assert m.data == ["1700000000000", "What is the capital of France?"]
+
+
+def test_parse_metric_line_ignores_other_lines():
+    assert parse_metric_line("INFO livekit.agents - registered worker") is None
+    assert parse_metric_line("[METRIC] AGENT_STATE not-a-number - speaking") is None
+
+
+def test_parse_metric_line_without_request_id():
+    m = parse_metric_line("[METRIC] AGENT_STATE 12.5 - speaking")
+    assert m.request_id is None
+    assert m.data == ["speaking"]
+
+
+def test_index_agent_metrics_joins_on_request_id():
+    metrics = [
+        AgentMetric(1.0, "AGENT_RECEIVED", ["1000", "first"], "a"),
+        AgentMetric(1.01, "AGENT_RECEIVED", ["1010", "second"], "b"),
+        AgentMetric(1.2, "AGENT_STATE", ["thinking"], "a"),
+        # Responses finish out of order: 'b' speaks before 'a'
+        AgentMetric(1.5, "AGENT_STATE", ["speaking"], "b"),
+        AgentMetric(1.9, "AGENT_STATE", ["speaking"], "a"),
+        AgentMetric(2.5, "AGENT_STATE", ["speaking"], "a"),
+        AgentMetric(3.0, "AGENT_STATE", ["listening"], None),
+    ]
+
+    index = index_agent_metrics(metrics)
+
+    assert index["a"]["received"].timestamp == 1.0
+    assert index["a"]["speaking"].timestamp == 1.9
+    assert index["b"]["received"].timestamp == 1.01
+    assert index["b"]["speaking"].timestamp == 1.5
+
+
+@pytest.mark.parametrize(("argv", "prompt_gap"), [([], "1"), (["--prompt-gap", "uniform:0.5:2"], "uniform:0.5:2")])
+def test_run_metadata_of_the_cli_is_storable(tmp_path, argv, prompt_gap):
+    args = build_parser().parse_args(["--agent", "agent/tavus_agent.py", *argv])
+    store = ResultsStore(tmp_path / "results.db")
+    run_id = store.start_run(run_metadata(args, "tavus", ["hi"]))
+    store.close()
+
+    row = connect(tmp_path / "results.db").execute("SELECT agent, metadata FROM runs WHERE run_id = ?", (run_id,))
+    agent, metadata = row.fetchone()
+    assert agent == "agent/tavus_agent.py"
+    assert json.loads(metadata)["prompt_gap"] == prompt_gap
+
+
+def test_run_metadata_records_the_mode_and_agent():
+    args = build_parser().parse_args(
+        ["--agent", "agent/tavus_agent.py", "--agent", "agent/anam_agent.py", "--capacity", "1:2:8"]
+    )
+    metadata = run_metadata(args, "anam", ["hi"], agent="agent/anam_agent.py", mode="capacity", capacity=args.capacity)
+
+    assert metadata.agent == "agent/anam_agent.py"
+    assert json.loads(json.dumps(metadata.extra))["mode"] == "capacity"
+    assert metadata.extra["capacity"] == "1:2:8"
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from system_monitor import SystemMonitor, load_gpu_backend
+
+# A parent that spawns a child a moment after starting, like an agent worker starting a job
+SPAWNER = (
+    "import subprocess, sys, time\n"
+    "time.sleep(0.3)\n"
+    "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(1.5)'])\n"
+    "child.wait()\n"
+)
+
+
+def test_monitor_follows_children_spawned_later():
+    parent = subprocess.Popen([sys.executable, "-c", SPAWNER])
+    monitor = SystemMonitor(parent.pid, interval=0.1, gpu_backend="none")
+    monitor.start()
+    time.sleep(1.2)
+    monitor.stop()
+    parent.wait()
+
+    assert monitor.metrics
+    assert len(monitor.metrics[0].processes) == 1
+    assert max(len(m.processes) for m in monitor.metrics) == 2
+    sample = max(monitor.metrics, key=lambda m: len(m.processes))
+    assert abs(sample.memory_mb - sum(p.rss_mb for p in sample.processes)) < 1e-9
+    assert sample.gpu_mem_mb is None
+
+
+def test_gpu_backend_can_be_disabled():
+    assert load_gpu_backend("none") is None
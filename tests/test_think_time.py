@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent"))
+
+from think_time import ThinkTime
+
+
+def test_parse_fixed_and_distributions():
+    assert ThinkTime.parse("1.5")() == 1.5
+    uniform = ThinkTime.parse("uniform:0.5:2", seed=1)
+    assert all(0.5 <= uniform() <= 2 for _ in range(100))
+    exp = ThinkTime.parse("exp:2", seed=1)
+    assert 1.6 < sum(exp() for _ in range(5000)) / 5000 < 2.4
+    assert ThinkTime.parse("lognormal:1:0.5").scaled(2).a == 2
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        "soon",
+        "uniform:1",
+        "exp:1:2",
+        "gamma:1:2",
+        "-1",
+        "nan",
+        "exp:-1",
+        "uniform:-1:2",
+        "uniform:2:1",
+        "lognormal:0:0.5",
+        "lognormal:-1:0.5",
+        "lognormal:1:-0.5",
+    ],
+)
+def test_parse_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        ThinkTime.parse(spec)
+
+
+@pytest.mark.parametrize("spec", ["1.5", "uniform:0.5:2", "exp:1.5", "lognormal:1:0.5"])
+def test_spec_round_trips(spec):
+    assert ThinkTime.parse(spec).spec == spec
+
+
+def test_invalid_prompt_gap_is_an_argument_error(capsys):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompt-gap", type=ThinkTime.parse)
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--prompt-gap", "lognormal:0:0.5"])
+    assert "invalid parse value: 'lognormal:0:0.5'" in capsys.readouterr().err
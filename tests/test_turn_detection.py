@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+from turn_detection import TurnCompletionDetector
+
+RATE = 48000
+BLOCK = RATE // 100
+
+
+def tone(blocks, amplitude=8000):
+    t = np.arange(blocks * BLOCK) / RATE
+    return (amplitude * np.sin(2 * np.pi * 1000 * t)).astype(np.int16)
+
+
+def silence(blocks):
+    return np.zeros(blocks * BLOCK, dtype=np.int16)
+
+
+def test_turn_ends_after_trailing_silence():
+    detector = TurnCompletionDetector(silence=0.5)
+    detector.arm(0.0)
+    # 1 s of speech received as 10 frames of 100 ms, then silent frames
+    for i in range(10):
+        detector.process("agent", tone(10), RATE, 1.1 + i * 0.1)
+    for i in range(4):
+        detector.process("agent", silence(10), RATE, 2.1 + i * 0.1)
+    assert detector.end is None
+    detector.process("agent", silence(10), RATE, 2.5)
+    assert detector.end.reason == "silence"
+    assert abs(detector.end.ts - 2.0) < 1e-9
+
+
+def test_listening_state_ends_turn_once_audio_is_quiet():
+    detector = TurnCompletionDetector(silence=0.8, guard=0.2)
+    detector.arm(0.0)
+    # Listening before the agent spoke doesn't end the turn
+    detector.on_agent_state("listening", 0.5)
+    assert detector.end is None
+    detector.on_agent_state("speaking", 1.0)
+    detector.process("agent", tone(10), RATE, 1.5)
+    # The avatar is still playing audio when the agent reports listening
+    detector.on_agent_state("listening", 1.55)
+    assert detector.end is None
+    detector.process("agent", silence(10), RATE, 1.8)
+    assert detector.end.reason == "listening"
+    assert detector.end.ts == 1.55
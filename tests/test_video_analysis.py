@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import threading
+import types
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+import video_analysis
+from video_analysis import DEFAULT_MOUTH_REGION, VideoSmoothnessAnalyzer, VisualResponseDetector, region_slice
+
+SHAPE = (360, 640)
+
+
+def frame(rng, mouth_open=False):
+    luma = np.full(SHAPE, 120, dtype=np.uint8)
+    luma += rng.integers(0, 2, SHAPE, dtype=np.uint8)  # compression noise
+    if mouth_open:
+        rows, cols = region_slice(SHAPE, DEFAULT_MOUTH_REGION)
+        luma[rows, cols][20:60, 40:150] = 20
+    return luma
+
+
+def test_first_frame_and_mouth_motion_after_arm():
+    rng = np.random.default_rng(0)
+    detector = VisualResponseDetector(region=DEFAULT_MOUTH_REGION)
+    t = 0.0
+    for _ in range(25):  # idle before the prompt
+        t += 0.04
+        detector.process("TR_v", frame(rng), t)
+    assert detector.first_frame_ts is None
+
+    detector.arm(1.0)
+    for i in range(20):
+        t += 0.04
+        detector.process("TR_v", frame(rng, mouth_open=i >= 10 and i % 2 == 0), t)
+
+    assert abs(detector.first_frame_ts - 1.04) < 1e-9
+    # Talking starts at the 11th frame after arming: two moving frames in a row are needed
+    assert abs(detector.mouth_ts - (1.0 + 0.04 * 11)) < 1e-9
+
+
+def test_idle_noise_is_not_motion():
+    rng = np.random.default_rng(1)
+    detector = VisualResponseDetector(region=DEFAULT_MOUTH_REGION)
+    detector.arm(0.0)
+    for i in range(50):
+        detector.process("TR_v", frame(rng), 0.04 * (i + 1))
+    assert detector.first_frame_ts is not None
+    assert detector.mouth_ts is None
+
+
+def test_face_is_located_off_the_event_loop(monkeypatch):
+    face = (0.4, 0.6, 0.6, 0.7)
+    release = threading.Event()
+    threads = []
+
+    def slow_locate(luma):
+        threads.append(threading.current_thread())
+        release.wait(5)
+        return face
+
+    monkeypatch.setattr(video_analysis, "locate_mouth_region", slow_locate)
+
+    async def feed():
+        rng = np.random.default_rng(3)
+        detector = VisualResponseDetector()
+        detector.process("TR_v", frame(rng), 0.04)
+        state = detector._tracks["TR_v"]
+        locating = state.locating
+        assert locating is not None
+        # The default region is used while the detector runs
+        detector.process("TR_v", frame(rng), 0.08)
+        assert detector._mouth_region(state, frame(rng)) == DEFAULT_MOUTH_REGION
+        release.set()
+        await locating
+        await asyncio.sleep(0)  # done callbacks
+        return detector._mouth_region(state, frame(rng)), state.locate_attempts
+
+    region, attempts = asyncio.run(feed())
+    assert region == face and attempts == 1
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_face_cascade_is_loaded_once(monkeypatch):
+    loaded = []
+
+    class CascadeClassifier:
+        def __init__(self, path):
+            loaded.append(path)
+
+        def detectMultiScale(self, image, scaleFactor, minNeighbors):
+            return [(100, 40, 120, 120)] if image.mean() > 0 else []
+
+    fake_cv2 = types.SimpleNamespace(
+        CascadeClassifier=CascadeClassifier, data=types.SimpleNamespace(haarcascades="/x/")
+    )
+    monkeypatch.setitem(sys.modules, "cv2", fake_cv2)
+    monkeypatch.setattr(video_analysis, "_face_cascade", None)
+
+    assert video_analysis.locate_mouth_region(np.zeros(SHAPE, dtype=np.uint8)) is None
+    x0, y0, x1, y1 = video_analysis.locate_mouth_region(np.full(SHAPE, 120, dtype=np.uint8))
+    assert (x0, y0) == (130 / 320, 118 / 180) and x1 > x0 and y1 > y0
+    assert loaded == ["/x/haarcascade_frontalface_default.xml"]
+
+
+def test_smoothness_counts_frozen_frames_gaps_and_fps():
+    rng = np.random.default_rng(2)
+    analyzer = VideoSmoothnessAnalyzer(stall_threshold=0.2)
+    analyzer.start_turn("turn-1")
+    t = 100.0
+    frozen = frame(rng)
+    for i in range(100):  # 4 s at 25 fps
+        t += 0.04
+        if i == 50:
+            t += 0.5  # network stall
+        luma = frozen if 70 <= i < 80 else rng.integers(0, 255, SHAPE, dtype=np.uint8)
+        analyzer.process("TR_v", luma, t)
+
+    summary = analyzer.summary("turn-1")
+    assert summary["frames"] == 100
+    assert summary["duplicates"] == 9
+    assert summary["stalls"] == 2
+    assert abs(summary["stall_max"] - 0.54) < 1e-6
+    assert abs(summary["interval_p50"] - 0.04) < 0.001
+    assert 24 <= summary["fps_median"] <= 25
+    assert analyzer.summary("other") is None
+
+
+def test_small_motion_is_not_a_freeze():
+    analyzer = VideoSmoothnessAnalyzer()
+    analyzer.start_turn("idle")
+    base = np.full(SHAPE, 120, dtype=np.uint8)
+    for i in range(50):
+        luma = base.copy()
+        # A 12 px wide mouth opening and closing, 10 grey levels darker than the face. It lies
+        # between the points of a 32x32 subsample and under a 16-level quantisation step.
+        luma[255 : 257 + 2 * (i % 2), 302:314] = 110
+        analyzer.process("TR_v", luma, 100.0 + 0.04 * i)
+    for i in range(50, 60):  # then really frozen
+        analyzer.process("TR_v", luma, 100.0 + 0.04 * i)
+
+    assert analyzer.summary("idle")["duplicates"] == 10